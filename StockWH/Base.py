@@ -1,14 +1,576 @@
 import pandas as pd
 import numpy as np
 import psycopg2 as pg
-from decimal import Decimal
+import psycopg2.pool
 import DTC
+from StockWH import LocalCache, PGCopy, TickStore, Greeks
 from typing import Union, Iterable
 import os
+import io
+import sys
+import datetime
+import re
+import csv
+import hashlib
+import importlib.util
+import itertools
+import weakref
+import warnings
+import threading
+import time
+import collections
+import queue
+from concurrent import futures
 from collections import OrderedDict
+from contextlib import contextmanager
 
-PG_CONNECTOR = pg.connect(dbname='', user='', password='')
-PG_CURSOR = PG_CONNECTOR.cursor()
+PG_CONNECT_KWARGS = dict(dbname='', user='', password='')
+PG_POOL_MINCONN = 1
+PG_POOL_MAXCONN = 16
+# 연결이 모두 사용 중일 때 반납을 기다리는 최대 시간(초). 넘으면 PoolError
+PG_POOL_TIMEOUT = 60
+# import 시점에 DB에 접속하지 않도록, 처음 쿼리를 실행할 때 생성 (get_pool)
+PG_POOL = None
+_POOL_LOCK = threading.Lock()
+# (max_calls, period) -> RateLimiter. 같은 제한을 쓰는 테이블들이 동시에 업데이트될 때 요청 제한을 공유하기 위함
+_RATE_LIMITERS = {}
+# transaction()으로 현재 스레드에 묶인 연결
+_THREAD_LOCAL = threading.local()
+
+# NUMERIC -> Decimal 대신 float로 바로 디코딩 (Decimal 객체 생성 및 astype(float) 비용 제거)
+NUMERIC_AS_FLOAT = pg.extensions.new_type(pg.extensions.DECIMAL.values, 'NUMERIC_AS_FLOAT',
+                                          lambda value, cursor: float(value) if value is not None else None)
+# TIME -> datetime.time 대신 'HH:MM:SS' 문자열 그대로 받아서 pd.to_timedelta로 한번에 변환.
+# read() 등 결과를 _postprocess에서 변환하는 커서에만 등록 (is_org=True, execute_query 결과는 datetime.time 그대로)
+TIME_AS_TEXT = pg.extensions.new_type(pg.extensions.TIME.values, 'TIME_AS_TEXT', lambda value, cursor: value)
+# 서버사이드(named) 커서 이름 중복 방지용
+_NAMED_CURSOR_COUNTER = itertools.count()
+# direct ingest 중인 클래스 -> (PipeFile, keep_update_file). update_file_writer()가 참조
+_DIRECT_INGEST_PIPES = {}
+# 연결 -> 그 연결(세션)에 PREPARE된 statement 이름들. 연결 객체가 사라지면 함께 제거됨
+_PREPARED_STATEMENTS = weakref.WeakKeyDictionary()
+_PREPARED_LOCK = threading.Lock()
+# 롤업 집계 규칙 -> SQL 집계식. 분봉의 시가/종가는 tm 순서의 첫번째/마지막 값
+ROLLUP_AGGREGATE_SQL = {
+    'first': "(array_agg({0} ORDER BY tm))[1]",
+    'last':  "(array_agg({0} ORDER BY tm DESC))[1]",
+    'max':   "max({0})",
+    'min':   "min({0})",
+    'sum':   "sum({0})",
+}
+# 종목코드 사전. CD_ID_STORAGE 테이블은 cd 대신 정수 cd_id로 저장하고, 종목 마스터(S01_ITEMS, O01_ITEMS) update 시 코드가 등록됨
+CODE_ID_TABLE_NAME = 'c00_code_ids'
+CODE_ID_TABLE_SCHEMA = f"""CREATE TABLE IF NOT EXISTS {CODE_ID_TABLE_NAME} (
+    cd_id   INTEGER     GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    cd      varchar(8)  NOT NULL UNIQUE);"""
+# CD_ID_STORAGE 테이블의 실제 저장 테이블명 = TABLE_NAME + CD_ID_STORAGE_SUFFIX (TABLE_NAME은 cd를 복원하는 view)
+CD_ID_STORAGE_SUFFIX = '_data'
+
+
+class BlockingConnectionPool(pg.pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool은 연결이 모두 사용 중이면 바로 PoolError를 내므로, maxconn보다 많은 스레드가 동시에 조회하면 실패함.
+    연결 수만큼의 세마포어로 getconn()이 다른 스레드의 반납을 최대 timeout초 기다리도록 함
+    """
+    def __init__(self, minconn, maxconn, *args, timeout=PG_POOL_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise pg.pool.PoolError(f"no connection was returned to the pool within {self.timeout} seconds")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._semaphore.release()
+
+
+def configure_pool(minconn=PG_POOL_MINCONN, maxconn=PG_POOL_MAXCONN, timeout=PG_POOL_TIMEOUT, **connect_kwargs):
+    """
+    연결 풀 설정 변경. 병렬 read() 시 동시에 사용할 연결 수만큼 maxconn을 지정. 새 풀은 다음 쿼리 때 생성
+    maxconn보다 많은 스레드가 조회하면 연결이 반납될 때까지 최대 timeout초 대기
+    """
+    global PG_POOL, PG_POOL_MINCONN, PG_POOL_MAXCONN, PG_POOL_TIMEOUT
+    with _POOL_LOCK:
+        PG_POOL_MINCONN, PG_POOL_MAXCONN, PG_POOL_TIMEOUT = minconn, maxconn, timeout
+        if connect_kwargs:  PG_CONNECT_KWARGS.update(connect_kwargs)
+        old_pool, PG_POOL = PG_POOL, None
+    if old_pool is not None:    old_pool.closeall()
+
+
+def _to_positional_params(query: str) -> str:
+    """ psycopg2 형식의 %s 자리를 PREPARE용 $1, $2, ... 로 변환 ('%%'는 '%') """
+    counter = itertools.count(1)
+    return '%'.join(re.sub(r'%s', lambda _: f'${next(counter)}', part) for part in query.split('%%'))
+
+
+def _reset_prepared_statements(conn):
+    """ rollback된 연결은 어떤 statement가 PREPARE된 상태인지 알 수 없으므로 모두 DEALLOCATE (다음 조회 때 다시 PREPARE) """
+    with _PREPARED_LOCK:
+        prepared = _PREPARED_STATEMENTS.pop(conn, None)
+    if not prepared or conn.closed:    return
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL;")
+        conn.commit()
+    except pg.Error:
+        conn.rollback()
+
+
+def get_pool():
+    global PG_POOL
+    if PG_POOL is None:
+        with _POOL_LOCK:
+            if PG_POOL is None:
+                PG_POOL = BlockingConnectionPool(PG_POOL_MINCONN, PG_POOL_MAXCONN, timeout=PG_POOL_TIMEOUT,
+                                                 **PG_CONNECT_KWARGS)
+    return PG_POOL
+
+
+class RateLimiter:
+    """ period(초) 동안 최대 max_calls번만 통과시킴. 데이터 제공자(Creon 등)의 요청 제한에 맞추기 위함 """
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls = collections.deque()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return
+                sleep_time = self.period - (now - self._calls[0])
+            time.sleep(sleep_time)
+
+
+def get_rate_limiter(max_calls: int, period: float) -> RateLimiter:
+    with _POOL_LOCK:
+        if (max_calls, period) not in _RATE_LIMITERS:
+            _RATE_LIMITERS[(max_calls, period)] = RateLimiter(max_calls, period)
+        return _RATE_LIMITERS[(max_calls, period)]
+
+
+class DownloadError(Exception):
+    """ 재시도 후에도 다운로드에 실패한 종목이 있음. (상장폐지/데이터 없음과 구분하여, 업데이트가 커밋되지 않도록 함) """
+    def __init__(self, codes):
+        self.codes = list(codes)
+        super().__init__(f"download failed for {len(self.codes)} code(s) : {self.codes[:20]}")
+
+
+_DOWNLOAD_FAILED = object()
+
+
+def _init_download_thread():
+    # Creon Plus 등 COM 기반 제공자는 스레드마다 COM 초기화가 필요
+    if importlib.util.find_spec('pythoncom') is not None:
+        import pythoncom
+        pythoncom.CoInitialize()
+
+
+def download_concurrently(codes, fetch, max_workers=1, rate_limiter=None, retries=2, retry_wait=1.0):
+    """
+    codes 각각에 대해 fetch(code)를 실행하고, 끝나는 순서대로 (code, result)를 yield.
+    max_workers=1 이면 호출한 스레드에서 순서대로 요청하고, 2 이상이면 스레드풀(스레드마다 COM 초기화)에서 max_workers개 이내로
+    동시에 요청하여 호출한 쪽이 결과를 정규화/저장하는 동안에도 다음 요청이 진행된다.
+    fetch가 반환한 None(상장폐지 등)은 그대로 넘기고, 예외가 난 요청은 retries번 재시도한다.
+    그래도 실패한 종목은 넘기지 않고 모아두었다가, 나머지를 모두 넘긴 뒤 DownloadError로 알린다.
+    """
+    codes = list(codes)
+    failed = []
+
+    def fetch_with_retry(code):
+        for attempt in range(retries + 1):
+            if rate_limiter is not None:    rate_limiter.wait()
+            try:
+                return fetch(code)
+            except Exception as e:
+                if attempt == retries:
+                    print(f"{code} :: download failed. ({type(e).__name__}: {e})")
+                    failed.append(code)
+                    return _DOWNLOAD_FAILED
+                time.sleep(retry_wait * (attempt + 1))
+
+    def fetch_all():
+        if max_workers <= 1:
+            for code in codes:
+                yield code, fetch_with_retry(code)
+            return
+        with futures.ThreadPoolExecutor(max_workers=max_workers, initializer=_init_download_thread) as executor:
+            code_iter = iter(codes)
+            pending = {}
+            # 메모리 사용량이 일정하도록 미리 제출해두는 작업 수를 제한
+            for code in itertools.islice(code_iter, max_workers * 2):
+                pending[executor.submit(fetch_with_retry, code)] = code
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    code = pending.pop(future)
+                    yield code, future.result()
+                    for next_code in itertools.islice(code_iter, 1):
+                        pending[executor.submit(fetch_with_retry, next_code)] = next_code
+
+    for done_count, (code, result) in enumerate(fetch_all(), start=1):
+        if result is _DOWNLOAD_FAILED:  continue
+        print(f" {done_count} / {len(codes)}, {code} 다운로드 완료")
+        yield code, result
+    if failed:  raise DownloadError(failed)
+
+
+class PipeFile:
+    """
+    스레드 간 텍스트(binary=True이면 bytes) 스트림. 다운로드 스레드가 write()한 내용을 다른 스레드의 copy_expert가 read()로 읽어간다.
+    큐 크기(maxsize)만큼만 쌓이므로 메모리 사용량이 제한되고, 읽는 쪽이 느리면 write()가 대기한다.
+    """
+    _EOF = object()
+    _ABORT = object()
+
+    def __init__(self, maxsize: int = 8, binary: bool = False):
+        self.binary = binary
+        self._empty = b'' if binary else ''
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._current = self._empty
+        self._offset = 0
+        self._eof = False
+        self.size_written = 0
+        self.writers = 0        # update_file_writer()로 연결된 writer 수
+        self.failed = False     # 읽는 쪽이 실패하면 True. 이후 write()는 BrokenPipeError
+
+    def write(self, data):
+        if self.failed:     raise BrokenPipeError("the reader of this pipe has failed")
+        if not data:    return
+        self._queue.put(data)
+        self.size_written += len(data)
+
+    def close(self):
+        self._queue.put(self._EOF)
+
+    def abort(self):
+        """ 쓰는 쪽에서 오류가 난 경우. 읽는 쪽(COPY)이 예외로 중단되어 트랜잭션이 롤백됨 """
+        self._queue.put(self._ABORT)
+
+    def fail(self):
+        """
+        읽는 쪽에서 오류가 난 경우. 다음 write()부터 BrokenPipeError로 쓰는 쪽(다운로드)을 멈추고,
+        이미 큐가 꽉 차서 대기 중인 write()가 멈추지 않도록 쓰는 쪽이 close/abort 할 때까지 남은 데이터는 버림
+        """
+        self.failed = True
+        try:
+            while self.read(1 << 20):   pass
+        except IOError:
+            pass
+
+    def read(self, size: int = -1):
+        parts, n = [], 0
+        while size < 0 or n < size:
+            if self._offset >= len(self._current):
+                if self._eof:   break
+                item = self._queue.get()
+                if item is self._EOF:
+                    self._eof = True
+                    continue
+                if item is self._ABORT:
+                    self._eof = True
+                    raise IOError("the writer of this pipe has been aborted")
+                self._current, self._offset = item, 0
+                continue
+            remain = len(self._current) - self._offset
+            take = remain if size < 0 else min(size - n, remain)
+            parts.append(self._current[self._offset:self._offset + take])
+            self._offset += take
+            n += take
+        return self._empty.join(parts)
+
+
+class UpdateFileWriter:
+    """
+    다운로드한 차트를 리스트에 모아두었다가 flush_rows 이상이 되면 한번에 concat 하여 update 파일에 추가(append).
+    누적 DataFrame에 pd.concat을 반복하지 않으므로 전체 비용이 행 수에 선형이다.
+    dtypes(COLUMN_DTYPES의 값, 컬럼 위치 순서)가 주어지면 NaN 때문에 float이 된 정수 컬럼을 차트마다 nullable 정수(Int32/Int64)로
+    되돌린 뒤 모으므로, concat 결과가 float64가 되어 '1.0'으로 기록되는 일이 없다 (NaN은 빈 문자열 = NULL).
+    sinks가 주어지면 같은 텍스트를 sink(PipeFile 등)에도 써서 파일을 거치지 않고 바로 COPY 할 수 있다.
+    encoder(PGCopy.BinaryCopyEncoder)가 주어지면 텍스트 대신 COPY binary 포맷으로 기록한다.
+    """
+    # 스키마 dtype -> float 컬럼을 되돌릴 nullable 정수. DATE/TIME 컬럼은 다운로드한 형태가 정수(20240105, 901 등)
+    INTEGER_DTYPES = {'int32': 'Int32', 'Int32': 'Int32', 'int64': 'Int64', 'Int64': 'Int64',
+                      'datetime64[ns]': 'Int64', 'timedelta64[ns]': 'Int64'}
+
+    def __init__(self, path: str, dtypes=None, flush_rows: int = 500000, sinks=(), write_file=True, encoder=None):
+        self.path = path
+        self.dtypes = list(dtypes) if dtypes is not None else None
+        self.n_columns = len(self.dtypes) if self.dtypes else None     # copy_from 전에 컬럼 수 불일치를 잡기 위함
+        self.flush_rows = flush_rows
+        self.sinks = tuple(sinks)
+        self.write_file = write_file
+        self.encoder = encoder
+        self.rows_written = 0
+        self._charts = []
+        self._n_rows = 0
+
+    def __enter__(self):
+        if self.encoder is not None:
+            # binary 포맷은 파일 하나에 헤더/트레일러가 한번씩만 있어야 하므로 새로 씀
+            if self.write_file:     open(self.path, mode='wb').close()
+            self._write(self.encoder.header())
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:    return
+        self.flush()
+        if self.encoder is not None:
+            self._write(self.encoder.trailer())
+        # 받은 데이터가 없어도 빈 파일을 남겨서 COPY 단계가 FileNotFoundError 없이 진행되도록 함
+        elif self.write_file and not os.path.exists(self.path):
+            open(self.path, mode='a').close()
+
+    def _write(self, data):
+        if self.write_file:
+            if self.encoder is not None:
+                with open(self.path, mode='ab') as f:   f.write(data)
+            else:
+                with open(self.path, mode='a', encoding='utf8') as f:   f.write(data)
+        for sink in self.sinks:     sink.write(data)
+
+    def append(self, chart: pd.DataFrame):
+        if chart is None or len(chart) == 0:    return
+        if self.n_columns is not None and chart.shape[1] != self.n_columns:
+            raise ValueError(f"number of columns({chart.shape[1]}) does not match the table schema({self.n_columns})")
+        self._charts.append(self._cast(chart) if self.dtypes else chart)
+        self._n_rows += len(chart)
+        if self._n_rows >= self.flush_rows:     self.flush()
+
+    def _cast(self, chart: pd.DataFrame) -> pd.DataFrame:
+        """ 컬럼 위치 순서대로 dtypes와 비교해서, 정수여야 하는데 float인 컬럼만 변환 (NaN이 없는 차트는 그대로) """
+        casts = {column: self.INTEGER_DTYPES[dtype] for column, column_dtype, dtype
+                 in zip(chart.columns, chart.dtypes, self.dtypes)
+                 if dtype in self.INTEGER_DTYPES and column_dtype.kind == 'f'}
+        return chart.astype(casts) if casts else chart
+
+    def flush(self):
+        if not self._charts:    return
+        chunk = pd.concat(self._charts, axis=0, ignore_index=True)
+        if self.encoder is not None:
+            self._write(self.encoder.encode(chunk))
+        elif self.sinks:
+            self._write(chunk.to_csv(sep='\t', index=None, header=None))
+        else:
+            chunk.to_csv(self.path, sep='\t', index=None, header=None, mode='a')
+        self.rows_written += len(chunk)
+        self._charts, self._n_rows = [], 0
+
+
+class UpdateScheduler:
+    """
+    여러 테이블의 update()를 UPDATE_DEPENDS_ON 의존관계에 따라 병렬로 수행.
+    의존하는 테이블이 모두 끝난 테이블부터 스레드 풀에서 실행하며, 각 테이블은 풀에서 별도의 연결을 빌려 적재한다.
+    tables에 없는 테이블에 대한 의존관계는 무시 (이미 최신이라고 가정)
+    """
+    def __init__(self, tables, max_workers: int = 4, direct_ingest=False):
+        self.tables = tuple(tables)
+        self.max_workers = max_workers
+        self.direct_ingest = direct_ingest
+        self.timings = OrderedDict()    # 테이블 클래스명 -> {단계: 소요시간(초)}
+        self.errors = OrderedDict()     # 테이블 클래스명 -> 예외
+
+    def dependencies(self, table):
+        return tuple(dep for dep in table.UPDATE_DEPENDS_ON if dep in self.tables)
+
+    def _update(self, table):
+        timings = self.timings.setdefault(table.__name__, OrderedDict())
+        srt = time.perf_counter()
+        try:
+            table.update(direct_ingest=self.direct_ingest, timings=timings)
+        finally:
+            timings['total'] = time.perf_counter() - srt
+
+    def run(self):
+        pending, done, failed, running = list(self.tables), set(), set(), {}
+        srt = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='update',
+                                        initializer=_init_download_thread) as executor:
+            while pending or running:
+                for table in list(pending):
+                    dependencies = self.dependencies(table)
+                    if any(dep in failed for dep in dependencies):
+                        # 의존하는 테이블이 실패하면 건너뜀
+                        pending.remove(table)
+                        failed.add(table)
+                        self.errors[table.__name__] = RuntimeError(f"skipped : dependency of {table.__name__} failed")
+                    elif all(dep in done for dep in dependencies):
+                        pending.remove(table)
+                        running[executor.submit(self._update, table)] = table
+                if not running:
+                    if pending:
+                        raise ValueError(f"circular UPDATE_DEPENDS_ON : {[table.__name__ for table in pending]}")
+                    break
+                finished, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in finished:
+                    table = running.pop(future)
+                    if future.exception() is None:
+                        done.add(table)
+                    else:
+                        failed.add(table)
+                        self.errors[table.__name__] = future.exception()
+                        print(f"{table.__name__} UPDATE : FAILED ({future.exception()!r})")
+        self.timings['__all__'] = OrderedDict(total=time.perf_counter() - srt)
+        self.report()
+        if self.errors:     raise next(iter(self.errors.values()))
+        return self.timings
+
+    def report(self):
+        for name, timings in self.timings.items():
+            phases = ', '.join(f"{phase} {seconds:.1f}s" for phase, seconds in timings.items())
+            print(f"{name:<24} {'FAILED' if name in self.errors else 'OK':<6} {phases}")
+        for name in self.errors:
+            if name not in self.timings:    print(f"{name:<24} SKIPPED")
+
+
+class lazy_classproperty:
+    """
+    처음 접근할 때 func(cls)를 한번 계산해서 클래스별로 보관하는 클래스 속성. (DB_END_DT 등 DB 메타데이터용)
+    BaseDB.refresh_lazy_properties()로 다시 계산하도록 초기화
+    """
+    def __init__(self, func):
+        self.func = func
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+        if owner not in self._values:
+            with self._lock:
+                if owner not in self._values:
+                    self._values[owner] = self.func(owner)
+        return self._values[owner]
+
+    def refresh(self, owner):
+        with self._lock:
+            self._values.pop(owner, None)
+
+
+class QueryCache:
+    """
+    정규화된 쿼리 문자열을 키로 하는 LRU 결과 캐시. maxsize(개수), max_bytes(결과 메모리 합계), ttl(초) 기준으로 제거되며
+    테이블 단위로 무효화. max_bytes의 1/8보다 큰 결과는 저장하지 않음 (분봉 등 대용량 조회가 캐시를 밀어내지 않도록)
+    다른 프로세스의 update()는 감지하지 못하므로, ttl 동안은 이전 결과가 반환될 수 있음
+    """
+    def __init__(self, maxsize=256, max_bytes=256 * 1024 * 1024, ttl=60 * 5):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items = OrderedDict()     # key -> (stored_at, table_name, result, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.split()).rstrip(';').strip()
+
+    @staticmethod
+    def copy(result):
+        # 호출한 쪽에서 결과를 수정(inplace)해도 캐시된 원본은 그대로 유지
+        if isinstance(result, pd.DataFrame):    return result.copy()
+        if isinstance(result, tuple):           return result[0][:], result[1][:]
+        return result
+
+    @staticmethod
+    def nbytes(result) -> int:
+        if isinstance(result, pd.DataFrame):    return int(result.memory_usage(index=True, deep=True).sum())
+        if isinstance(result, tuple):
+            columns, rows = result
+            return sys.getsizeof(rows) + sum(sys.getsizeof(row) for row in rows)
+        return sys.getsizeof(result)
+
+    def _pop(self, key):
+        _, _, _, nbytes = self._items.pop(key)
+        self._nbytes -= nbytes
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:    return None
+            stored_at, _, result, _ = item
+            if time.monotonic() - stored_at > self.ttl:
+                self._pop(key)
+                return None
+            self._items.move_to_end(key)
+            return result
+
+    def put(self, key, table_name, result):
+        if self.maxsize <= 0:   return
+        nbytes = self.nbytes(result)
+        if nbytes > self.max_bytes // 8:    return
+        with self._lock:
+            if key in self._items:  self._pop(key)
+            self._items[key] = (time.monotonic(), table_name, result, nbytes)
+            self._nbytes += nbytes
+            while len(self._items) > self.maxsize or self._nbytes > self.max_bytes:
+                self._pop(next(iter(self._items)))
+
+    def invalidate(self, table_name=None):
+        with self._lock:
+            for key in [key for key, item in self._items.items() if table_name is None or item[1] == table_name]:
+                self._pop(key)
+
+
+class Query:
+    """
+    구조화된 SELECT. 조건의 값은 SQL에 넣지 않고 params로 분리하므로, 값만 다른 조회는 같은 SQL(shape)이 되어
+    BaseDB.execute_prepared()에서 연결마다 PREPARE된 statement를 재사용 (재파싱/재플래닝X, SQL injection X)
+    """
+    def __init__(self, table_name: str, columns='*'):
+        self.table_name = table_name
+        self.columns = columns if isinstance(columns, str) else ', '.join(columns)
+        self._conditions = []
+        self._params = []
+        self._orderby = None
+        self._limit = None
+
+    def where(self, condition: str, *values):
+        """ condition : 값 자리를 %s로 쓴 조건식 (예: "tm <= %s"). 여러 번 호출하면 AND로 연결 """
+        self._conditions.append(condition)
+        self._params.extend(values)
+        return self
+
+    def where_in(self, column: str, values, cast: str):
+        """ column = ANY(values). cast : 컬럼 타입 (배열을 컬럼 타입으로 캐스팅해야 인덱스를 사용) """
+        return self.where(f"{column} = ANY(%s::{cast}[])", list(values))
+
+    def where_range(self, column: str, srt=None, end=None):
+        """ srt <= column <= end. None인 쪽은 조건 없음 """
+        if srt is not None:     self.where(f"{column} >= %s", srt)
+        if end is not None:     self.where(f"{column} <= %s", end)
+        return self
+
+    def order_by(self, orderby: str):
+        self._orderby = orderby
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    @property
+    def sql(self) -> str:
+        return f"SELECT {self.columns} FROM {self.table_name}" \
+               f"{(' WHERE ' + ' AND '.join(self._conditions)) if self._conditions else ''}" \
+               f"{(' ORDER BY ' + self._orderby) if self._orderby else ''}" \
+               f"{' LIMIT %s' if self._limit else ''}"
+
+    @property
+    def params(self) -> tuple:
+        return tuple(self._params) + ((self._limit, ) if self._limit else ())
 
 
 class BaseDB:
@@ -17,15 +579,36 @@ class BaseDB:
     SAVE_UPDATE_FILE : 업데이트하기 위하여 내용 다운로드 후 tsv파일 생성
     READ : 기능을 구현
     """
-    connector = PG_CONNECTOR
-    cursor = PG_CURSOR
     TABLE_NAME = "information_schema.tables"
     TABLE_SCHEMA = ""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = ""
+    COLUMN_DTYPES = {}
+    # 다른 디렉토리에서 update()를 실행해도 같은 캐시를 무효화하도록 절대경로 사용 (변경 시에도 절대경로로 지정)
+    LOCAL_CACHE_DIR = os.path.join(os.path.expanduser('~'), 'StockWH', 'local_cache')
+    # 종목별 다운로드 병렬도 및 요청 제한 (max_calls, period_sec).
+    # Creon Plus는 COM 기반이므로 기본값 1(호출한 스레드에서 순차 요청). 스레드에서 호출 가능한 제공자만 늘려서 사용
+    DOWNLOAD_WORKERS = 1
+    DOWNLOAD_RATE_LIMIT = (60, 15)
+    # update 파일/direct ingest 포맷. 'binary'는 update_file_writer()를 쓰는 클래스에서만 사용 가능
+    UPDATE_FILE_FORMAT = 'text'
+    # True이면 dt 기준 월 단위 RANGE 파티션 테이블로 생성 (<table>_pYYYYMM). update() 시 필요한 파티션을 자동 생성
+    PARTITION_BY_MONTH = False
+    PARTITION_MONTHS_AHEAD = 1
+    # update() 전에 먼저 업데이트되어야 하는 테이블 클래스 (UpdateScheduler에서 사용)
+    UPDATE_DEPENDS_ON = ()
+    # 분봉 테이블의 상위 타임프레임 롤업 (예: ('5min', '60min', '1D')). <TABLE_NAME>_<timeframe> 테이블에 유지
+    ROLLUP_TIMEFRAMES = ()
+    # 롤업 집계 규칙 {컬럼: 'first' | 'last' | 'max' | 'min' | 'sum'}. cd, dt, tm을 제외한 모든 컬럼을 지정
+    ROLLUP_AGGREGATES = {}
+    # True이면 cd 대신 코드 사전(CODE_ID_TABLE_NAME)의 정수 cd_id로 저장 (행/PK 인덱스 크기 감소). 기존 테이블은 migrate_to_cd_id()
+    CD_ID_STORAGE = False
+    # True이면 update() 시 적재된 종목코드를 코드 사전에 등록 (코드 사전 테이블이 있을 때만)
+    REGISTER_CODE_IDS = False
+    QUERY_CACHE = QueryCache()
 
     @staticmethod
-    def TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA):
-        """ Convert TABLE_SCHEMA into SQL_TO_UPSERT_FROM_TEMP_TABLE """
+    def PARSE_TABLE_SCHEMA(TABLE_SCHEMA):
+        """ Parse TABLE_SCHEMA into OrderedDict{field_name: [field_type, not_null, is_pk]} """
         # parse step 1.
         field_strings = TABLE_SCHEMA.partition('(')[2].rpartition(')')[0].strip()
         split_strings = []
@@ -55,91 +638,830 @@ class BaseDB:
                 fields[field_name] = [field_type, not_null, is_pk]
 
         for pk_field in pk_fields: fields[pk_field][2] = True
-        del pk_fields
+        return fields
+
+    @staticmethod
+    def TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA):
+        """ Convert TABLE_SCHEMA into COLUMN_DTYPES {field_name: pandas dtype} """
+        dtypes = OrderedDict()
+        for field_name, (field_type, not_null, _) in BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA).items():
+            field_type = field_type.upper()
+            if field_type.startswith('NUMERIC'):
+                dtypes[field_name] = 'float64'
+            elif field_type.startswith('INTEGER'):
+                dtypes[field_name] = 'int32' if not_null else 'Int32'
+            elif field_type.startswith('BIGINT'):
+                dtypes[field_name] = 'int64' if not_null else 'Int64'
+            elif field_type.startswith('CHAR'):     # 종목코드, 구분코드 등 고정길이 코드
+                dtypes[field_name] = 'category'
+            elif field_type.startswith('DATE'):
+                dtypes[field_name] = 'datetime64[ns]'
+            elif field_type == 'TIME':
+                dtypes[field_name] = 'timedelta64[ns]'
+            else:                                   # VARCHAR, TEXT
+                dtypes[field_name] = 'object'
+        return dtypes
+
+    @staticmethod
+    def STAGED_ROWS_SQL(TABLE_NAME, TABLE_SCHEMA, cd_id=False):
+        """
+        temp 테이블에서 PK별로 한 행씩, PK 순으로 읽는 SELECT (temp 테이블에는 PK가 없으므로 중복 키 제거)
+        cd_id=True이면 cd 대신 코드 사전의 cd_id를 읽음 (CD_ID_STORAGE 저장 테이블 컬럼 순서)
+        """
+        fields = BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA)
+        field_names_pk = tuple(field_name for field_name in fields if fields[field_name][2])
+        if not cd_id:
+            return (f"SELECT DISTINCT ON ({', '.join(field_names_pk)}) * FROM temp_{TABLE_NAME} "
+                    f"ORDER BY {', '.join(field_names_pk)}")
+        expr = lambda field_name: 'C.cd_id' if field_name == 'cd' else f'S.{field_name}'
+        return (f"SELECT DISTINCT ON ({', '.join(map(expr, field_names_pk))}) {', '.join(map(expr, fields))} "
+                f"FROM temp_{TABLE_NAME} S JOIN {CODE_ID_TABLE_NAME} C ON C.cd = rtrim(S.cd) "
+                f"ORDER BY {', '.join(map(expr, field_names_pk))}")
+
+    @staticmethod
+    def TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA, cd_id=False):
+        """ Convert TABLE_SCHEMA into SQL_TO_UPSERT_FROM_TEMP_TABLE. cd_id=True : CD_ID_STORAGE 저장 테이블용 """
+        fields = BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA)
+        staged_rows_sql = BaseDB.STAGED_ROWS_SQL(TABLE_NAME, TABLE_SCHEMA, cd_id=cd_id)
+        if cd_id:
+            fields = OrderedDict(('cd_id' if field_name == 'cd' else field_name, field)
+                                 for field_name, field in fields.items())
 
         # construct an UPSERT SQL statement.
         field_names = tuple(fields.keys())
         field_names_pk     = tuple(field_name for field_name in fields if fields[field_name][2])
         field_names_not_pk = tuple(field_name for field_name in fields if not fields[field_name][2])
-        return f"""INSERT INTO {TABLE_NAME} AS T ({', '.join(field_names)}) 
-                    (SELECT * FROM temp_{TABLE_NAME}) 
-                    ON CONFLICT ON CONSTRAINT {TABLE_NAME}_pkey 
+        # PK 순으로 정렬해서 넣음 (인덱스에 순차적으로 삽입)
+        return f"""INSERT INTO {TABLE_NAME}{CD_ID_STORAGE_SUFFIX if cd_id else ''} AS T ({', '.join(field_names)}) 
+                    ({staged_rows_sql}) 
+                    ON CONFLICT ({', '.join(field_names_pk)}) 
                     DO UPDATE 
                     SET {', '.join((' = EXCLUDED.'.join((fn_npk, fn_npk)) for fn_npk in field_names_not_pk))} 
                     WHERE {' AND '.join((' = EXCLUDED.'.join(('T.' + nk_pk, nk_pk)) for nk_pk in field_names_pk))} 
             ;"""
 
+    @staticmethod
+    def TABLE_SCHEMA_TO_PARTITIONED(TABLE_SCHEMA):
+        """ CREATE TABLE 문 끝에 dt 기준 RANGE 파티션 선언을 붙임 (PK에 dt가 포함되어 있어야 함) """
+        return TABLE_SCHEMA.rstrip().rstrip(';').rstrip() + " PARTITION BY RANGE (dt);"
+
+    @staticmethod
+    def PARTITION_NAME(TABLE_NAME, month) -> str:
+        return f"{TABLE_NAME}_p{pd.Period(month, freq='M').strftime('%Y%m')}"
+
+    @staticmethod
+    def TABLE_SCHEMA_TO_CD_ID_SQLS(TABLE_NAME, TABLE_SCHEMA):
+        """
+        CD_ID_STORAGE용 (저장 테이블 CREATE 문, view CREATE 문).
+        저장 테이블 <TABLE_NAME>_data는 cd 대신 cd_id INTEGER를 PK에 포함하고, view <TABLE_NAME>은 코드 사전과 JOIN해서
+        원래 테이블과 같은 컬럼(cd 타입 포함)을 보여주므로 기존 조회 쿼리는 그대로 사용 가능
+        """
+        fields = BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA)
+        storage_name = f"{TABLE_NAME}{CD_ID_STORAGE_SUFFIX}"
+        name = lambda field_name: 'cd_id' if field_name == 'cd' else field_name
+        columns = ', '.join('cd_id INTEGER NOT NULL' if field_name == 'cd' else
+                            f"{field_name} {field_type}{' NOT NULL' if not_null else ''}"
+                            for field_name, (field_type, not_null, _) in fields.items())
+        pk = ', '.join(name(field_name) for field_name in fields if fields[field_name][2])
+        storage_sql = f"CREATE TABLE IF NOT EXISTS {storage_name} ({columns}, PRIMARY KEY({pk}));"
+        view_columns = ', '.join(f"C.cd::{fields['cd'][0]} AS cd" if field_name == 'cd' else f"T.{field_name}"
+                                 for field_name in fields)
+        view_sql = (f"CREATE OR REPLACE VIEW {TABLE_NAME} AS SELECT {view_columns} FROM {storage_name} T "
+                    f"JOIN {CODE_ID_TABLE_NAME} C ON C.cd_id = T.cd_id;")
+        return storage_sql, view_sql
+
+    @staticmethod
+    def TABLE_SCHEMA_TO_STAGING_SQL(TABLE_NAME, TABLE_SCHEMA):
+        """ temp 테이블 생성 SQL. PK/제약조건 없는 TEMPORARY 테이블 (WAL 기록X, COPY 시 인덱스 유지 비용X) """
+        fields = BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA)
+        columns = ', '.join(f"{field_name} {field_type}" for field_name, (field_type, _, _) in fields.items())
+        return f"CREATE TEMPORARY TABLE temp_{TABLE_NAME} ({columns});"
+
+    @staticmethod
+    def TABLE_SCHEMA_TO_APPEND_SQLS(TABLE_NAME, TABLE_SCHEMA, cd_id=False):
+        """
+        temp 테이블의 날짜가 모두 기존 데이터 이후일 때 쓰는 (확인 SQL, append SQL). PK에 dt가 없으면 (None, None)
+        확인 SQL은 PK에서 dt 앞의 컬럼(cd 등)별로 기존 데이터와 겹치는 행이 있는지를 PK 인덱스로 확인
+        cd_id=True : CD_ID_STORAGE 저장 테이블용
+        """
+        fields = BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA)
+        field_names_pk = tuple(field_name for field_name in fields if fields[field_name][2])
+        if 'dt' not in field_names_pk:  return None, None
+        storage_name = f"{TABLE_NAME}{CD_ID_STORAGE_SUFFIX}" if cd_id else TABLE_NAME
+        name = lambda field_name: 'cd_id' if cd_id and field_name == 'cd' else field_name
+        expr = lambda field_name: 'C.cd_id' if cd_id and field_name == 'cd' else f'S.{field_name}'
+        staged = f"temp_{TABLE_NAME} S" + \
+                 (f" JOIN {CODE_ID_TABLE_NAME} C ON C.cd = rtrim(S.cd)" if cd_id else '')
+        prefix = field_names_pk[:field_names_pk.index('dt')]
+        if prefix:
+            overlap = (f"SELECT 1 FROM (SELECT {', '.join(f'{expr(fn)} AS {name(fn)}' for fn in prefix)}, "
+                       f"min(S.dt) AS dt FROM {staged} GROUP BY {', '.join(map(expr, prefix))}) S "
+                       f"WHERE EXISTS (SELECT 1 FROM {storage_name} T WHERE "
+                       f"{' AND '.join(f'T.{name(fn)} = S.{name(fn)}' for fn in prefix)} AND T.dt >= S.dt)")
+        else:
+            overlap = f"SELECT 1 FROM {storage_name} T WHERE T.dt >= (SELECT min(dt) FROM temp_{TABLE_NAME})"
+        check_sql = f"SELECT NOT EXISTS ({overlap}) AS is_append;"
+        append_sql = (f"INSERT INTO {storage_name} ({', '.join(map(name, fields))}) "
+                      f"({BaseDB.STAGED_ROWS_SQL(TABLE_NAME, TABLE_SCHEMA, cd_id=cd_id)});")
+        return check_sql, append_sql
+
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """
+        transaction() 블록 안이면 현재 스레드에 묶인 연결을 그대로 사용.
+        아니면 풀에서 연결을 빌려서 성공 시 commit, 실패 시 rollback 후 반납 (실패한 쿼리가 다른 호출에 영향X)
+        """
+        conn = getattr(_THREAD_LOCAL, 'connection', None)
+        if conn is not None:
+            yield conn
+            return
+        pool = get_pool()
+        conn = pool.getconn()
+        pg.extensions.register_type(NUMERIC_AS_FLOAT, conn)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            _reset_prepared_statements(conn)
+            raise
+        finally:
+            pool.putconn(conn)
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """ with 블록 안의 모든 쿼리를 하나의 연결, 하나의 트랜잭션으로 묶음 (temp 테이블 생성 ~ upsert 등) """
+        if getattr(_THREAD_LOCAL, 'connection', None) is not None:
+            yield _THREAD_LOCAL.connection
+            return
+        with cls.connection() as conn:
+            _THREAD_LOCAL.connection = conn
+            try:
+                yield conn
+            finally:
+                _THREAD_LOCAL.connection = None
+
+    @classmethod
+    @contextmanager
+    def cursor(cls, name=None, time_as_text=False):
+        """ 호출마다 새 커서. name이 주어지면 서버사이드(named) 커서. time_as_text : TIME 컬럼을 문자열로 받음 """
+        with cls.connection() as conn:
+            cursor = conn.cursor(name=name) if name else conn.cursor()
+            if time_as_text:    pg.extensions.register_type(TIME_AS_TEXT, cursor)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
     @classmethod
     def _0_download_update_file(cls): raise NotImplementedError
 
     @classmethod
-    def update(cls):
-        cls._0_download_update_file()
-        cls._1_insert_download_files_into_db()
+    def update_file_writer(cls, tag: str, flush_rows: int = 500000) -> UpdateFileWriter:
+        """
+        update_files\\<CLS>_<tag>.txt 에 차트를 추가하는 writer.
+        update(direct_ingest=True) 중이면 같은 내용을 COPY 중인 파이프에도 바로 흘려보냄
+        """
+        binary = cls.UPDATE_FILE_FORMAT == 'binary'
+        path = f"update_files\\{cls.__name__}_{tag}.{'bin' if binary else 'txt'}"
+        dtypes = list(cls.COLUMN_DTYPES.values()) or None
+        encoder = PGCopy.BinaryCopyEncoder(cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)) if binary else None
+        if cls in _DIRECT_INGEST_PIPES:
+            pipe, keep_update_file = _DIRECT_INGEST_PIPES[cls]
+            pipe.writers += 1
+            # 다운로드와 적재가 겹쳐서 진행되도록 작은 단위로 flush
+            return UpdateFileWriter(path, dtypes=dtypes, flush_rows=min(flush_rows, 50000),
+                                    sinks=(pipe, ), write_file=keep_update_file, encoder=encoder)
+        return UpdateFileWriter(path, dtypes=dtypes, flush_rows=flush_rows, encoder=encoder)
 
     @classmethod
-    def read(cls, columns="*", where=None, groupby=None, limit=None, is_org=False, dtype='df'):
-        query = f"SELECT {columns} FROM {cls.TABLE_NAME}" \
+    def download_concurrently(cls, codes, fetch):
+        """ 클래스 설정(DOWNLOAD_WORKERS, DOWNLOAD_RATE_LIMIT)으로 download_concurrently 실행 """
+        rate_limiter = get_rate_limiter(*cls.DOWNLOAD_RATE_LIMIT) if cls.DOWNLOAD_RATE_LIMIT else None
+        return download_concurrently(codes, fetch, max_workers=cls.DOWNLOAD_WORKERS, rate_limiter=rate_limiter)
+
+    @classmethod
+    def update(cls, direct_ingest=False, keep_update_file=True, timings=None):
+        """
+        direct_ingest=True : 다운로드한 데이터를 파일 대신 메모리 파이프로 COPY에 바로 흘려보내서, 다운로드와 적재를 겹쳐서 진행.
+        keep_update_file=True 이면 감사/재적재(replay)용 update 파일도 함께 남김
+        timings : dict가 주어지면 단계별 소요시간(초)을 기록
+        반환 : temp 테이블에 적재된 행 수
+        """
+        if timings is None:     timings = {}
+        srt = time.perf_counter()
+        if direct_ingest:
+            staged = cls._update_with_direct_ingest(keep_update_file=keep_update_file)
+            timings['download+ingest'] = time.perf_counter() - srt
+        else:
+            cls._0_download_update_file()
+            timings['download'] = time.perf_counter() - srt
+            srt = time.perf_counter()
+            staged = cls._1_insert_download_files_into_db()
+            timings['ingest'] = time.perf_counter() - srt
+        cls.invalidate_caches()
+        return staged
+
+    @classmethod
+    def _update_with_direct_ingest(cls, keep_update_file=True):
+        """ 반환 : temp 테이블에 적재된 행 수 """
+        pipe = PipeFile(binary=cls.UPDATE_FILE_FORMAT == 'binary')
+        staged, errors = [], []
+
+        def ingest():
+            # COPY ~ upsert는 이 스레드의 연결/트랜잭션에서 수행. (메인 스레드는 다운로드 중 다른 쿼리를 자유롭게 사용)
+            try:
+                staged.append(cls._1_insert_download_files_into_db(source=pipe))
+            except BaseException as e:
+                errors.append(e)
+                # 다운로드를 바로 멈추도록 함 (다음 write()에서 BrokenPipeError)
+                pipe.fail()
+
+        ingest_thread = threading.Thread(target=ingest, name=f"{cls.__name__}_direct_ingest")
+        ingest_thread.start()
+        _DIRECT_INGEST_PIPES[cls] = (pipe, keep_update_file)
+        files_before = cls._download_file_mtimes()
+        download_error = None
+        try:
+            cls._0_download_update_file()
+            # update_file_writer()를 쓰지 않고 직접 파일을 만드는 클래스는 이번 다운로드에서 만들어진(수정된) 파일만 파이프로 전달
+            if pipe.writers == 0:
+                path = cls._find_download_file(raise_if_not_found=False, modified_since=files_before)
+                if path is not None:
+                    with open(path, mode='rb') if pipe.binary else open(path, encoding='utf8') as f:
+                        for data in iter(lambda: f.read(1 << 20), pipe.read(0)):  pipe.write(data)
+        except BaseException as e:
+            download_error = e
+            pipe.abort()
+        else:
+            pipe.close()
+        finally:
+            del _DIRECT_INGEST_PIPES[cls]
+            ingest_thread.join()
+        # 적재가 먼저 실패해서 다운로드가 멈춘 경우(BrokenPipeError)는 적재 쪽 예외를 전달
+        if download_error is not None and not (isinstance(download_error, BrokenPipeError) and errors):
+            raise download_error
+        if errors:  raise errors[0]
+        return staged[0]
+
+    @classmethod
+    def invalidate_caches(cls):
+        """ 이 테이블에 대한 인메모리 캐시 제거 """
+        cls.QUERY_CACHE.invalidate(cls.TABLE_NAME)
+        cls.refresh_lazy_properties()
+
+    @classmethod
+    def refresh_lazy_properties(cls):
+        """ DB_END_DT 등 lazy_classproperty로 선언된 메타데이터를 다음 접근 시 다시 조회하도록 초기화 """
+        for klass in cls.__mro__:
+            for attr in vars(klass).values():
+                if isinstance(attr, lazy_classproperty):    attr.refresh(cls)
+
+    @classmethod
+    def read_watermarks(cls, codes=None) -> dict:
+        """
+        종목코드별로 마지막에 저장된 (dt, tm)을 한번의 쿼리로 조회해서 {cd: (dt, tm)}로 반환 (tm 컬럼이 없으면 tm=None)
+        codes가 주어지면 코드별로 PK 인덱스의 마지막 행만 읽음. 저장된 데이터가 없는 코드는 포함되지 않음
+        """
+        fields = cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)
+        tm_field, order = ('tm', 'dt DESC, tm DESC') if 'tm' in fields else ('NULL::time', 'dt DESC')
+        if codes is None:
+            query = f"SELECT DISTINCT ON (cd) cd, dt, {tm_field} FROM {cls.TABLE_NAME} ORDER BY cd, {order};"
+            params = ()
+        else:
+            # 파라미터 배열을 cd 컬럼 타입으로 캐스팅해야 PK 인덱스를 사용
+            query = (f"SELECT C.cd, W.dt, W.tm FROM unnest(%s::{fields['cd'][0]}[]) AS C(cd) "
+                     f"JOIN LATERAL (SELECT dt, {tm_field} AS tm FROM {cls.TABLE_NAME} T WHERE T.cd = C.cd "
+                     f"ORDER BY {order} LIMIT 1) W ON true;")
+            params = ([str(code).strip() for code in codes], )
+        _, rows = cls.execute_prepared(query, params, dtype=list)
+        return {cd.strip(): (dt, tm) for cd, dt, tm in rows}
+
+    @staticmethod
+    def drop_rows_until_watermark(chart: pd.DataFrame, watermark, dt_column='날짜', tm_column='시간'):
+        """
+        다운로드한 chart에서 watermark(dt, tm) 시점 이전(같은 시점 포함) 행을 제거. 이미 저장된 행을 다시 적재하지 않기 위함
+        chart[dt_column]은 'YYYYMMDD', chart[tm_column]은 'HHMM' 또는 'HHMMSS' 문자열
+        """
+        if watermark is None or len(chart) == 0:   return chart
+        dt, tm = watermark
+        if tm is None:
+            return chart[chart[dt_column] > dt.strftime('%Y%m%d')]
+        watermark_key = dt.strftime('%Y%m%d') + str(tm).replace(':', '')[:6]
+        return chart[(chart[dt_column] + chart[tm_column].str.ljust(6, '0')) > watermark_key]
+
+    @classmethod
+    def read_max_dt(cls):
+        return cls.execute_query(f"SELECT max(dt) FROM {cls.TABLE_NAME};")['max'][0]
+
+    @classmethod
+    def read(cls, columns="*", where=None, groupby=None, limit=None, is_org=False, dtype='df', chunksize=None,
+             engine='fetchall', use_cache=False, timeframe=None):
+        """
+        chunksize가 주어지면 chunksize 행 단위의 DataFrame 제너레이터를 반환.
+            CHAR(category) 컬럼의 범주는 chunk마다 다르므로 pd.concat하면 object(str)가 됨 -> 합친 후 astype('category')
+        engine='copy' : COPY (SELECT ~) TO STDOUT 결과를 TABLE_SCHEMA 타입대로 바로 파싱 (대량 조회용)
+        use_cache : 같은 쿼리의 결과를 QUERY_CACHE에서 재사용 (chunksize 사용 시 제외). 작은 테이블의 반복 조회용
+        timeframe : ROLLUP_TIMEFRAMES 중 하나이면 해당 롤업 테이블에서 조회 (예: '15min')
+        where는 SQL 문자열 그대로 사용되므로, 값이 바뀌며 반복 조회하는 경우는 select() / read_query() 사용
+        """
+        table_name = cls.TABLE_NAME if timeframe is None else cls.rollup_table_name(timeframe)
+        query = f"SELECT {columns} FROM {table_name}" \
                 f"{(' WHERE ' + where) if where else ''}" \
                 f"{(' GROUP BY ' + groupby) if groupby else ''}" \
                 f"{(' LIMIT %d' % limit) if limit else ''};"
-        result = cls.execute_query(query, dtype=dtype)
+        if engine == 'copy':
+            if chunksize or dtype not in ('df', 'DF', pd.DataFrame):
+                raise AttributeError("engine='copy' only supports dtype='df' without chunksize")
+            result = cls.execute_copy_query(query)
+        elif engine == 'fetchall' and use_cache and not chunksize:
+            result = cls._execute_cached_query(query, dtype=dtype, time_as_text=cls._time_as_text(columns, is_org))
+        elif engine == 'fetchall':
+            result = cls.execute_query(query, dtype=dtype, chunksize=chunksize,
+                                       time_as_text=cls._time_as_text(columns, is_org))
+        else:
+            raise AttributeError("the attribute engine is not one of these (fetchall, copy)")
         if is_org:  return result
+        if chunksize:
+            return (cls._postprocess(chunk) for chunk in result)
+        return cls._postprocess(result)
+
+    @classmethod
+    def _time_as_text(cls, columns: str, is_org=False) -> bool:
+        """
+        TIME을 문자열로 받을지 여부. _postprocess는 COLUMN_DTYPES의 TIME 컬럼만 timedelta64로 변환하므로,
+        선택한 컬럼이 모두 COLUMN_DTYPES의 컬럼일 때만 (max(tm) 같은 계산식이 있으면 datetime.time 그대로)
+        """
+        if is_org:  return False
+        return columns.strip() == '*' or all(column.strip() in cls.COLUMN_DTYPES for column in columns.split(','))
+
+    @classmethod
+    def query(cls, columns='*', timeframe=None) -> Query:
+        """ 이 테이블(timeframe이 주어지면 롤업 테이블)에 대한 Query. read_query()로 실행 """
+        return Query(cls.TABLE_NAME if timeframe is None else cls.rollup_table_name(timeframe), columns)
+
+    @classmethod
+    def select(cls, columns='*', cd=None, srtdt=None, enddt=None, srttm=None, endtm=None, orderby=None, limit=None,
+               timeframe=None, is_org=False, dtype='df', use_cache=False):
+        """
+        cd(코드 하나 또는 목록), dt/tm 범위(양끝 포함, tm은 'HH:MM:SS'), 정렬, limit으로 조회.
+        값은 파라미터로 전달되어 같은 형태의 조회는 prepared statement를 재사용 (종목/날짜별 반복 조회 루프용)
+        """
+        query = cls.query(columns, timeframe=timeframe)
+        if isinstance(cd, str):
+            query.where("cd = %s", cd.strip())
+        elif cd is not None:
+            query.where_in('cd', [str(each).strip() for each in cd], cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)['cd'][0])
+        query.where_range('dt', DTC.date_to_str(srtdt) if srtdt else None, DTC.date_to_str(enddt) if enddt else None)
+        query.where_range('tm', srttm, endtm)
+        if orderby:     query.order_by(orderby)
+        if limit:       query.limit(limit)
+        return cls.read_query(query, is_org=is_org, dtype=dtype, use_cache=use_cache)
+
+    @classmethod
+    def read_query(cls, query: Query, is_org=False, dtype='df', use_cache=False):
+        """ Query를 prepared statement로 실행. use_cache : 같은 SQL, 같은 값의 결과를 QUERY_CACHE에서 재사용 """
+        time_as_text = cls._time_as_text(query.columns, is_org)
+        if use_cache:
+            key = (cls.TABLE_NAME, QueryCache.normalize(query.sql), repr(query.params), str(dtype), time_as_text)
+            result = cls.QUERY_CACHE.get(key)
+            if result is None:
+                result = cls.execute_prepared(query.sql, query.params, dtype=dtype, time_as_text=time_as_text)
+                cls.QUERY_CACHE.put(key, cls.TABLE_NAME, result)
+            result = QueryCache.copy(result)
+        else:
+            result = cls.execute_prepared(query.sql, query.params, dtype=dtype, time_as_text=time_as_text)
+        if is_org:  return result
+        return cls._postprocess(result)
+
+    @classmethod
+    def read_panel(cls, codes, fields=('close', ), srtdt=None, enddt=None, as_frame=True, chunksize=500000):
+        """
+        여러 종목의 fields를 (시점 x 종목) 2차원 배열로 조회. 종목별 쿼리/pivot 없이, 한번의 서버사이드 커서 조회 결과를
+        chunksize 행씩 읽어서 (종목 인덱스, 시점, 값) 배열로 모은 뒤, 시점 인덱스를 만들고 2차원 배열에 한번에 채움.
+        값이 없는 칸은 NaN
+        시점은 dt (tm 컬럼이 있는 테이블은 dt + tm). CD_ID_STORAGE 테이블은 저장 테이블을 cd_id로 직접 조회 (행마다 문자열 생성X)
+        반환 : as_frame=True -> {field: DataFrame(index=시점, columns=codes)}
+               as_frame=False -> (시점 DatetimeIndex, codes, {field: np.ndarray(float64)})
+               codes는 중복을 제거한 순서 그대로 (CD_ID_STORAGE 테이블은 코드 사전에 없는 코드 제외)
+        """
+        if isinstance(fields, str):     fields = (fields, )
+        schema = cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)
+        codes = list(dict.fromkeys(str(code).strip() for code in codes))
+        if cls.CD_ID_STORAGE:
+            code_ids = cls.code_ids(codes)
+            codes = [code for code in codes if code in code_ids]
+            table_name, cd_field, params = cls.storage_table_name(), 'cd_id', [code_ids[code] for code in codes]
+            where = "cd_id = ANY(%s::integer[])"
+        else:
+            table_name, cd_field, params = cls.TABLE_NAME, 'rtrim(cd)', codes
+            where = f"cd = ANY(%s::{schema['cd'][0]}[])"
+        code_index = pd.Index(params)
+        params = [params]
+        if srtdt:
+            where += " AND dt >= %s"
+            params.append(DTC.date_to_str(srtdt))
+        if enddt:
+            where += " AND dt <= %s"
+            params.append(DTC.date_to_str(enddt))
+        # 시점은 DB에서 정수(1970-01-01 기준 일수 / 마이크로초)로 받아서 행마다 날짜/시각 객체를 만들거나 파싱하지 않음
+        if 'tm' in schema:
+            time_sql, unit, index_name = "(extract(epoch FROM dt + tm) * 1000000)::bigint", 'us', 'dttm'
+        else:
+            time_sql, unit, index_name = "dt - DATE '1970-01-01'", 'D', 'dt'
 
+        # 1. 한번의 조회로 chunk마다 (종목 인덱스, 시점, 값) 배열만 모아둠
+        col_parts, time_parts, value_parts = [], [], {field: [] for field in fields}
+        with cls.cursor(name=f"{cls.__name__.lower()}_panel_{next(_NAMED_CURSOR_COUNTER)}") as cursor:
+            cursor.itersize = chunksize
+            cursor.execute(f"SELECT {cd_field}, {time_sql}, {', '.join(fields)} FROM {table_name} WHERE {where};",
+                           params)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:    break
+                columns = list(zip(*rows))
+                col_parts.append(code_index.get_indexer(columns[0]))
+                time_parts.append(np.asarray(columns[1], dtype='int64'))
+                for field, values in zip(fields, columns[2:]):
+                    value_parts[field].append(np.asarray(values, dtype='float64'))
+
+        # 2. 시점 인덱스 = 정렬된 고유 시점. 각 행의 시점 위치는 같은 np.unique의 inverse
+        concat = lambda parts, dtype: np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        unique_times, row_idx = np.unique(concat(time_parts, 'int64'), return_inverse=True)
+        index = pd.DatetimeIndex(unique_times.astype(f'datetime64[{unit}]').astype('datetime64[ns]'), name=index_name)
+        col_idx = concat(col_parts, 'int64')
+        arrays = {}
+        for field in fields:
+            arrays[field] = np.full((len(index), len(codes)), np.nan)
+            arrays[field][row_idx, col_idx] = concat(value_parts[field], 'float64')
+
+        if not as_frame:    return index, codes, arrays
+        return {field: pd.DataFrame(array, index=index, columns=codes) for field, array in arrays.items()}
+
+    @classmethod
+    def _postprocess(cls, result):
+        """ read() 결과(또는 chunk 하나)에 대한 후처리. Readable 믹스인들이 super()로 이어서 확장 """
+        return cls._apply_column_dtypes(result)
+
+    @staticmethod
+    def _fits_int32(values: pd.Series) -> bool:
+        if not pd.api.types.is_numeric_dtype(values) or values.isna().all():   return True
+        info = np.iinfo('int32')
+        return info.min <= values.min() and values.max() <= info.max
+
+    @classmethod
+    def _apply_column_dtypes(cls, result):
         if isinstance(result, pd.DataFrame):
-            if 'dt' in result.columns:
-                result['dt'] = pd.to_datetime(result['dt'])
+            for col, col_dtype in cls.COLUMN_DTYPES.items():
+                if col not in result.columns or str(result[col].dtype) == col_dtype: continue
+                # pandas 2+는 입력에 따라 해상도(s/us/ns)를 추론하므로 스키마 dtype으로 맞춤 (fetchall/copy 결과가 같도록)
+                if col_dtype == 'datetime64[ns]':
+                    result[col] = pd.to_datetime(result[col]).astype(col_dtype)
+                elif col_dtype == 'timedelta64[ns]':
+                    # 고유한 시각(하루 최대 86400개)만 변환해서 펼침 (행마다 문자열을 파싱하지 않음). NULL은 codes -1 -> NaT
+                    codes, uniques = pd.factorize(result[col])
+                    # is_org=True로 읽은 결과(datetime.time)를 나중에 변환하는 경우 (read_local 등)
+                    if len(uniques) and isinstance(uniques[0], datetime.time):
+                        uniques = [each.isoformat() for each in uniques]
+                    converted = np.append(pd.to_timedelta(uniques).values.astype(col_dtype), np.timedelta64('NaT'))
+                    result[col] = pd.Series(converted[codes], index=result.index)
+                elif col_dtype == 'int32' and not cls._fits_int32(result[col]):
+                    # 롤업 테이블의 sum 컬럼(BIGINT) 등 INTEGER 범위를 넘는 값은 int64로
+                    result[col] = result[col].astype('Int64' if result[col].isna().any() else 'int64')
+                elif col_dtype in ('int32', 'int64') and result[col].isna().any():
+                    # NOT NULL 컬럼이어도 집계(빈 그룹의 max() 등)나 OUTER JOIN 결과는 NULL일 수 있음 -> nullable 정수
+                    result[col] = result[col].astype(col_dtype.capitalize())
+                else:
+                    result[col] = result[col].astype(col_dtype)
+            if 'dt' in result.columns and 'dt' not in cls.COLUMN_DTYPES:
+                result['dt'] = pd.to_datetime(result['dt']).astype('datetime64[ns]')
         return result
 
+    @classmethod
+    def read_local(cls, srtdt, enddt=None, cd=None, is_org=False):
+        """
+        (테이블, cd, 월) 단위 로컬 Parquet 캐시를 거쳐서 읽기.
+        지나간 달의 파티션은 최초 조회 시 캐시에 저장되고 이후에는 DB 조회 없이 파일에서 읽음. 이번 달은 항상 DB에서 조회.
+        """
+        if not LocalCache.is_available():
+            raise ModuleNotFoundError("pyarrow is required to use read_local()")
+        if 'dt' not in cls.COLUMN_DTYPES or (cd is not None and 'cd' not in cls.COLUMN_DTYPES):
+            raise AttributeError(f"{cls.__name__} can not be partitioned by (cd, dt)")
+        srtdt = pd.Timestamp(DTC.date_to_obj(srtdt)).normalize()
+        enddt = pd.Timestamp(DTC.date_to_obj(enddt if enddt else DTC.today())).normalize()
+        this_month = pd.Timestamp(DTC.today()).to_period('M')
+
+        charts = []
+        for month in pd.period_range(srtdt, enddt, freq='M'):
+            is_closed_month = month < this_month
+            chart = LocalCache.read_partition(cls.LOCAL_CACHE_DIR, cls.TABLE_NAME, cd, month) \
+                if is_closed_month else None
+            if chart is None:
+                chart = cls._apply_column_dtypes(cls.select(cd=cd, srtdt=month.start_time.date(),
+                                                            enddt=month.end_time.date(), is_org=True, use_cache=False))
+                if is_closed_month:
+                    LocalCache.write_partition(cls.LOCAL_CACHE_DIR, cls.TABLE_NAME, cd, month, chart)
+            charts.append(chart)
+
+        chart = pd.concat(charts, axis=0, ignore_index=True)
+        chart = chart[(chart['dt'] >= srtdt) & (chart['dt'] <= enddt)]
+        chart = chart.sort_values([col for col in ('cd', 'dt', 'tm') if col in chart.columns], ignore_index=True)
+        if is_org:  return chart
+        return cls._postprocess(chart)
 
     @classmethod
-    def execute_query(cls, query: str, dtype='df'):
-        # execute the query
-        cls.cursor.execute(query)
-        query = query.strip().lower()
+    def execute_query(cls, query: str, dtype='df', chunksize=None, time_as_text=False):
+        if chunksize:
+            if dtype not in ('df', 'DF', pd.DataFrame, list):
+                raise AttributeError("the attribute dtype is not one of these (df, list)")
+            if not query.strip().lower().startswith('select '):
+                raise ValueError("chunksize is only available with SELECT queries")
+            return cls._execute_query_in_chunks(query, dtype=dtype, chunksize=chunksize, time_as_text=time_as_text)
+
+        with cls.cursor(time_as_text=time_as_text) as cursor:
+            # execute the query
+            cursor.execute(query)
+            query = query.strip().lower()
 
-        if query.startswith('select '):
-            # get field_names(columns)
-            columns = [desc[0] for desc in cls.cursor.description]
+            if query.startswith('select '):
+                # get field_names(columns)
+                columns = [desc[0] for desc in cursor.description]
 
-            # return columns, data
+                # return columns, data
+                if dtype in ('df', 'DF', pd.DataFrame):
+                    return pd.DataFrame(cursor.fetchall(), columns=columns)
+                elif dtype in (list, ):
+                    return columns, cursor.fetchall()
+                else:
+                    raise AttributeError("the attribute dtype is not one of these (df, list)")
+            else:
+                return None
+
+    @classmethod
+    def execute_prepared(cls, query: str, params=(), dtype='df', time_as_text=False):
+        """
+        SELECT query(psycopg2 형식 %s 파라미터)를 연결마다 한번만 PREPARE하고, 이후 같은 query는 EXECUTE로 값만 전달
+        (서버가 같은 형태의 쿼리를 다시 파싱/플래닝하지 않음). statement 이름은 query의 해시
+        """
+        query = query.strip().rstrip(';')
+        name = f"stmt_{hashlib.md5(query.encode('utf8')).hexdigest()[:16]}"
+        params = tuple(params)
+        with cls.connection() as conn, conn.cursor() as cursor:
+            if time_as_text:    pg.extensions.register_type(TIME_AS_TEXT, cursor)
+            with _PREPARED_LOCK:
+                prepared = _PREPARED_STATEMENTS.setdefault(conn, set())
+            if name not in prepared:
+                cursor.execute(f"PREPARE {name} AS {_to_positional_params(query)};")
+                prepared.add(name)
+            if params:
+                cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params)
+            else:
+                cursor.execute(f"EXECUTE {name};")
+            columns = [desc[0] for desc in cursor.description]
             if dtype in ('df', 'DF', pd.DataFrame):
-                return pd.DataFrame(cls.cursor.fetchall(), columns=columns)
+                return pd.DataFrame(cursor.fetchall(), columns=columns)
             elif dtype in (list, ):
-                return columns, cls.cursor.fetchall()
+                return columns, cursor.fetchall()
             else:
                 raise AttributeError("the attribute dtype is not one of these (df, list)")
-        else:
-            return None
 
     @classmethod
-    def _1_insert_download_files_into_db(cls):
+    def _execute_cached_query(cls, query: str, dtype='df', time_as_text=False):
+        key = (cls.TABLE_NAME, QueryCache.normalize(query), str(dtype), time_as_text)
+        result = cls.QUERY_CACHE.get(key)
+        if result is None:
+            result = cls.execute_query(query, dtype=dtype, time_as_text=time_as_text)
+            cls.QUERY_CACHE.put(key, cls.TABLE_NAME, result)
+        return QueryCache.copy(result)
+
+    @classmethod
+    def execute_copy_query(cls, query: str, params=None):
+        """
+        COPY (query) TO STDOUT (CSV) -> 메모리 버퍼 -> pd.read_csv. 셀마다 파이썬 객체를 만들지 않음
+        params : query의 %s 자리에 바인딩할 값 (COPY는 PREPARE할 수 없으므로 클라이언트에서 이스케이프해서 바인딩)
+        """
+        buffer = io.StringIO()
+        with cls.cursor() as cursor:
+            if params is not None:
+                query = cursor.mogrify(query, params).decode(pg.extensions.encodings[cursor.connection.encoding])
+            # NULL은 \N으로 받아서 빈 문자열('')과 구분
+            cursor.copy_expert(f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')",
+                               buffer)
+        buffer.seek(0)
+        columns = next(csv.reader([buffer.readline()]))
+        buffer.seek(0)
+
+        dtypes = {col: cls.COLUMN_DTYPES[col] for col in columns if col in cls.COLUMN_DTYPES}
+        # TIME 컬럼은 문자열로 읽은 후 _postprocess에서 timedelta64로 변환
+        # 정수 컬럼은 NULL이 있어도 읽히도록 nullable 정수로 읽고, NULL이 없으면 _apply_column_dtypes에서 int로 변환
+        # INTEGER 컬럼도 Int64로 읽음 (롤업 테이블의 sum 컬럼은 BIGINT)
+        read_dtypes = {'timedelta64[ns]': 'object', 'int32': 'Int64', 'int64': 'Int64'}
+        return pd.read_csv(buffer,
+                           dtype={col: read_dtypes.get(dtype, dtype)
+                                  for col, dtype in dtypes.items() if dtype != 'datetime64[ns]'},
+                           parse_dates=[col for col, dtype in dtypes.items() if dtype == 'datetime64[ns]'],
+                           keep_default_na=False, na_values=['\\N'])
+
+    @classmethod
+    def _execute_query_in_chunks(cls, query: str, dtype='df', chunksize=100000, time_as_text=False):
+        """ 서버사이드(named) 커서로 chunksize 행씩 fetchmany 하여 yield. 메모리 사용량이 chunksize로 제한됨 """
+        # 제너레이터가 끝나거나 close될 때까지 연결 하나를 점유
+        with cls.cursor(name=f"{cls.__name__.lower()}_cursor_{next(_NAMED_CURSOR_COUNTER)}",
+                        time_as_text=time_as_text) as cursor:
+            cursor.itersize = chunksize
+            cursor.execute(query)
+            columns = None
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                # named 커서는 첫 fetch 이후에 description이 채워짐
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+                if not rows: break
+                if dtype in (list, ):
+                    yield columns, rows
+                else:
+                    yield pd.DataFrame(rows, columns=columns)
+
+    @classmethod
+    def _1_insert_download_files_into_db(cls, source=None) -> int:
+        """ source : update 파일 대신 COPY할 file-like 객체 (direct ingest 시 PipeFile). 반환 : temp 테이블에 적재된 행 수 """
         print(f"{cls.__name__} UPDATE : START")
-        #cls.rollback()
-        # 1. create a temp table
-        cls._1_0_drop_temp_table()
-        cls._1_1_create_temp_table()
-        # 2. copy download data into the table
-        cls._1_2_copy_from_download_file()
-        # 3. upsert into the original table.
-        cls._1_3_upsert_data()
-        # 4. drop the temp table.
-        cls._1_0_drop_temp_table()
+        if source is None:
+            path = cls._find_download_file()
+            binary = path.endswith('.bin')
+        else:
+            binary = getattr(source, 'binary', False)
+        # 한 연결, 한 트랜잭션 안에서 수행 (블록이 정상 종료되면 COMMIT, 예외 발생 시 ROLLBACK)
+        with cls.transaction():
+            # 1. create a temp table
+            cls._1_0_drop_temp_table()
+            cls._1_1_create_temp_table(binary=binary)
+            # 2. copy download data into the table
+            if source is None:
+                cls._1_2_copy_from_download_file(path)
+            else:
+                cls._1_2_copy_from_stream(source)
+            # 3. upsert into the original table. (새로 들어온 행이 없으면 생략)
+            staged = cls._1_2_count_staged_rows()
+            if staged > 0:
+                cls._1_2_register_codes()
+                cls._1_2_create_partitions()
+                cls._1_3_upsert_data()
+                cls._1_4_refresh_derived_data()
+            # 4. drop the temp table.
+            cls._1_0_drop_temp_table()
         print(f"{cls.__name__} UPDATE : END")
-        cls.execute_query("COMMIT;")
+        return staged
 
     @classmethod
     def create_cls_table(cls):
         print(f"    {cls.__name__} : CLS_TABLE_CREATION COMMAND : START")
         TABLE_SCHEMA = cls.TABLE_SCHEMA.replace('\n', '')
+        if cls.CD_ID_STORAGE:
+            cls.create_code_id_table()
+            TABLE_SCHEMA, view_sql = cls.TABLE_SCHEMA_TO_CD_ID_SQLS(cls.TABLE_NAME, TABLE_SCHEMA)
+        if cls.PARTITION_BY_MONTH:
+            TABLE_SCHEMA = cls.TABLE_SCHEMA_TO_PARTITIONED(TABLE_SCHEMA)
         cls.execute_query(TABLE_SCHEMA)
+        if cls.CD_ID_STORAGE:
+            cls.execute_query(view_sql)
+        if cls.PARTITION_BY_MONTH:
+            cls.create_partitions(DTC.today(), DTC.today())
+        cls.create_rollup_tables()
         print(f"    {cls.__name__} : CLS_TABLE_CREATION COMMAND : END")
 
     @classmethod
-    def _1_1_create_temp_table(cls):
+    def storage_table_name(cls) -> str:
+        """ 실제로 행이 저장되는 테이블 (CD_ID_STORAGE이면 <TABLE_NAME>_data, 아니면 TABLE_NAME) """
+        return f"{cls.TABLE_NAME}{CD_ID_STORAGE_SUFFIX}" if cls.CD_ID_STORAGE else cls.TABLE_NAME
+
+    @classmethod
+    def create_code_id_table(cls):
+        cls.execute_query(CODE_ID_TABLE_SCHEMA.replace('\n', ''))
+
+    @classmethod
+    def code_ids(cls, codes=None) -> dict:
+        """ 코드 사전에서 {cd: cd_id} 조회. codes가 주어지면 해당 코드만 (사전에 없는 코드는 포함되지 않음) """
+        with cls.cursor() as cursor:
+            if codes is None:
+                cursor.execute(f"SELECT cd, cd_id FROM {CODE_ID_TABLE_NAME};")
+            else:
+                cursor.execute(f"SELECT cd, cd_id FROM {CODE_ID_TABLE_NAME} WHERE cd = ANY(%s);",
+                               ([str(code).strip() for code in codes], ))
+            return dict(cursor.fetchall())
+
+    @classmethod
+    def migrate_to_cd_id(cls):
+        """
+        cd로 저장된 기존 테이블을 cd_id 저장 테이블(<TABLE_NAME>_data) + view(<TABLE_NAME>)로 옮김.
+        클래스의 CD_ID_STORAGE를 True로 바꾼 뒤 한번 실행. 한 트랜잭션에서 수행되므로 실패 시 기존 테이블이 그대로 남음
+        """
+        if not cls.CD_ID_STORAGE:
+            raise AttributeError(f"set {cls.__name__}.CD_ID_STORAGE = True before the migration")
+        print(f"    {cls.__name__} : MIGRATE TO CD_ID : START")
+        fields = cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)
+        old_table_name = f"{cls.TABLE_NAME}_old"
+        with cls.transaction():
+            cls.create_code_id_table()
+            cls.execute_query(f"INSERT INTO {CODE_ID_TABLE_NAME} (cd) SELECT DISTINCT rtrim(cd) FROM {cls.TABLE_NAME} "
+                              f"ORDER BY 1 ON CONFLICT (cd) DO NOTHING;")
+            cls.execute_query(f"ALTER TABLE {cls.TABLE_NAME} RENAME TO {old_table_name};")
+            cls.create_cls_table()
+            if cls.PARTITION_BY_MONTH:
+                _, ((srtdt, enddt), ) = cls.execute_query(f"SELECT min(dt), max(dt) FROM {old_table_name};",
+                                                          dtype=list)
+                if srtdt is not None:   cls.create_partitions(srtdt, enddt)
+            columns = ', '.join('C.cd_id' if field_name == 'cd' else f'O.{field_name}' for field_name in fields)
+            cls.execute_query(f"INSERT INTO {cls.storage_table_name()} "
+                              f"SELECT {columns} FROM {old_table_name} O JOIN {CODE_ID_TABLE_NAME} C "
+                              f"ON C.cd = rtrim(O.cd);")
+            cls.execute_query(f"DROP TABLE {old_table_name};")
+        cls.invalidate_caches()
+        print(f"    {cls.__name__} : MIGRATE TO CD_ID : END")
+
+    @classmethod
+    def migrate_to_partitioned(cls):
+        """
+        일반 테이블로 만들어진 기존 테이블을 월 파티션 테이블로 옮김. (PARTITION_BY_MONTH는 새로 만드는 테이블에만 적용되므로)
+        클래스의 PARTITION_BY_MONTH를 True로 바꾼 뒤 한번 실행. 한 트랜잭션에서 수행되므로 실패 시 기존 테이블이 그대로 남음
+        """
+        if not cls.PARTITION_BY_MONTH:
+            raise AttributeError(f"set {cls.__name__}.PARTITION_BY_MONTH = True before the migration")
+        if cls.is_partitioned():
+            print(f"    {cls.__name__} : MIGRATE TO PARTITIONED : ALREADY PARTITIONED")
+            return
+        print(f"    {cls.__name__} : MIGRATE TO PARTITIONED : START")
+        storage_table_name = cls.storage_table_name()
+        old_table_name = f"{storage_table_name}_old"
+        with cls.transaction():
+            cls.execute_query(f"ALTER TABLE {storage_table_name} RENAME TO {old_table_name};")
+            # 새 테이블의 PK 이름(<table>_pkey)과 겹치지 않도록 기존 PK도 이름 변경
+            cls.execute_query(f"ALTER TABLE {old_table_name} "
+                              f"RENAME CONSTRAINT {storage_table_name.lower()}_pkey TO {old_table_name.lower()}_pkey;")
+            # CD_ID_STORAGE이면 view도 새 저장 테이블을 보도록 다시 생성됨
+            cls.create_cls_table()
+            _, ((srtdt, enddt), ) = cls.execute_query(f"SELECT min(dt), max(dt) FROM {old_table_name};", dtype=list)
+            if srtdt is not None:   cls.create_partitions(srtdt, enddt)
+            cls.execute_query(f"INSERT INTO {storage_table_name} SELECT * FROM {old_table_name};")
+            cls.execute_query(f"DROP TABLE {old_table_name};")
+        cls.invalidate_caches()
+        print(f"    {cls.__name__} : MIGRATE TO PARTITIONED : END")
+
+    @classmethod
+    def is_partitioned(cls) -> bool:
+        query = (f"SELECT EXISTS (SELECT 1 FROM pg_partitioned_table P JOIN pg_class C ON C.oid = P.partrelid "
+                 f"WHERE C.relname = '{cls.storage_table_name().lower()}');")
+        return cls.execute_query(query, dtype=list)[1][0][0]
+
+    @classmethod
+    def partition_list(cls):
+        """ 현재 붙어있는 월 파티션 테이블명 목록 """
+        query = (f"SELECT C.relname FROM pg_inherits I JOIN pg_class C ON C.oid = I.inhrelid "
+                 f"JOIN pg_class P ON P.oid = I.inhparent WHERE P.relname = '{cls.storage_table_name().lower()}';")
+        return sorted(each[0] for each in cls.execute_query(query, dtype=list)[1])
+
+    @classmethod
+    def create_partitions(cls, srtdt, enddt):
+        """ srtdt ~ enddt(+ PARTITION_MONTHS_AHEAD개월)의 월 파티션을 생성. 이미 있으면 건너뜀 """
+        srt_month = pd.Timestamp(DTC.date_to_obj(srtdt)).to_period('M')
+        end_month = pd.Timestamp(DTC.date_to_obj(enddt)).to_period('M') + cls.PARTITION_MONTHS_AHEAD
+        storage_table_name = cls.storage_table_name()
+        for month in pd.period_range(srt_month, end_month, freq='M'):
+            cls.execute_query(
+                f"CREATE TABLE IF NOT EXISTS {cls.PARTITION_NAME(storage_table_name, month)} "
+                f"PARTITION OF {storage_table_name} "
+                f"FOR VALUES FROM ('{month.start_time.date()}') TO ('{(month + 1).start_time.date()}');")
+
+    @classmethod
+    def detach_partition(cls, month, backup_dir=None, drop=False):
+        """
+        month의 파티션을 원본 테이블에서 떼어냄 (지난 데이터 보관/정리용). 떼어낸 테이블은 일반 테이블로 남는다.
+        backup_dir이 주어지면 떼어내기 전에 파티션 내용을 파일로 백업, drop=True이면 떼어낸 테이블을 삭제
+        """
+        month = pd.Period(month, freq='M')
+        partition_name = cls.PARTITION_NAME(cls.storage_table_name(), month)
+        if backup_dir is not None:
+            # 원래 테이블(view)의 컬럼으로 백업 (CD_ID_STORAGE이어도 cd가 복원된 형태)
+            os.makedirs(backup_dir, exist_ok=True)
+            # COPY는 PREPARE할 수 없으므로 날짜는 클라이언트에서 이스케이프해서 바인딩 (execute_copy_query와 같은 방식)
+            with open(os.path.join(backup_dir, f"{partition_name}.txt"), mode='w') as f, cls.cursor() as cursor:
+                query = cursor.mogrify(f"SELECT * FROM {cls.TABLE_NAME} WHERE dt >= %s AND dt < %s",
+                                       (month.start_time.date(), (month + 1).start_time.date()))
+                query = query.decode(pg.extensions.encodings[cursor.connection.encoding])
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT text, NULL '')", f)
+        cls.execute_query(f"ALTER TABLE {cls.storage_table_name()} DETACH PARTITION {partition_name};")
+        if drop:
+            cls.execute_query(f"DROP TABLE {partition_name};")
+        cls.invalidate_caches()
+
+    @classmethod
+    def _1_1_create_temp_table(cls, binary=False):
+        """ binary : COPY binary 적재용. NUMERIC 컬럼을 float8로 만들어 고정길이로 적재 (upsert 시 NUMERIC으로 변환) """
         print(f"    {cls.__name__} : TEMP_TABLE_CREATION COMMAND : START")
-        _TEMP_TABLE_SCHEMA = cls.TABLE_SCHEMA.replace(cls.TABLE_NAME, f"temp_{cls.TABLE_NAME}")
-        cls.execute_query(_TEMP_TABLE_SCHEMA)
+        TABLE_SCHEMA = PGCopy.staging_schema(cls.TABLE_SCHEMA) if binary else cls.TABLE_SCHEMA
+        cls.execute_query(cls.TABLE_SCHEMA_TO_STAGING_SQL(cls.TABLE_NAME, TABLE_SCHEMA))
         print(f"    {cls.__name__} : TEMP_TABLE_CREATION COMMAND : END")
 
     @classmethod
@@ -150,25 +1472,204 @@ class BaseDB:
         print(f"    {cls.__name__} : DROP_TEMP_TABLE COMMAND : END")
 
     @classmethod
-    def _1_2_copy_from_download_file(cls):
+    def _download_file_mtimes(cls) -> dict:
+        """ update_files\\ 에 있는 이 클래스의 update 파일 경로 -> 수정시각(ns) """
+        if not os.path.isdir('update_files\\'):  return {}
+        is_this_file = lambda x: x.startswith(f"{cls.__name__.upper()}") and x.endswith(('.txt', '.bin'))
+        return {f'update_files\\{file}': os.stat(f'update_files\\{file}').st_mtime_ns
+                for file in os.listdir('update_files\\') if is_this_file(file)}
+
+    @classmethod
+    def _find_download_file(cls, raise_if_not_found=True, modified_since: dict = None):
+        """ modified_since : _download_file_mtimes() 결과. 주어지면 그 이후 새로 만들어지거나 수정된 파일만 찾음 """
+        files = cls._download_file_mtimes()
+        if modified_since is not None:
+            files = {path: mtime for path, mtime in files.items() if modified_since.get(path) != mtime}
+            if len(files) > 1:
+                raise ValueError(f"{cls.__name__} : more than one update file was written : {sorted(files)}")
+
+        if files:
+            return next(iter(files))
+        elif raise_if_not_found:
+            raise FileNotFoundError(f'NO_FILE : {cls.__name__.upper()}')
+        return None
+
+    @classmethod
+    def _1_2_copy_from_download_file(cls, path=None):
         print(f"    {cls.__name__} : COPY_FROM COMMAND : START")
-        files = os.listdir('update_files\\')
-        is_this_file = lambda x: x.startswith(f"{cls.__name__.upper()}") and x.endswith('.txt')
-
-        if any(is_this_file(file) for file in files):
-            this_file = [file for file in files if is_this_file(file)][0]
-            with open(f'update_files\\{this_file}', encoding='utf8') as f:
-                cls.cursor.copy_from(f, f'temp_{cls.TABLE_NAME.lower()}', null='')
-            print(f"    {cls.__name__} : COPY_FROM COMMAND : END")
+        if path is None:    path = cls._find_download_file()
+        if path.endswith('.bin'):
+            with open(path, mode='rb') as f, cls.cursor() as cursor:
+                cursor.copy_expert(f"COPY temp_{cls.TABLE_NAME.lower()} FROM STDIN WITH (FORMAT binary)", f,
+                                   size=1 << 20)
         else:
-            raise FileNotFoundError(f'NO_FILE : {cls.__name__.upper()}')
+            with open(path, encoding='utf8') as f, cls.cursor() as cursor:
+                cursor.copy_from(f, f'temp_{cls.TABLE_NAME.lower()}', null='')
+        print(f"    {cls.__name__} : COPY_FROM COMMAND : END")
+
+    @classmethod
+    def _1_2_copy_from_stream(cls, stream):
+        """ 다운로드가 진행되는 동안 stream(PipeFile)으로 들어오는 내용을 바로 COPY. stream이 close될 때까지 대기 """
+        print(f"    {cls.__name__} : COPY_FROM STREAM : START")
+        with cls.cursor() as cursor:
+            copy_format = "FORMAT binary" if getattr(stream, 'binary', False) else "FORMAT text, NULL ''"
+            cursor.copy_expert(f"COPY temp_{cls.TABLE_NAME.lower()} FROM STDIN WITH ({copy_format})",
+                               stream, size=1 << 20)
+        print(f"    {cls.__name__} : COPY_FROM STREAM : END")
+
+    @classmethod
+    def _1_2_count_staged_rows(cls) -> int:
+        _, ((count, ), ) = cls.execute_query(f"SELECT count(*) FROM temp_{cls.TABLE_NAME.lower()};", dtype=list)
+        print(f"    {cls.__name__} : STAGED {count} ROWS")
+        return count
+
+    @classmethod
+    def _1_2_register_codes(cls):
+        """ temp 테이블의 종목코드 중 코드 사전에 없는 코드를 등록 (CD_ID_STORAGE 테이블, 또는 코드 사전이 있을 때 종목 마스터) """
+        if not cls.CD_ID_STORAGE:
+            if not cls.REGISTER_CODE_IDS or \
+                    cls.execute_query(f"SELECT to_regclass('{CODE_ID_TABLE_NAME}');", dtype=list)[1][0][0] is None:
+                return
+        cls.execute_query(f"INSERT INTO {CODE_ID_TABLE_NAME} (cd) SELECT DISTINCT rtrim(cd) "
+                          f"FROM temp_{cls.TABLE_NAME.lower()} ORDER BY 1 ON CONFLICT (cd) DO NOTHING;")
+
+    @classmethod
+    def _1_2_create_partitions(cls):
+        """ 파티션 테이블이면 temp 테이블의 날짜 범위에 해당하는 월 파티션을 미리 생성 """
+        if not cls.PARTITION_BY_MONTH:  return
+        if not cls.is_partitioned():
+            warnings.warn(f"{cls.__name__}.PARTITION_BY_MONTH is set but {cls.storage_table_name()} is a plain table. "
+                          f"Run {cls.__name__}.migrate_to_partitioned() to partition the existing table.")
+            return
+        _, ((srtdt, enddt), ) = cls.execute_query(f"SELECT min(dt), max(dt) FROM temp_{cls.TABLE_NAME.lower()};",
+                                                  dtype=list)
+        if srtdt is None:   return
+        print(f"    {cls.__name__} : CREATE PARTITIONS : START")
+        cls.create_partitions(srtdt, enddt)
+        print(f"    {cls.__name__} : CREATE PARTITIONS : END")
 
     @classmethod
     def _1_3_upsert_data(cls):
         print(f"    {cls.__name__} : UPSERT DATA : START")
-        cls.execute_query(cls.SQL_TO_UPSERT_FROM_TEMP_TABLE)
+        check_sql, append_sql = cls.TABLE_SCHEMA_TO_APPEND_SQLS(cls.TABLE_NAME, cls.TABLE_SCHEMA,
+                                                                cd_id=cls.CD_ID_STORAGE)
+        # 기존 데이터와 겹치는 키가 없으면 충돌 확인 없이 append
+        if check_sql is not None and cls.execute_query(check_sql, dtype=list)[1][0][0]:
+            cls.execute_query(append_sql)
+            print(f"    {cls.__name__} : UPSERT DATA : END (append)")
+            return
+        if cls.CD_ID_STORAGE:
+            cls.execute_query(cls.TABLE_SCHEMA_TO_UPSERT_SQL(cls.TABLE_NAME, cls.TABLE_SCHEMA, cd_id=True))
+        else:
+            cls.execute_query(cls.SQL_TO_UPSERT_FROM_TEMP_TABLE)
         print(f"    {cls.__name__} : UPSERT DATA : END")
 
+    @classmethod
+    def _1_4_refresh_derived_data(cls):
+        """ upsert 직후, temp 테이블을 지우기 전에 호출. temp 테이블에 들어온 범위의 파생 데이터(로컬 캐시, 롤업)를 갱신 """
+        cls._1_4_invalidate_local_cache()
+        cls._1_4_refresh_rollups()
+
+    @classmethod
+    def _1_4_refresh_rollups(cls):
+        """ temp 테이블에 들어온 (cd, dt)의 롤업만 다시 집계 """
+        if not cls.ROLLUP_TIMEFRAMES:   return
+        print(f"    {cls.__name__} : REFRESH ROLLUPS : START")
+        cls.create_rollup_tables()
+        for timeframe in cls.ROLLUP_TIMEFRAMES:
+            cls._refresh_rollup(timeframe, f"(cd, dt) IN (SELECT DISTINCT cd, dt FROM temp_{cls.TABLE_NAME.lower()})")
+        print(f"    {cls.__name__} : REFRESH ROLLUPS : END")
+
+    @classmethod
+    def _1_4_invalidate_local_cache(cls):
+        """ 새로 들어온 (cd, 월)에 해당하는 로컬 캐시 파티션을 삭제 """
+        if 'dt' not in cls.COLUMN_DTYPES or not LocalCache.has_table(cls.LOCAL_CACHE_DIR, cls.TABLE_NAME):
+            return
+        print(f"    {cls.__name__} : INVALIDATE LOCAL CACHE : START")
+        cd_field = 'cd' if 'cd' in cls.COLUMN_DTYPES else 'NULL'
+        _, touched = cls.execute_query(f"SELECT DISTINCT {cd_field}, date_trunc('month', dt)::date "
+                                       f"FROM temp_{cls.TABLE_NAME.lower()};", dtype=list)
+        count = LocalCache.invalidate(cls.LOCAL_CACHE_DIR, cls.TABLE_NAME, touched)
+        print(f"    {cls.__name__} : INVALIDATE LOCAL CACHE : END ({count} partitions)")
+
+    @classmethod
+    def rollup_table_name(cls, timeframe: str) -> str:
+        if timeframe not in cls.ROLLUP_TIMEFRAMES:
+            raise ValueError(f"{cls.__name__} has no rollup for timeframe '{timeframe}'. "
+                             f"available : {cls.ROLLUP_TIMEFRAMES}")
+        return f"{cls.TABLE_NAME}_{timeframe.lower()}"
+
+    @classmethod
+    def rollup_sum_columns(cls) -> list:
+        """ sum으로 집계하는 INTEGER 컬럼. 여러 봉을 합치면 INTEGER 범위를 넘을 수 있으므로 롤업 테이블에서는 BIGINT """
+        return [field_name for field_name, (field_type, _, _) in cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA).items()
+                if cls.ROLLUP_AGGREGATES.get(field_name) == 'sum' and field_type.upper().startswith('INTEGER')]
+
+    @classmethod
+    def rollup_table_schema(cls, timeframe: str) -> str:
+        TABLE_SCHEMA = cls.TABLE_SCHEMA.replace(cls.TABLE_NAME, cls.rollup_table_name(timeframe))
+        for column in cls.rollup_sum_columns():
+            TABLE_SCHEMA = re.sub(rf'(\b{column}\s+)INTEGER\b', r'\1BIGINT', TABLE_SCHEMA, flags=re.IGNORECASE)
+        return TABLE_SCHEMA.replace('\n', '')
+
+    @classmethod
+    def create_rollup_tables(cls):
+        for timeframe in cls.ROLLUP_TIMEFRAMES:
+            cls.execute_query(cls.rollup_table_schema(timeframe))
+        cls._widen_rollup_sum_columns()
+
+    @classmethod
+    def _widen_rollup_sum_columns(cls):
+        """ sum 컬럼이 INTEGER로 만들어진 기존 롤업 테이블을 BIGINT로 변경 (이미 BIGINT이면 아무것도 하지 않음) """
+        columns = cls.rollup_sum_columns()
+        if not cls.ROLLUP_TIMEFRAMES or not columns:    return
+        with cls.cursor() as cursor:
+            cursor.execute("SELECT table_name, column_name FROM information_schema.columns "
+                           "WHERE table_name = ANY(%s) AND column_name = ANY(%s) AND data_type = 'integer';",
+                           ([cls.rollup_table_name(timeframe).lower() for timeframe in cls.ROLLUP_TIMEFRAMES], columns))
+            narrow = cursor.fetchall()
+        for table_name, column in narrow:
+            cls.execute_query(f"ALTER TABLE {table_name} ALTER COLUMN {column} TYPE BIGINT;")
+
+    @classmethod
+    def refresh_rollups(cls, srtdt=None, enddt=None):
+        """ srtdt ~ enddt 기간의 롤업 전체를 다시 집계 (롤업 추가 후 과거 데이터 채우기 등). 기간 미지정 시 전체 """
+        cls.create_rollup_tables()
+        conditions, params = [], []
+        if srtdt:
+            conditions.append("dt >= %s")
+            params.append(DTC.date_to_str(srtdt))
+        if enddt:
+            conditions.append("dt <= %s")
+            params.append(DTC.date_to_str(enddt))
+        with cls.transaction():
+            for timeframe in cls.ROLLUP_TIMEFRAMES:
+                cls._refresh_rollup(timeframe, ' AND '.join(conditions) or 'TRUE', params)
+        cls.invalidate_caches()
+
+    @classmethod
+    def _refresh_rollup(cls, timeframe: str, where: str, params=()):
+        """
+        where 조건(cd, dt 기준)에 해당하는 롤업 행을 지우고 원본 분봉에서 다시 집계. 봉의 시각은 구간의 끝 시각
+        params : where의 %s 자리에 바인딩할 값
+        """
+        rollup_table_name = cls.rollup_table_name(timeframe)
+        columns = [field_name for field_name in cls.PARSE_TABLE_SCHEMA(cls.TABLE_SCHEMA)
+                   if field_name not in ('cd', 'dt', 'tm')]
+        seconds = int(pd.Timedelta(timeframe).total_seconds())
+        if seconds >= 24 * 60 * 60:
+            tm_sql, groupby = "max(tm)", "cd, dt"
+        else:
+            tm_sql = f"make_interval(secs => ceil(extract(epoch FROM tm) / {seconds}) * {seconds})::time"
+            groupby = f"cd, dt, {tm_sql}"
+        aggregates = ', '.join(ROLLUP_AGGREGATE_SQL[cls.ROLLUP_AGGREGATES[column]].format(column) for column in columns)
+        with cls.cursor() as cursor:
+            params = params or None     # 파라미터가 없으면 %를 해석하지 않음
+            cursor.execute(f"DELETE FROM {rollup_table_name} WHERE {where};", params)
+            cursor.execute(f"INSERT INTO {rollup_table_name} (cd, dt, tm, {', '.join(columns)}) "
+                           f"SELECT cd, dt, {tm_sql}, {aggregates} FROM {cls.TABLE_NAME} "
+                           f"WHERE {where} GROUP BY {groupby};", params)
+
     @classmethod
     def _data_to_array(cls, data):
         if isinstance(data, pd.DataFrame):
@@ -186,18 +1687,24 @@ class BaseDB:
     @classmethod
     def table_list(cls):
         query = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
-        cls.execute_query(query)
-        return sorted(each[0] for each in cls.cursor.fetchall())
+        return sorted(each[0] for each in cls.execute_query(query, dtype=list)[1])
 
     @classmethod
-    def rollback(cls):  cls.cursor.execute('rollback;')
+    def rollback(cls):
+        # 호출마다 트랜잭션이 끝나므로, transaction() 블록 안에서만 의미가 있음
+        conn = getattr(_THREAD_LOCAL, 'connection', None)
+        if conn is not None:
+            conn.rollback()
+            _reset_prepared_statements(conn)
 
     @classmethod
     def backup(cls, dir_path="D:\\backups\\"):
         if not os.path.isdir(dir_path): os.makedirs(dir_path, exist_ok=True)
         if not dir_path.endswith("\\"): dir_path += "\\"
-        with open(f'{dir_path}{cls.__name__}_{DTC.date_to_str(DTC.today())}.txt', mode='w') as f:
-            cls.cursor.copy_to(f, cls.TABLE_NAME, sep='\t', null='', columns=None)
+        with open(f'{dir_path}{cls.__name__}_{DTC.date_to_str(DTC.today())}.txt', mode='w') as f, \
+                cls.cursor() as cursor:
+            # copy_to는 view(CD_ID_STORAGE)를 지원하지 않으므로 SELECT 결과를 COPY (출력 형식은 동일)
+            cursor.copy_expert(f"COPY (SELECT * FROM {cls.TABLE_NAME}) TO STDOUT WITH (FORMAT text, NULL '')", f)
 
 
 class RegularStockCheckable:
@@ -213,42 +1720,131 @@ class RegularStockCheckable:
         return all((c1, c2, c3))
 
 
+class CodeIndexable:
+    """
+    작은 종목 마스터 테이블(S01_ITEMS, O01_ITEMS)을 한번만 읽어서 cd <-> nm dict로 메모리에 보관
+    update() 시 새 종목코드를 코드 사전(CD_ID_STORAGE 테이블의 cd_id)에 등록
+    """
+    REGISTER_CODE_IDS = True
+    _code_to_name = None
+    _name_to_code = None
+
+    @classmethod
+    def code_to_name_dict(cls) -> dict:
+        if cls._code_to_name is None:
+            items = cls.select(columns='cd, nm', is_org=True, use_cache=True)
+            cls._code_to_name = dict(zip(items['cd'].str.strip(), items['nm']))
+        return cls._code_to_name
+
+    @classmethod
+    def name_to_code_dict(cls) -> dict:
+        # nm이 유일한 테이블(S01_ITEMS)에서만 의미가 있음
+        if cls._name_to_code is None:
+            cls._name_to_code = {nm: cd for cd, nm in cls.code_to_name_dict().items()}
+        return cls._name_to_code
+
+    @classmethod
+    def cd2nm(cls, cd):
+        return cls.code_to_name_dict().get(str(cd).strip())
+
+    @classmethod
+    def nm2cd(cls, nm):
+        return cls.name_to_code_dict().get(nm)
+
+    @classmethod
+    def invalidate_caches(cls):
+        super().invalidate_caches()
+        cls._code_to_name = None
+        cls._name_to_code = None
+
+
 class NameReadable:
+    """ read() 결과에 S01_ITEMS의 종목명(nm) 컬럼을 붙임. DB의 cd2nm() 함수를 행마다 호출하지 않고 메모리 dict로 매핑 """
     @classmethod
-    def read(cls, columns="*, cd2nm(cd) as nm", where=None, groupby=None, limit=None, is_org=False, dtype='df'):
-        return super().read(columns=columns, where=where, groupby=groupby, limit=limit, is_org=is_org, dtype=dtype)
+    def _postprocess(cls, chart):
+        chart = super()._postprocess(chart)
+        if isinstance(chart, pd.DataFrame) and 'cd' in chart.columns and 'nm' not in chart.columns:
+            from StockWH import Stock
+            chart['nm'] = chart['cd'].astype(str).str.strip().map(Stock.S01_ITEMS.code_to_name_dict())
+        return chart
 
 
 class DateIndexReadable:
     @classmethod
-    def read(cls, columns="*", where=None, groupby=None, limit=None, is_org=False, dtype='df'):
-        chart = super().read(columns=columns, where=where, groupby=groupby, limit=limit, dtype=dtype)
-        if is_org:  return chart
+    def _postprocess(cls, chart):
+        chart = super()._postprocess(chart)
+        if not isinstance(chart, pd.DataFrame):     return chart
         # print(chart.columns)
-        chart.loc[:, 'dt'] = pd.to_datetime(chart['dt'].astype(str))
-        chart.set_index('dt', inplace=True)
-        for col in chart.columns:
-            if np.dtype('O') == chart[col].dtype and \
-                    isinstance(chart[col][0], Decimal):
-                chart[col] = chart[col].astype(float)
+        if 'dt' in chart.columns:
+            chart.set_index('dt', inplace=True)
         return chart
 
 
+class TickStorable:
+    """
+    초봉 등 대용량 차트를 (종목, 일) 단위 고정길이 numpy 파일(TickStore)로 내보내고, DB 조회 없이 memory-map으로 재생(replay)
+    """
+    TICK_STORE_DIR = 'tick_store'
+
+    @classmethod
+    def export_ticks(cls, codes=None, srtdt=None, enddt=None):
+        """
+        DB -> TickStore. srtdt 미지정 시 종목별로 마지막으로 내보낸 날부터(장중에 내보낸 마지막 날을 다시 쓰기 위해 포함)
+        월 단위로 COPY 조회하므로 메모리 사용량은 한달치로 제한됨
+        """
+        if codes is None:   codes = cls.TARGETS.keys()
+        dtype = TickStore.record_dtype(cls.COLUMN_DTYPES)
+        enddt = pd.Timestamp(DTC.date_to_obj(enddt if enddt else DTC.today())).normalize()
+        for cd in codes:
+            index = TickStore.read_index(cls.TICK_STORE_DIR, cls.TABLE_NAME, cd)
+            if srtdt is not None:
+                code_srtdt = pd.Timestamp(DTC.date_to_obj(srtdt)).normalize()
+            elif len(index):
+                code_srtdt = pd.Timestamp(index['dt'][-1])
+            else:
+                code_srtdt = pd.Timestamp(cls.select(columns='min(dt)', cd=cd, is_org=True, dtype=list,
+                                                     use_cache=False)[1][0][0] or enddt)
+            print(f"{cls.__name__} EXPORT TICKS : {cd} {code_srtdt.date()} ~ {enddt.date()}")
+            for month in pd.period_range(code_srtdt, enddt, freq='M'):
+                chart = cls._apply_column_dtypes(cls.execute_copy_query(
+                    f"SELECT * FROM {cls.TABLE_NAME} WHERE cd = %s AND dt >= %s AND dt <= %s",
+                    (cd, max(month.start_time, code_srtdt).date(), min(month.end_time, enddt).date())))
+                if len(chart) == 0:     continue
+                TickStore.write_days(cls.TICK_STORE_DIR, cls.TABLE_NAME, cd,
+                                     {dt: TickStore.to_records(day, dtype) for dt, day in chart.groupby('dt')})
+
+    @classmethod
+    def replay(cls, code, srtdt=None, enddt=None):
+        """
+        TickStore에 내보낸 code의 데이터를 하루치 구조체 배열(memory-map의 slice, 복사X) 단위로 시간순으로 yield
+        srtdt/enddt에 시각이 포함되어 있으면 첫날/마지막날도 그 시각으로 잘라냄
+        """
+        index = TickStore.read_index(cls.TICK_STORE_DIR, cls.TABLE_NAME, code)
+        srt = pd.Timestamp(srtdt) if srtdt is not None else None
+        end = pd.Timestamp(enddt) if enddt is not None else None
+        # 날짜만 주어진 enddt는 그날 전체를 포함
+        if end is not None and end == end.normalize():  end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        for dt in index['dt']:
+            day_start = pd.Timestamp(dt)
+            if srt is not None and day_start < srt.normalize():   continue
+            if end is not None and day_start > end:     break
+            records = TickStore.load_day(cls.TICK_STORE_DIR, cls.TABLE_NAME, code, dt)
+            lo = 0 if srt is None else np.searchsorted(records['dttm'], np.datetime64(srt, 'us'), side='left')
+            hi = len(records) if end is None else np.searchsorted(records['dttm'], np.datetime64(end, 'us'), side='right')
+            if lo < hi:     yield records[lo:hi]
+
+
 class DateTimeIndexReadable:
     @classmethod
-    def read(cls, columns="*", where=None, groupby=None, is_org=False, limit=None, dtype='df'):
-        chart = super().read(columns=columns, where=where, groupby=groupby, limit=limit, dtype=dtype)
-        if is_org:  return chart
+    def _postprocess(cls, chart):
+        chart = super()._postprocess(chart)
+        if not isinstance(chart, pd.DataFrame):     return chart
         #print(chart.columns)
         if 'dt' in chart.columns and 'tm' in chart.columns:
-            chart.loc[:, 'dttm'] = pd.to_datetime(chart['dt'].astype(str) + ' ' + chart['tm'].astype(str))
+            # datetime64[ns] + timedelta64[ns] : 문자열 변환/재파싱 없이 벡터 연산으로 dttm 생성
+            chart.loc[:, 'dttm'] = pd.to_datetime(chart['dt']) + pd.to_timedelta(chart['tm'])
             chart.drop(columns=['dt', 'tm'], inplace=True)
             chart.set_index('dttm', inplace=True)
-        if len(chart) == 0:     return chart
-        for col in chart.columns:
-            if np.dtype('O') == chart[col].dtype and \
-                    isinstance(chart[col][0], Decimal):
-                chart[col] = chart[col].astype(float)
         return chart
 
 
@@ -279,7 +1875,21 @@ MONTH_CODE_DICT = {
 }
 
 
+OPTION_EXPIRY_TIME = pd.Timedelta('15:20:00')      # 만기일 최종거래 시각
+OPTION_DAILY_CLOSE_TIME = pd.Timedelta('15:45:00')  # 일봉의 기준 시각
+
+
 class OptionItemReadable:
+    @staticmethod
+    def resolve_expiries(dates, look_ahead_days: int = 0) -> np.ndarray:
+        """ 각 날짜(+look_ahead_days) 이후 가장 가까운 만기일을 DTC.EXPIREDAYS에서 searchsorted로 찾음. 목록을 넘어서면 NaT """
+        expiries = np.array(sorted(DTC.EXPIREDAYS), dtype='datetime64[D]')
+        dates = np.asarray(dates, dtype='datetime64[D]') + np.timedelta64(look_ahead_days, 'D')
+        idx = np.searchsorted(expiries, dates, side='right')
+        result = np.full(len(dates), np.datetime64('NaT'), dtype='datetime64[D]')
+        result[idx < len(expiries)] = expiries[idx[idx < len(expiries)]]
+        return result
+
     @classmethod
     def __convert_type(cls, tp):
         if not tp.isdigit():        tp = TYPE_CODE_DICT[tp.upper()]
@@ -325,17 +1935,17 @@ class OptionItemReadable:
         idx = a[a].index[0]
         strk_year, strk_month, strk_day = [int(each) for each in DTC.EXPIREDAYS[idx].split('-')]
 
-        from DB import FutOpt as fo
+        from StockWH import FutOpt
         if criterion == 'open':
-            kospi_fut = fo.F12_MINCHART.read(columns=f"open",
-                                             where=f"cd='10100' AND dt = '{str(date)}' AND tm <= '10:01:00'")
+            kospi_fut = FutOpt.F12_MINCHART.select(columns='open', cd='10100', srtdt=date, enddt=date,
+                                                   endtm='10:01:00', orderby='tm', use_cache=True)
             try:
-                strk_price = int(round(kospi_fut['open'][0] / 2.5) * 2.5)
+                strk_price = int(round(kospi_fut['open'].iloc[0] / 2.5) * 2.5)
             except IndexError:
                 return None, None
         elif criterion == 'close':
-            kospi_fut = fo.F12_MINCHART.read(columns=f"close",
-                                             where=f"cd='10100' AND dt = '{str(date)}' AND tm >= '15:01:00'")
+            kospi_fut = FutOpt.F12_MINCHART.select(columns='close', cd='10100', srtdt=date, enddt=date,
+                                                   srttm='15:01:00', orderby='tm', use_cache=True)
             try:
                 strk_price = int(round(kospi_fut['close'].iloc[-1] / 2.5) * 2.5)
             except IndexError:
@@ -346,49 +1956,126 @@ class OptionItemReadable:
         except KeyError:
 
             return None, None
-        print(date, strk_price)
 
-        where_call = f"cd = '{call_cd}' AND dt='{date}'"
-        where_put  = f"cd = '{put_cd}'  AND dt='{date}'"
-        return cls.read(where=where_call), cls.read(where=where_put)
+        return cls.select(cd=call_cd, srtdt=date, enddt=date), cls.select(cd=put_cd, srtdt=date, enddt=date)
+
+    @classmethod
+    def read_closest_cp_options_batch(cls,
+                                      target: str,
+                                      dates,
+                                      look_ahead_days: int = 0,
+                                      criterion: str = 'open') -> pd.DataFrame:
+        """
+        여러 날짜에 대한 read_closest_cp_options. 만기(searchsorted), 선물 기준가(날짜별 그룹 쿼리 1번),
+        ATM 행사가(2.5pt 반올림), 종목코드를 날짜 전체에 대해 한번에 구하고, 콜/풋 데이터를 쿼리 1번으로 조회
+        반환 : (date, side('CALL'/'PUT'), 원래 인덱스) MultiIndex DataFrame. 선물 기준가가 없는 날짜는 제외
+        """
+        from StockWH import FutOpt
+        dates = pd.DatetimeIndex([DTC.date_to_obj(each) for each in dates]).normalize()
+        if criterion == 'open':
+            ref_sql, tm_condition = "(array_agg(open ORDER BY tm))[1]", "tm <= '10:01:00'"
+        elif criterion == 'close':
+            ref_sql, tm_condition = "(array_agg(close ORDER BY tm DESC))[1]", "tm >= '15:01:00'"
+        else:
+            raise AttributeError("the attribute criterion is not one of these (open, close)")
+        _, rows = cls.execute_prepared(f"SELECT dt, {ref_sql} FROM {FutOpt.F12_MINCHART.TABLE_NAME} "
+                                       f"WHERE cd = %s AND dt = ANY(%s::date[]) AND {tm_condition} GROUP BY dt;",
+                                       ('10100', list(dates.date)), dtype=list)
+        refs = dict(rows)
+
+        plan = pd.DataFrame({'date': dates, 'expiry': cls.resolve_expiries(dates, look_ahead_days)})
+        plan['ref'] = plan['date'].dt.date.map(refs).astype('float64')
+        plan = plan.dropna(subset=['ref', 'expiry'])
+        strk_price = (np.round(plan['ref'] / 2.5) * 2.5).astype(int)
+        # 종목코드 = 유형 + 기초자산 + 만기 연/월 코드 + 행사가. 코드표에 없는 만기는 제외
+        suffix = cls.__convert_target(target) + plan['expiry'].dt.year.map(YEAR_CODE_DICT) + \
+                 plan['expiry'].dt.month.map(MONTH_CODE_DICT) + strk_price.astype(str)
+        plan, suffix = plan[suffix.notna()], suffix[suffix.notna()]
+        codes = pd.concat([TYPE_CODE_DICT['CALL'] + suffix, TYPE_CODE_DICT['PUT'] + suffix])
+        req_dates = pd.concat([plan['date'], plan['date']]).dt.date
+
+        chart = cls.execute_prepared(f"SELECT * FROM {cls.TABLE_NAME} WHERE (cd, dt) IN "
+                                     f"(SELECT * FROM unnest(%s::char(8)[], %s::date[]));",
+                                     (codes.tolist(), req_dates.tolist()), time_as_text=True)
+        side = chart['cd'].str[0].map({TYPE_CODE_DICT['CALL']: 'CALL', TYPE_CODE_DICT['PUT']: 'PUT'}).to_numpy()
+        chart = cls._postprocess(chart)
+        chart.index = pd.MultiIndex.from_arrays([pd.DatetimeIndex(chart.index).normalize(), side, chart.index],
+                                                names=['date', 'side', chart.index.name])
+        return chart.sort_index()
+
+    @classmethod
+    def compute_greeks(cls, chart: pd.DataFrame, rate: float = 0.03, price_column: str = 'close',
+                       underlying: str = '10100', n_jobs: int = 1) -> pd.DataFrame:
+        """
+        read() 결과(O12_MINCHART, O11_DAYCHART)의 각 행에 대해 내재변동성과 그릭스를 전체 정밀도로 다시 계산 (Black-76)
+        기초자산은 같은 시각(일봉은 장 마감 시각) 이전 마지막 underlying 선물 종가, 행사가/유형은 O01_ITEMS.option_index()
+        n_jobs : 1보다 크면 내재변동성 계산을 프로세스 풀에서 나누어 수행
+        반환 : chart와 같은 인덱스, 컬럼 underlying, tte(년), iv(%), theory_price, delta, gamma, theta(1일), vega/rho(1%p)
+        """
+        from StockWH import FutOpt
+        items = FutOpt.O01_ITEMS.option_index().reset_index().drop_duplicates('cd').set_index('cd')
+        codes = pd.Series(chart['cd'].astype(str).str.strip().to_numpy())
+        timestamps = pd.Series(pd.DatetimeIndex(chart.index))
+        if 'tm' not in cls.COLUMN_DTYPES:  timestamps = timestamps + OPTION_DAILY_CLOSE_TIME
+
+        # 만기 : 종목코드의 만기 연/월 코드 -> 해당 월의 만기일
+        years = codes.str[3].map({code: year for year, code in YEAR_CODE_DICT.items()})
+        months = codes.str[4].map({code: month for month, code in MONTH_CODE_DICT.items()})
+        expiry_days = {(day.year, day.month): day for day in pd.to_datetime(pd.Series(DTC.EXPIREDAYS))}
+        expiries = pd.Series([expiry_days.get((year, month), pd.NaT) for year, month in zip(years, months)],
+                             dtype='datetime64[ns]') + OPTION_EXPIRY_TIME
+
+        futures_chart = FutOpt.F12_MINCHART.select(columns='dt, tm, close', cd=underlying,
+                                                   srtdt=timestamps.min().date(), enddt=timestamps.max().date())
+        futures_close = futures_chart['close'].sort_index()
+        underlying_price = futures_close.reindex(timestamps, method='ffill').to_numpy() if len(futures_close) \
+            else np.full(len(timestamps), np.nan)
+
+        strikes = codes.map(items['strk_price']).to_numpy(dtype='float64')
+        is_call = (codes.map(items['tp']) == 'C').to_numpy()
+        tte = ((expiries - timestamps).dt.total_seconds() / (365 * 24 * 60 * 60)).to_numpy()
+        price = chart[price_column].to_numpy(dtype='float64')
+
+        iv = Greeks.implied_volatility_parallel(price, underlying_price, strikes, tte, rate, is_call, n_jobs=n_jobs)
+        greeks = Greeks.black76_greeks(underlying_price, strikes, tte, iv, rate, is_call)
+        return pd.DataFrame({'underlying': underlying_price, 'tte': tte, 'iv': iv * 100,
+                             'theory_price': greeks['price'], 'delta': greeks['delta'], 'gamma': greeks['gamma'],
+                             'theta': greeks['theta'] / 365, 'vega': greeks['vega'] / 100, 'rho': greeks['rho'] / 100},
+                            index=chart.index)
 
     ####################
     @classmethod
     def __read_routine_01(cls,
+                          query: Query,
                           name: str,
                           exp_m: str,
-                          strk_price: float) -> list:
-        where = []
-        if name:        where.append(f"nm = '{name}'")
-        if exp_m:       where.extend(cls.__get_condition_for_exp_m(exp_m=exp_m))
-        if strk_price:  where.extend(cls.__get_condition_for_strk_price(strk_price=strk_price))
-        return where
+                          strk_price: float) -> Query:
+        if name:        query.where("nm = %s", name)
+        if exp_m:       cls.__get_condition_for_exp_m(query, exp_m=exp_m)
+        if strk_price:  cls.__get_condition_for_strk_price(query, strk_price=strk_price)
+        return query
 
     @classmethod
-    def __get_condition_for_exp_m(cls, exp_m) -> list:
-        where = []
+    def __get_condition_for_exp_m(cls, query: Query, exp_m) -> Query:
         if exp_m:
             if isinstance(exp_m, (int, str)):
-                where.append(f"exp_m = '{exp_m}'")
+                query.where("exp_m = %s", str(exp_m))
             elif isinstance(exp_m, (list, tuple)) and len(exp_m) == 2:
-                where.append(f"exp_m >= {min(exp_m)}")
-                where.append(f"exp_m <= {max(exp_m)}")
+                query.where_range('exp_m', str(min(exp_m)), str(max(exp_m)))
             else:
                 raise AttributeError(f'exp_m input wrong. : {exp_m}')
-        return where
+        return query
 
     @classmethod
-    def __get_condition_for_strk_price(cls, strk_price) -> list:
-        where = []
+    def __get_condition_for_strk_price(cls, query: Query, strk_price) -> Query:
         if strk_price:
             if isinstance(strk_price, (int, float)):
-                where.append(f"strk_price = {strk_price}")
+                query.where("strk_price = %s", strk_price)
             elif isinstance(strk_price, (list, tuple)) and len(strk_price) == 2:
-                where.append(f"strk_price >= {min(strk_price)}")
-                where.append(f"strk_price <= {max(strk_price)}")
+                query.where_range('strk_price', min(strk_price), max(strk_price))
             else:
                 raise AttributeError(f'strk_price input wrong. : {strk_price}')
-        return where
+        return query
 
     @classmethod
     def read_call_options(cls,
@@ -396,10 +2083,9 @@ class OptionItemReadable:
                           exp_m: str = None,
                           strk_price: float = None,
                           dtype: str = 'df'):
-        where = [f"tp = 'C'"]
-        where.extend(cls.__read_routine_01(name=name, exp_m=exp_m, strk_price=strk_price))
-        where = ' AND '.join(where)
-        return super().read(where=where, dtype=dtype)
+        query = cls.query().where("tp = %s", 'C')
+        cls.__read_routine_01(query, name=name, exp_m=exp_m, strk_price=strk_price)
+        return cls.read_query(query, dtype=dtype)
 
     @classmethod
     def read_put_options(cls,
@@ -407,10 +2093,9 @@ class OptionItemReadable:
                          exp_m: str = None,
                          strk_price: Union[float, Iterable] = None,
                          dtype: str = 'df'):
-        where = [f"tp = 'P'"]
-        where.extend(cls.__read_routine_01(name=name, exp_m=exp_m, strk_price=strk_price))
-        where = ' AND '.join(where)
-        return super().read(where=where, dtype=dtype)
+        query = cls.query().where("tp = %s", 'P')
+        cls.__read_routine_01(query, name=name, exp_m=exp_m, strk_price=strk_price)
+        return cls.read_query(query, dtype=dtype)
 
     @classmethod
     def read_cp_options(cls,
@@ -418,7 +2103,6 @@ class OptionItemReadable:
                         exp_m: str = None,
                         strk_price: float = None,
                         dtype: str = 'df'):
-        where = [f"tp in ('C', 'P')"]
-        where.extend(cls.__read_routine_01(name=name, exp_m=exp_m, strk_price=strk_price))
-        where = ' AND '.join(where)
-        return super().read(where=where, dtype=dtype)
+        query = cls.query().where("tp IN ('C', 'P')")
+        cls.__read_routine_01(query, name=name, exp_m=exp_m, strk_price=strk_price)
+        return cls.read_query(query, dtype=dtype)
@@ -1,5 +1,6 @@
 import DTC
 from StockWH import Base
+import numpy as np
 import pandas as pd
 try:
     from tqdm import tqdm
@@ -38,47 +39,48 @@ class F12_MINCHART(Base.DateTimeIndexReadable, Base.BaseDB):
             basis       NUMERIC(5,2)    NOT NULL,
             PRIMARY KEY(cd, dt, tm)
         );"""
+    PARTITION_BY_MONTH = True
+    ROLLUP_TIMEFRAMES = ('5min', '15min', '60min', '1D')
+    # acc_vol_* 는 누적값이므로 구간의 마지막 값
+    ROLLUP_AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+                         'acc_vol_down': 'last', 'acc_vol_up': 'last', 'incomplete': 'last', 'basis': 'last'}
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls):
         from API.StockFutOpt import Future
         codes = cls.TARGETS.keys()
-
-        columns = ['code'] + Future.columns_ko_min
-        sub_result = pd.DataFrame(columns=columns)
-        for code in codes:
-            # set srtdate
-            query = f"SELECT cd, date(max(dt)) FROM {cls.TABLE_NAME} " \
-                    f"WHERE cd = '{code}' " \
-                    "GROUP BY cd;"
-            temp_df = cls.execute_query(query)
-
-            # 기존에 저장된 내용이 없는 경우 : 2년 전부터
-            if len(temp_df) == 0:
-                srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365*2-1))
-            else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
-                srtdate = DTC.date_to_int(temp_df['date'].iloc[0])
-
-            chart = Future.request_future_min_chart(code=code, srt_date=srtdate)
-            if chart is None or len(chart) == 0: continue
-
-            chart.loc[:, 'code'] = code
-            chart['날짜'] = chart['날짜'].astype(str)
-            chart['시간'] = chart['시간'].astype(str).str.zfill(4)
-            #chart.loc[:, '시간'] = \
-            #    pd.to_datetime(chart['날짜'].astype(str) + ' ' + chart['시간'].astype(str).str.zfill(4))
-            #chart.drop(columns=['날짜'], inplace=True)
-            chart = chart[['code', *chart.columns[:-1]]]
-            # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
-            chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
-            sub_result = pd.concat([sub_result, chart], axis=0)
-
-        sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                     sep='\t', index=None, header=None, mode='a')
-
-
-class F13_SECCHART(Base.DateTimeIndexReadable, Base.BaseDB):
+        # 코드별 마지막 저장 시점을 한번에 조회
+        watermarks = cls.read_watermarks(codes)
+
+        with cls.update_file_writer(SAVE_FILE_NAME_TAG) as writer:
+            for code in codes:
+                # set srtdate
+                watermark = watermarks.get(code)
+                # 기존에 저장된 내용이 없는 경우 : 2년 전부터
+                if watermark is None:
+                    srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365*2-1))
+                else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
+                    srtdate = DTC.date_to_int(watermark[0])
+
+                chart = Future.request_future_min_chart(code=code, srt_date=srtdate)
+                if chart is None or len(chart) == 0: continue
+
+                chart.loc[:, 'code'] = code
+                chart['날짜'] = chart['날짜'].astype(str)
+                chart['시간'] = chart['시간'].astype(str).str.zfill(4)
+                #chart.loc[:, '시간'] = \
+                #    pd.to_datetime(chart['날짜'].astype(str) + ' ' + chart['시간'].astype(str).str.zfill(4))
+                #chart.drop(columns=['날짜'], inplace=True)
+                chart = chart[['code', *chart.columns[:-1]]]
+                # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
+                chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
+                # 이미 저장된 마지막 봉까지는 제외
+                writer.append(cls.drop_rows_until_watermark(chart, watermark))
+
+
+class F13_SECCHART(Base.TickStorable, Base.DateTimeIndexReadable, Base.BaseDB):
     TABLE_NAME = TABLE_NAME_FUT_SEC_CHART
     TARGETS = {'10100': 'KOSPI200',
                '10500': 'MINI_KOSPI',
@@ -94,40 +96,37 @@ class F13_SECCHART(Base.DateTimeIndexReadable, Base.BaseDB):
             basis       NUMERIC(5,2)    NOT NULL,
             PRIMARY KEY(cd, dt, tm)
         );"""
+    PARTITION_BY_MONTH = True
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls):
         from API.StockFutOpt import Future
         codes = cls.TARGETS.keys()
-        columns = ['code'] + Future.columns_ko_sec
-        sub_result = pd.DataFrame(columns=columns)
-        for code in codes:
-            # set srtdate
-            query = f"SELECT cd, date(max(dt)) FROM {cls.TABLE_NAME} " \
-                    f"WHERE cd = '{code}' " \
-                    "GROUP BY cd;"
-            temp_df = cls.execute_query(query)
-
-            # 기존에 저장된 내용이 없는 경우 : 2년 전부터
-            if len(temp_df) == 0:
-                srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365*2-1))
-            else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
-                srtdate = DTC.date_to_int(temp_df['date'].iloc[0])
-
-            chart = Future.request_future_sec_chart(code=code, srt_date=srtdate)
-            if chart is None or len(chart) == 0: continue
-
-            chart.loc[:, 'code'] = code
-            chart['날짜'] = chart['날짜'].astype(str)
-            chart['시간'] = chart['시간'].astype(str).str.zfill(6)
-            chart = chart[['code', *chart.columns[:-1]]]
-            # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
-            chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
-            sub_result = pd.concat([sub_result, chart], axis=0)
-
-        sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                           sep='\t', index=None, header=None, mode='a')
+        # 코드별 마지막 저장 시점을 한번에 조회
+        watermarks = cls.read_watermarks(codes)
+        with cls.update_file_writer(SAVE_FILE_NAME_TAG) as writer:
+            for code in codes:
+                # set srtdate
+                watermark = watermarks.get(code)
+                # 기존에 저장된 내용이 없는 경우 : 2년 전부터
+                if watermark is None:
+                    srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365*2-1))
+                else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
+                    srtdate = DTC.date_to_int(watermark[0])
+
+                chart = Future.request_future_sec_chart(code=code, srt_date=srtdate)
+                if chart is None or len(chart) == 0: continue
+
+                chart.loc[:, 'code'] = code
+                chart['날짜'] = chart['날짜'].astype(str)
+                chart['시간'] = chart['시간'].astype(str).str.zfill(6)
+                chart = chart[['code', *chart.columns[:-1]]]
+                # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
+                chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
+                # 이미 저장된 마지막 봉까지는 제외
+                writer.append(cls.drop_rows_until_watermark(chart, watermark))
 
 
 class F22_NASDAQ_MINCHART(Base.DateTimeIndexReadable, Base.BaseDB):
@@ -147,6 +146,7 @@ class F22_NASDAQ_MINCHART(Base.DateTimeIndexReadable, Base.BaseDB):
             PRIMARY KEY(dt, tm)
         );"""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls):
@@ -154,7 +154,7 @@ class F22_NASDAQ_MINCHART(Base.DateTimeIndexReadable, Base.BaseDB):
         pass
 
 
-class O01_ITEMS(Base.BaseDB):  # Core.OptionItemReadable,
+class O01_ITEMS(Base.CodeIndexable, Base.BaseDB):  # Core.OptionItemReadable,
     TABLE_NAME = TABLE_NAME_OPT_ITEM_LIST
     TABLE_SCHEMA = f"""
         CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
@@ -166,6 +166,26 @@ class O01_ITEMS(Base.BaseDB):  # Core.OptionItemReadable,
             PRIMARY KEY(cd)
             );"""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+    _option_index = None
+
+    @classmethod
+    def option_index(cls) -> pd.DataFrame:
+        """
+        (target, exp_m, strk_price, tp) -> cd 옵션 종목 인덱스. 한번만 읽어서 메모리에 보관
+        target : 기초자산 코드(cd[1:3], Base.TARGET_CODE_DICT), exp_m : 만기 연월 'yymm', tp : 'C' / 'P'
+        """
+        if cls._option_index is None:
+            items = cls.read(columns='cd, tp, exp_m, strk_price', is_org=True, use_cache=True)
+            items['cd'] = items['cd'].str.strip()
+            items['target'] = items['cd'].str.slice(1, 3)
+            cls._option_index = items.set_index(['target', 'exp_m', 'strk_price', 'tp']).sort_index()
+        return cls._option_index
+
+    @classmethod
+    def invalidate_caches(cls):
+        super().invalidate_caches()
+        cls._option_index = None
 
     @classmethod
     def _0_download_update_file(cls):
@@ -192,8 +212,7 @@ class O01_ITEMS(Base.BaseDB):  # Core.OptionItemReadable,
 class O11_DAYCHART(Base.OptionItemReadable, Base.DateIndexReadable, Base.BaseDB):
     TABLE_NAME = TABLE_NAME_OPT_DAY_CHART
     DB_START_DT = DTC.date_to_obj('2010-01-04').date()
-    DB_END_DT = Base.BaseDB.execute_query(f"""
-        SELECT max(dt) FROM {TABLE_NAME}""")['max'][0]
+    DB_END_DT = Base.lazy_classproperty(lambda cls: cls.read_max_dt())
 
     #['종목코드', '날짜', '종목명', '종가', '대비', '시가', '고가', '저가', '내재변동성', '익일정산가',
     #'거래량', '거래대금'(백만원 단위), '미결제약정']
@@ -215,6 +234,7 @@ class O11_DAYCHART(Base.OptionItemReadable, Base.DateIndexReadable, Base.BaseDB)
             PRIMARY KEY(cd, dt)
         );"""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls):
@@ -233,8 +253,7 @@ class O11_DAYCHART(Base.OptionItemReadable, Base.DateIndexReadable, Base.BaseDB)
 class O12_MINCHART(Base.OptionItemReadable, Base.DateTimeIndexReadable, Base.BaseDB):
     TABLE_NAME = TABLE_NAME_OPT_MIN_CHART
     DB_START_DT = DTC.date_to_obj('2021-12-13').date()
-    DB_END_DT = Base.BaseDB.execute_query(f"""
-        SELECT max(dt) FROM {TABLE_NAME}""")['max'][0]
+    DB_END_DT = Base.lazy_classproperty(lambda cls: cls.read_max_dt())
     TABLE_SCHEMA = f"""
         CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
             cd              char(8)         NOT NULL,
@@ -257,89 +276,136 @@ class O12_MINCHART(Base.OptionItemReadable, Base.DateTimeIndexReadable, Base.Bas
             rho             NUMERIC(6,4)    NOT NULL,
             PRIMARY KEY(cd, dt, tm)
         );"""
+    PARTITION_BY_MONTH = True
+    UPDATE_DEPENDS_ON = (O01_ITEMS, )
+    ROLLUP_TIMEFRAMES = ('5min', '15min', '60min', '1D')
+    # 이론가/내재변동성/그릭스는 구간 마지막 시점의 값
+    ROLLUP_AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+                         'acc_vol_down': 'last', 'acc_vol_up': 'last', 'incomplete': 'last',
+                         'theory_price': 'last', 'iv': 'last', 'delta': 'last', 'gamma': 'last',
+                         'theta': 'last', 'vega': 'last', 'rho': 'last'}
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
 
+    @classmethod
+    def read_chain(cls, target, dt, tm, moneyness_range=None, underlying='10100'):
+        """
+        (dt, tm) 시점의 target 옵션 체인(가장 가까운 만기의 콜/풋 전체)을 O01_ITEMS.option_index()로 만든 종목 목록으로 한번에 조회
+        종목마다 그날 tm 이전(같은 시각 포함) 마지막 봉을 사용 (거래가 없는 분에는 봉이 없으므로). 봉의 실제 시각은 dttm
+        dt : 날짜 하나 또는 날짜 목록 (여러 날짜도 한번의 쿼리로 조회, 만기는 날짜별로 결정)
+        moneyness_range : (하한, 상한) 또는 폭. underlying 선물의 tm 시점 종가 대비 행사가 차이(포인트)로 필터
+        반환 : tp, strk_price 컬럼이 추가된 행 (날짜, strk_price, tp 순)
+        """
+        target = target if target.isdigit() else Base.TARGET_CODE_DICT[target.upper()]
+        dates = pd.DatetimeIndex([DTC.date_to_obj(each) for each in np.atleast_1d(dt)]).normalize()
+        exp_ms = pd.DatetimeIndex(cls.resolve_expiries(dates)).strftime('%y%m')
+
+        index = O01_ITEMS.option_index()
+        chain = index[index.index.get_level_values('target') == target].reset_index()
+        requests = pd.DataFrame({'req_dt': dates.date, 'exp_m': exp_ms}).merge(chain, on='exp_m')
+
+        query = f"""WITH I AS (SELECT * FROM unnest(%s::date[], %s::char(8)[], %s::char(1)[], %s::numeric[]) 
+                                AS I(req_dt, cd, tp, strk_price)) 
+                    SELECT I.tp, I.strk_price, O.* FROM I 
+                    JOIN LATERAL (SELECT * FROM {cls.TABLE_NAME} T WHERE T.cd = I.cd AND T.dt = I.req_dt AND T.tm <= %s 
+                                  ORDER BY T.tm DESC LIMIT 1) O ON true"""
+        params = [requests['req_dt'].tolist(), requests['cd'].tolist(), requests['tp'].tolist(),
+                  requests['strk_price'].tolist(), tm]
+        if moneyness_range is not None:
+            lo, hi = (-moneyness_range, moneyness_range) if np.isscalar(moneyness_range) else moneyness_range
+            # 기준가격 : 날짜별 tm 이전 마지막 선물 종가
+            query += f""" 
+                    JOIN (SELECT D.dt, (SELECT F.close FROM {F12_MINCHART.TABLE_NAME} F 
+                                        WHERE F.cd = %s AND F.dt = D.dt AND F.tm <= %s 
+                                        ORDER BY F.tm DESC LIMIT 1) AS ref 
+                          FROM (SELECT DISTINCT req_dt AS dt FROM I) D) R ON R.dt = I.req_dt 
+                    WHERE I.strk_price - R.ref BETWEEN %s AND %s"""
+            params += [underlying, tm, lo, hi]
+        query += " ORDER BY I.req_dt, I.strk_price, I.tp;"
+        # 시점마다 반복 호출되므로 prepared statement로 실행 (moneyness_range 유무별로 한번씩만 PREPARE)
+        return cls._postprocess(cls.execute_prepared(query, params, time_as_text=True))
 
     @classmethod
     def _0_download_update_file(cls):
         from API.StockFutOpt import Option
         this_yymm = DTC.date_to_str(DTC.today(), '%y%m')
-        items = O01_ITEMS.read(columns='cd', where=f"exp_m >= '{this_yymm}'")
+        items = O01_ITEMS.read_query(O01_ITEMS.query('cd').where("exp_m >= %s", this_yymm))
         # items = O01_ITEMS.read(columns='cd')
 
         codes = items.cd
-
-        columns = ['code'] + Option.columns_ko_min
-        sub_result = pd.DataFrame(columns=columns)
-
-        for code in tqdm(codes):
-            query = f"SELECT cd, date(max(dt)) FROM {cls.TABLE_NAME} " \
-                    f"WHERE cd = '{code}' " \
-                    "GROUP BY cd;"
-            temp_df = cls.execute_query(query)
-
-            # 기존에 저장된 내용이 없는 경우 : 1년 전부터
-            if len(temp_df) == 0:
-                srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365 - 1))
-            else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
-                srtdate = DTC.date_to_int(temp_df['date'].iloc[0])
-            enddate = DTC.today()
-            if DTC.is_holiday(enddate): enddate = DTC.prev_business_day(enddate)
-
-            chart = Option.request_option_min_chart(code=code, srt_date=srtdate, end_date=enddate, skip_delist=True)
-            if chart is None or len(chart) == 0: continue
-
-            chart.loc[:, 'code'] = code
-            chart['날짜'] = chart['날짜'].astype(str)
-            chart['시간'] = chart['시간'].astype(str).str.zfill(4)
-            chart = chart[['code', *chart.columns[:-1]]]
-            # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
-            chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
-            sub_result = pd.concat([sub_result, chart], axis=0)
-
-            if len(sub_result) >= 500000:
-                sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                                   sep='\t', index=None, header=None, mode='a')
-                sub_result = pd.DataFrame(columns=Option.columns_ko_min)
-
-        if len(sub_result) > 0:
-            sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                              sep='\t', index=None, header=None, mode='a')
-
-
-def update(move_files_after_update=True, rm_prev_files=False):
+        # 코드별 마지막 저장 시점을 한번에 조회
+        watermarks = cls.read_watermarks(codes)
+
+        with cls.update_file_writer(SAVE_FILE_NAME_TAG) as writer:
+            for code in tqdm(codes):
+                watermark = watermarks.get(code)
+                # 기존에 저장된 내용이 없는 경우 : 1년 전부터
+                if watermark is None:
+                    srtdate = DTC.date_to_int(DTC.shift_date(DTC.today().date(), -365 - 1))
+                else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
+                    srtdate = DTC.date_to_int(watermark[0])
+                enddate = DTC.today()
+                if DTC.is_holiday(enddate): enddate = DTC.prev_business_day(enddate)
+
+                chart = Option.request_option_min_chart(code=code, srt_date=srtdate, end_date=enddate, skip_delist=True)
+                if chart is None or len(chart) == 0: continue
+
+                chart.loc[:, 'code'] = code
+                chart['날짜'] = chart['날짜'].astype(str)
+                chart['시간'] = chart['시간'].astype(str).str.zfill(4)
+                chart = chart[['code', *chart.columns[:-1]]]
+                # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
+                chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
+                # 이미 저장된 마지막 봉까지는 제외
+                writer.append(cls.drop_rows_until_watermark(chart, watermark))
+
+
+TABLES_TO_BE_UPDATED = (F12_MINCHART,
+                        F13_SECCHART,
+                        O01_ITEMS,
+                        O11_DAYCHART,
+                        O12_MINCHART,
+                        )
+
+
+def update(move_files_after_update=True, rm_prev_files=False, parallel=False, max_workers=4):
+    """
+    parallel=True : UPDATE_DEPENDS_ON 의존관계에 따라 독립적인 테이블을 동시에 업데이트.
+    테이블별 다운로드가 작업 스레드에서 실행되므로, 제공자(Creon Plus, COM)가 여러 스레드에서 호출 가능한 경우에만 사용
+    """
     if rm_prev_files:
         import os
         directory_path = 'update_files'
         for file_name in os.listdir(directory_path):
-            if file_name.endswith('.txt'):
+            if file_name.endswith(('.txt', '.bin')):
                 os.remove(f"{directory_path}\\{file_name}")
 
-    TABLES_TO_BE_UPDATED = (F12_MINCHART,
-                            F13_SECCHART,
-                            O01_ITEMS,
-                            O11_DAYCHART,
-                            O12_MINCHART,
-                            )
-
-    for TABLE in TABLES_TO_BE_UPDATED:
-        print(TABLE.TABLE_NAME)
-        TABLE.update()
-        TABLE.rollback()
+    if parallel:
+        Base.UpdateScheduler(TABLES_TO_BE_UPDATED, max_workers=max_workers).run()
+    else:
+        for TABLE in TABLES_TO_BE_UPDATED:
+            print(TABLE.TABLE_NAME)
+            TABLE.update()
+            TABLE.rollback()
 
     # 삽입한 파일은 백업 폴더로 이동
     if move_files_after_update:
-        import os
+        move_update_files()
 
-        directory_path = 'update_files'
-        today_str = str(DTC.today().date())
-        if f'backup_{today_str}' not in os.listdir(directory_path):
-            os.mkdir(f"{directory_path}/backup_{today_str}")
 
-        for file_name in os.listdir(directory_path):
-            if (file_name.startswith('F') or file_name.startswith('O')) and file_name.endswith('.txt'):
-                os.rename(src=f"{directory_path}/{file_name}",
-                          dst=f"{directory_path}/backup_{today_str}/{file_name}")
+def move_update_files():
+    import os
+
+    directory_path = 'update_files'
+    today_str = str(DTC.today().date())
+    if f'backup_{today_str}' not in os.listdir(directory_path):
+        os.mkdir(f"{directory_path}/backup_{today_str}")
+
+    for file_name in os.listdir(directory_path):
+        if (file_name.startswith('F') or file_name.startswith('O')) and file_name.endswith(('.txt', '.bin')):
+            os.rename(src=f"{directory_path}/{file_name}",
+                      dst=f"{directory_path}/backup_{today_str}/{file_name}")
 
 def backup():
     BACKUP_TABLES = (F12_MINCHART, F13_SECCHART, F22_NASDAQ_MINCHART,
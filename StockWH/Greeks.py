@@ -0,0 +1,175 @@
+"""
+옵션 이론가/그릭스/내재변동성 벡터 연산 모듈 (Black-76 : 선물가격을 기초자산으로 하는 Black-Scholes).
+모든 함수는 numpy 배열(또는 스칼라)을 받아서 행 단위 루프 없이 계산한다.
+T : 만기까지 기간(년), sigma : 연율 변동성(소수), r : 무위험이자율(연율, 소수), is_call : bool 배열
+theta는 1년 기준, vega/rho는 변동성/이자율 1.0(100%p) 기준 값 (테이블 단위로의 변환은 OptionItemReadable.compute_greeks)
+"""
+import math
+import functools
+import importlib.util
+from concurrent import futures
+import numpy as np
+
+SQRT_2PI = math.sqrt(2 * math.pi)
+# 정규분포 CDF : scipy가 있으면 scipy.special.ndtr, 없으면 _erfc. 어느 쪽을 쓸지는 import 시 한번만 결정
+# (scipy.special은 import에 ~0.2초가 걸리므로 처음 계산할 때 import)
+HAS_SCIPY = importlib.util.find_spec('scipy') is not None
+
+# W. J. Cody의 erfc 유리함수 근사 계수 (구간 |x| <= 0.46875 : A/B, <= 4 : C/D, > 4 : P/Q). 상대오차 ~1e-15
+_ERFC_A = (3.16112374387056560e00, 1.13864154151050156e02, 3.77485237685302021e02, 3.20937758913846947e03,
+           1.85777706184603153e-1)
+_ERFC_B = (2.36012909523441209e01, 2.44024637934444173e02, 1.28261652607737228e03, 2.84423683343917062e03)
+_ERFC_C = (5.64188496988670089e-1, 8.88314979438837594e00, 6.61191906371416295e01, 2.98635138197400131e02,
+           8.81952221241769090e02, 1.71204761263407058e03, 2.05107837782607147e03, 1.23033935479799725e03,
+           2.15311535474403846e-8)
+_ERFC_D = (1.57449261107098347e01, 1.17693950891312499e02, 5.37181101862009858e02, 1.62138957456669019e03,
+           3.29079923573345963e03, 4.36261909014324716e03, 3.43936767414372164e03, 1.23033935480374942e03)
+_ERFC_P = (3.05326634961232344e-1, 3.60344899949804439e-1, 1.25781726111229246e-1, 1.60837851487422766e-2,
+           6.58749161529837803e-4, 1.63153871373020978e-2)
+_ERFC_Q = (2.56852019228982242e00, 1.87295284992346725e00, 5.27905102951428412e-1, 6.05183413124413191e-2,
+           2.33520497626869185e-3)
+
+
+def _erfc(x):
+    """ numpy 벡터 연산 erfc (scipy가 없을 때). 구간별로 마스크를 나누어 계산 """
+    x = np.asarray(x, dtype='float64')
+    y = np.abs(x)
+    result = np.empty_like(y)
+
+    small = y <= 0.46875
+    ysq = np.square(y[small])
+    num, den = _ERFC_A[4] * ysq, ysq
+    for a, b in zip(_ERFC_A[:3], _ERFC_B[:3]):
+        num, den = (num + a) * ysq, (den + b) * ysq
+    result[small] = 1 - y[small] * (num + _ERFC_A[3]) / (den + _ERFC_B[3])
+
+    mid = ~small & (y <= 4)
+    ym = y[mid]
+    num, den = _ERFC_C[8] * ym, ym
+    for c, d in zip(_ERFC_C[:7], _ERFC_D[:7]):
+        num, den = (num + c) * ym, (den + d) * ym
+    result[mid] = (num + _ERFC_C[7]) / (den + _ERFC_D[7])
+
+    large = y > 4
+    yl = y[large]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        z = 1 / np.square(yl)
+        num, den = _ERFC_P[5] * z, z
+        for p, q in zip(_ERFC_P[:4], _ERFC_Q[:4]):
+            num, den = (num + p) * z, (den + q) * z
+        result[large] = (1 / math.sqrt(math.pi) - z * (num + _ERFC_P[4]) / (den + _ERFC_Q[4])) / yl
+        # exp(-y^2)를 두 부분으로 나누어 곱함 (y^2의 반올림 오차 방지)
+        yt = y[~small]
+        ysq = np.trunc(yt * 16) / 16
+        result[~small] *= np.exp(-ysq * ysq) * np.exp(-(yt - ysq) * (yt + ysq))
+    result[np.isinf(y)] = 0
+    return np.where(x < 0, 2 - result, result)
+
+
+@functools.lru_cache(maxsize=None)
+def _ndtr():
+    from scipy.special import ndtr
+    return ndtr
+
+
+def _norm_cdf(x):
+    if HAS_SCIPY:   return _ndtr()(x)
+    return 0.5 * _erfc(-np.asarray(x, dtype='float64') / math.sqrt(2))
+
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * np.square(x)) / SQRT_2PI
+
+
+def _broadcast(*arrays):
+    return np.broadcast_arrays(*(np.asarray(array, dtype='float64') for array in arrays))
+
+
+def _d1_d2(F, K, T, sigma):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma_sqrt_t = sigma * np.sqrt(T)
+        d1 = (np.log(F / K) + 0.5 * sigma_sqrt_t ** 2) / sigma_sqrt_t
+    return d1, d1 - sigma_sqrt_t
+
+
+def black76_price(F, K, T, sigma, r, is_call):
+    F, K, T, sigma, r = _broadcast(F, K, T, sigma, r)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+    d1, d2 = _d1_d2(F, K, T, sigma)
+    discount = np.exp(-r * T)
+    call = discount * (F * _norm_cdf(d1) - K * _norm_cdf(d2))
+    put = discount * (K * _norm_cdf(-d2) - F * _norm_cdf(-d1))
+    return np.where(is_call, call, put)
+
+
+def black76_greeks(F, K, T, sigma, r, is_call) -> dict:
+    """ {'price', 'delta', 'gamma', 'theta', 'vega', 'rho'} """
+    F, K, T, sigma, r = _broadcast(F, K, T, sigma, r)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+    d1, d2 = _d1_d2(F, K, T, sigma)
+    discount = np.exp(-r * T)
+    pdf_d1 = _norm_pdf(d1)
+    price = black76_price(F, K, T, sigma, r, is_call)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_t = np.sqrt(T)
+        return {
+            'price': price,
+            'delta': np.where(is_call, discount * _norm_cdf(d1), -discount * _norm_cdf(-d1)),
+            'gamma': discount * pdf_d1 / (F * sigma * sqrt_t),
+            'theta': r * price - discount * F * pdf_d1 * sigma / (2 * sqrt_t),
+            'vega':  discount * F * pdf_d1 * sqrt_t,
+            'rho':   -T * price,
+        }
+
+
+def implied_volatility(price, F, K, T, r, is_call, tol=1e-8, max_iter=100, lo=1e-6, hi=5.0):
+    """
+    가격 -> 내재변동성. 전체 배열에 대해 동시에 Newton 스텝을 진행하되, 구간 [lo, hi]를 벗어나거나 vega가 너무 작으면
+    이분법 스텝으로 대체 (수렴 보장). 무차익 범위를 벗어난 가격이나 만기가 지난 행은 NaN
+    """
+    price, F, K, T, r = _broadcast(price, F, K, T, r)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+    discount = np.exp(-r * T)
+    intrinsic = discount * np.where(is_call, np.maximum(F - K, 0), np.maximum(K - F, 0))
+    upper = discount * np.where(is_call, F, K)
+    valid = (T > 0) & (price > intrinsic) & (price < upper) & np.isfinite(price) & np.isfinite(F)
+
+    sigma = np.full(F.shape, np.nan)
+    idx = np.flatnonzero(valid)
+    p, f, k, t, rr, c = (array.ravel()[idx] for array in (price, F, K, T, r, is_call))
+    lower_bound, upper_bound = np.full(len(idx), lo), np.full(len(idx), hi)
+    # 초기값 : Brenner-Subrahmanyam 근사
+    s = np.clip(np.sqrt(2 * np.pi / t) * p / (np.exp(-rr * t) * f), lo, hi)
+    active = np.ones(len(idx), dtype=bool)
+    for _ in range(max_iter):
+        if not active.any():    break
+        greeks = black76_greeks(f[active], k[active], t[active], s[active], rr[active], c[active])
+        diff = greeks['price'] - p[active]
+        # 가격은 sigma에 대해 증가함수이므로 diff 부호로 구간을 좁힘
+        lower_bound[active] = np.where(diff < 0, s[active], lower_bound[active])
+        upper_bound[active] = np.where(diff > 0, s[active], upper_bound[active])
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = s[active] - diff / greeks['vega']
+        bisect = 0.5 * (lower_bound[active] + upper_bound[active])
+        use_newton = np.isfinite(newton) & (newton > lower_bound[active]) & (newton < upper_bound[active])
+        s[active] = np.where(use_newton, newton, bisect)
+        converged = np.abs(diff) < tol
+        active[np.flatnonzero(active)[converged]] = False
+    sigma.ravel()[idx] = s
+    return sigma
+
+
+def _implied_volatility_chunk(args, **kwargs):
+    return implied_volatility(*args, **kwargs)
+
+
+def implied_volatility_parallel(price, F, K, T, r, is_call, n_jobs=None, chunksize=1000000, **kwargs):
+    """ 행이 많을 때 chunksize 행씩 나누어 프로세스 풀에서 implied_volatility 계산. kwargs는 implied_volatility로 전달 """
+    price, F, K, T, r = (array.ravel() for array in _broadcast(price, F, K, T, r))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    if len(price) <= chunksize or n_jobs == 1:
+        return implied_volatility(price, F, K, T, r, is_call, **kwargs)
+    chunks = [tuple(array[i:i + chunksize] for array in (price, F, K, T, r, is_call))
+              for i in range(0, len(price), chunksize)]
+    with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return np.concatenate(list(executor.map(functools.partial(_implied_volatility_chunk, **kwargs), chunks)))
@@ -0,0 +1,60 @@
+"""
+차트 테이블의 로컬 컬럼형(Parquet) 캐시.
+<CACHE_DIR>/<table_name>/<cd>/<yyyy-mm>.parquet 구조로 (테이블, 종목코드, 월) 단위 파티션을 저장.
+지나간 달의 데이터만 저장하며, update() 이후 새로 upsert된 (cd, 월) 파티션은 삭제(invalidate)된다.
+"""
+import os
+import importlib.util
+import pandas as pd
+
+NO_CODE = '_all'    # cd 컬럼이 없는 테이블(F22_NASDAQ_MINCHART 등)의 파티션 디렉토리명
+
+
+def is_available() -> bool:
+    # pyarrow는 import 비용이 크므로 실제로 캐시를 읽을 때 import
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def partition_path(root: str, table_name: str, cd, month: pd.Period) -> str:
+    cd = NO_CODE if cd is None else str(cd).strip()
+    return os.path.join(root, table_name, cd, f"{month.strftime('%Y-%m')}.parquet")
+
+
+def read_partition(root: str, table_name: str, cd, month: pd.Period):
+    """ 캐시된 파티션을 memory-map으로 읽어서 반환. 없으면 None """
+    path = partition_path(root, table_name, cd, month)
+    if not os.path.isfile(path):    return None
+    import pyarrow.parquet as pq
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+
+def write_partition(root: str, table_name: str, cd, month: pd.Period, df: pd.DataFrame):
+    path = partition_path(root, table_name, cd, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 쓰는 도중 실패해도 깨진 파일이 남지 않도록 임시파일에 쓰고 교체
+    df.to_parquet(f"{path}.tmp", engine='pyarrow', index=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def invalidate(root: str, table_name: str, partitions) -> int:
+    """
+    partitions : iterable of (cd, month). 삭제한 파티션 수를 반환
+    cd=None으로 읽어서 저장된 전체 종목 파티션(NO_CODE)도 같은 달의 종목이 하나라도 바뀌면 함께 삭제
+    """
+    months = set()
+    paths = set()
+    for cd, month in partitions:
+        month = pd.Period(month, freq='M')
+        months.add(month)
+        paths.add(partition_path(root, table_name, cd, month))
+    paths.update(partition_path(root, table_name, None, month) for month in months)
+    count = 0
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+            count += 1
+    return count
+
+
+def has_table(root: str, table_name: str) -> bool:
+    return os.path.isdir(os.path.join(root, table_name))
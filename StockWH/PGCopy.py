@@ -0,0 +1,138 @@
+"""
+PostgreSQL COPY binary 포맷(PGCOPY) 인코더.
+TABLE_SCHEMA의 컬럼 타입대로 DataFrame을 바이너리로 변환하여, DB가 NUMERIC/DATE/TIME을 텍스트에서 파싱하지 않도록 함.
+NUMERIC 컬럼은 고정길이 float8로 적재하고(staging_schema), temp 테이블 -> 원본 테이블 upsert 시 NUMERIC으로 변환된다.
+"""
+import re
+import struct
+import numpy as np
+import pandas as pd
+
+HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+TRAILER = struct.pack('>h', -1)
+PG_EPOCH = np.datetime64('2000-01-01', 'D')
+
+# kind -> (numpy big-endian dtype, struct format)
+FIXED_WIDTH_KINDS = {
+    'float8': ('>f8', '>d'),
+    'int4':   ('>i4', '>i'),
+    'int8':   ('>i8', '>q'),
+    'date':   ('>i4', '>i'),    # 2000-01-01 기준 일수
+    'time':   ('>i8', '>q'),    # 00:00:00 기준 마이크로초
+}
+
+
+def field_kind(field_type: str) -> str:
+    field_type = field_type.upper()
+    if field_type.startswith('NUMERIC'):    return 'float8'
+    if field_type.startswith('INTEGER'):    return 'int4'
+    if field_type.startswith('BIGINT'):     return 'int8'
+    if field_type.startswith('DATE'):       return 'date'
+    if field_type == 'TIME':                return 'time'
+    return 'text'
+
+
+def staging_schema(TABLE_SCHEMA: str) -> str:
+    """ 바이너리 적재용 temp 테이블 스키마. NUMERIC(p,s) -> float8 """
+    return re.sub(r'NUMERIC\s*\(\s*\d+\s*,\s*\d+\s*\)', 'float8', TABLE_SCHEMA, flags=re.IGNORECASE)
+
+
+def _to_str(series: pd.Series) -> pd.Series:
+    """ NULL은 <NA>로 유지. 정수 컬럼이 NULL 때문에 float이 된 경우에도 '20240105.0'이 되지 않도록 정수로 변환 """
+    if pd.api.types.is_float_dtype(series):     series = series.astype('Int64')
+    return series.astype('string')
+
+
+def _to_date(series: pd.Series):
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(_to_str(series))
+    mask = series.isna().to_numpy()
+    days = (series.to_numpy().astype('datetime64[D]') - PG_EPOCH).astype('int64')
+    return days, mask
+
+
+def _to_time(series: pd.Series):
+    if pd.api.types.is_timedelta64_dtype(series):
+        mask = series.isna().to_numpy()
+        return series.to_numpy().astype('timedelta64[us]').astype('int64'), mask
+    # 'HHMM', 'HHMMSS', 'HH:MM:SS' 모두 허용. 정수에서 온 값은 앞자리 0이 빠져 있으므로(901, 90005) 왼쪽을 채움
+    mask = series.isna().to_numpy()
+    digits = _to_str(series).str.replace(':', '', regex=False).fillna('000000')
+    digits = digits.where(digits.str.len() > 4, digits.str.zfill(4) + '00').str.zfill(6)
+    hh = digits.str.slice(0, 2).astype('int64').to_numpy()
+    mm = digits.str.slice(2, 4).astype('int64').to_numpy()
+    ss = digits.str.slice(4, 6).astype('int64').to_numpy()
+    return ((hh * 60 + mm) * 60 + ss) * 1000000, mask
+
+
+class BinaryCopyEncoder:
+    """ fields : BaseDB.PARSE_TABLE_SCHEMA() 결과. DataFrame의 컬럼은 위치 순서대로 fields에 대응 """
+    def __init__(self, fields):
+        self.kinds = [field_kind(field_type) for field_type, _, _ in fields.values()]
+
+    @staticmethod
+    def header() -> bytes:
+        return HEADER
+
+    @staticmethod
+    def trailer() -> bytes:
+        return TRAILER
+
+    def _convert(self, kind, series: pd.Series):
+        if kind == 'date':  return _to_date(series)
+        if kind == 'time':  return _to_time(series)
+        mask = series.isna().to_numpy()
+        if kind == 'text':
+            return series.astype(str).str.encode('utf8').to_numpy(), mask
+        values = pd.to_numeric(series)
+        if kind != 'float8':    values = values.fillna(0)
+        return values.to_numpy().astype(FIXED_WIDTH_KINDS[kind][0][1:]), mask
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        if df.shape[1] != len(self.kinds):
+            raise ValueError(f"number of columns({df.shape[1]}) does not match the table schema({len(self.kinds)})")
+        if len(df) == 0:    return b''
+        columns = [self._convert(kind, df.iloc[:, i]) for i, kind in enumerate(self.kinds)]
+        encoded = self._encode_fixed_width(columns)
+        return encoded if encoded is not None else self._encode_rows(columns)
+
+    def _encode_fixed_width(self, columns):
+        """ NULL이 없고 text 컬럼 길이가 모두 같으면(종목코드 등) 행 전체가 고정길이 -> numpy 구조체 배열로 한번에 인코딩 """
+        dtype, widths = [('n', '>i2')], []
+        for i, (kind, (values, mask)) in enumerate(zip(self.kinds, columns)):
+            if mask.any():  return None
+            if kind == 'text':
+                lengths = np.frompyfunc(len, 1, 1)(values).astype('int64')
+                if lengths.min() != lengths.max() or lengths[0] == 0:   return None
+                width, value_dtype = int(lengths[0]), f'S{int(lengths[0])}'
+            else:
+                value_dtype = FIXED_WIDTH_KINDS[kind][0]
+                width = np.dtype(value_dtype).itemsize
+            dtype += [(f'l{i}', '>i4'), (f'v{i}', value_dtype)]
+            widths.append(width)
+
+        records = np.empty(len(columns[0][0]), dtype=dtype)
+        records['n'] = len(columns)
+        for i, ((values, _), width) in enumerate(zip(columns, widths)):
+            records[f'l{i}'] = width
+            records[f'v{i}'] = values
+        return records.tobytes()
+
+    def _encode_rows(self, columns):
+        """ NULL 또는 가변길이 text가 있는 경우 행 단위로 인코딩 """
+        n_fields = struct.pack('>h', len(columns))
+        null = struct.pack('>i', -1)
+        packers = [None if kind == 'text' else struct.Struct(FIXED_WIDTH_KINDS[kind][1]) for kind in self.kinds]
+        lists = [(values.tolist(), mask.tolist()) for values, mask in columns]
+
+        out = []
+        for row_idx in range(len(columns[0][0])):
+            out.append(n_fields)
+            for packer, (values, mask) in zip(packers, lists):
+                if mask[row_idx]:
+                    out.append(null)
+                    continue
+                data = values[row_idx] if packer is None else packer.pack(values[row_idx])
+                out.append(struct.pack('>i', len(data)))
+                out.append(data)
+        return b''.join(out)
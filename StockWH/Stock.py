@@ -17,13 +17,10 @@ SAVE_FILE_NAME_TAG = str(DTC.today().date())
 ################################################################
 
 def cd2nm(cd):
-    try:
-        return S01_ITEMS.read(columns='nm', where=f"cd='{cd}'")['nm'].iloc[0]
-    except IndexError:
-        return None
+    return S01_ITEMS.cd2nm(cd)
 
 
-class S01_ITEMS(Base.BaseDB):
+class S01_ITEMS(Base.CodeIndexable, Base.BaseDB):
     TABLE_NAME = TABLE_NAME_ITEM_LIST
     TABLE_SCHEMA = f"""
         CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
@@ -33,6 +30,7 @@ class S01_ITEMS(Base.BaseDB):
             PRIMARY KEY(cd)
         );"""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls):
@@ -71,6 +69,7 @@ class S10_DAY_INDEX(Base.DateIndexReadable, Base.BaseDB):
             PRIMARY KEY(market_type, dt)
         );"""
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
     def _0_download_update_file(cls, srtdate=None):
@@ -125,51 +124,43 @@ class S11_DAY_CHART(Base.RegularStockCheckable, Base.BaseDB):
             company_net_buy INTEGER   NOT NULL, 
             PRIMARY KEY(cd, dt)
         );"""
+    UPDATE_DEPENDS_ON = (S01_ITEMS, )
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
     @classmethod
-    def _0_download_update_file(cls, srtdate=None):
-        from API.Stock import DailyData
+    def _0_download_update_file(cls, srtdate=None, DailyData=None):
+        """ DailyData : 테스트 등을 위해 Request_data2, columns_day를 가진 다른 제공자를 주입할 수 있음 """
+        if DailyData is None:
+            from API.Stock import DailyData
 
         li = S01_ITEMS.read(columns='cd, nm').to_numpy().tolist()
         #query = "SELECT distinct cd FROM s11_daychart;"
         #codes_data_saved = cls.execute_query(query)
         if srtdate is None: srtdate = 20100101
 
-        columns = ['code'] + DailyData.columns_day
-        sub_result = pd.DataFrame(columns=columns)
-
-        for i, (code, name) in enumerate(li):
-            #if i < srt_idx: continue
-            if not cls.is_regular_stock_code(code=code): continue
-            print(i, '/', len(li), code, name)
-
-            chart = DailyData.Request_data2(code=code, srtdate=srtdate, skip_delist=True)
-
-            # 상장폐지 종목이면 스킵
-            if chart is None:
-                print(code, name, ":: delisted code.")
-                continue
-            # 데이터 없으면 스킵
-            if len(chart) == 0:
-                print(code, name, ':: length of downloaded data is zero(0).')
-                continue
-
-            chart.loc[:, 'code'] = code
-            chart = chart[['code', '날짜', '시가', '고가', '저가', '종가', '거래량',
-                           '거래대금', '누적체결매도수량', '누적체결매수수량', '시가총액', '기관순매수량']]
-            # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
-            chart.drop_duplicates(subset=['code', '날짜'], inplace=True)
-            sub_result = pd.concat([sub_result, chart], axis=0)
-
-            if len(sub_result) >= 500000:
-                sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                                  sep='\t', index=None, header=None, mode='a')
-                sub_result = pd.DataFrame(columns=columns)
-
-        if len(sub_result) > 0:
-            sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                              sep='\t', index=None, header=None, mode='a')
+        names = {code: name for code, name in li if cls.is_regular_stock_code(code=code)}
+        fetch = lambda code: DailyData.Request_data2(code=code, srtdate=srtdate, skip_delist=True)
+        # 끝난 순서대로 정규화/파일쓰기. 재시도 후에도 실패한 종목이 있으면 모두 쓴 뒤 DownloadError (업데이트 중단)
+        with cls.update_file_writer(SAVE_FILE_NAME_TAG) as writer:
+            for code, chart in cls.download_concurrently(names.keys(), fetch):
+                name = names[code]
+
+                # 상장폐지 종목이면 스킵
+                if chart is None:
+                    print(code, name, ":: delisted code.")
+                    continue
+                # 데이터 없으면 스킵
+                if len(chart) == 0:
+                    print(code, name, ':: length of downloaded data is zero(0).')
+                    continue
+
+                chart.loc[:, 'code'] = code
+                chart = chart[['code', '날짜', '시가', '고가', '저가', '종가', '거래량',
+                               '거래대금', '누적체결매도수량', '누적체결매수수량', '시가총액', '기관순매수량']]
+                # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생.
+                chart.drop_duplicates(subset=['code', '날짜'], inplace=True)
+                writer.append(chart)
 
 
 class S12_MINCHART(Base.DateTimeIndexReadable, Base.RegularStockCheckable, Base.BaseDB):
@@ -189,89 +180,103 @@ class S12_MINCHART(Base.DateTimeIndexReadable, Base.RegularStockCheckable, Base.
             vol_up          INTEGER     NOT NULL,
             PRIMARY KEY(cd, dt, tm)
         );"""
+    PARTITION_BY_MONTH = True
+    UPDATE_DEPENDS_ON = (S01_ITEMS, )
+    ROLLUP_TIMEFRAMES = ('5min', '15min', '60min', '1D')
+    ROLLUP_AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+                         'vol_down': 'sum', 'vol_up': 'sum'}
     SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
 
 
     @classmethod
-    def _0_download_update_file(cls):
-        from API.Stock import MinutelyData
+    def _0_download_update_file(cls, MinutelyData=None):
+        """ MinutelyData : 테스트 등을 위해 Request_min2, columns_min을 가진 다른 제공자를 주입할 수 있음 """
+        if MinutelyData is None:
+            from API.Stock import MinutelyData
 
         li = S01_ITEMS.read(columns='cd, nm').to_numpy().tolist()
 
-        columns = ['code'] + MinutelyData.columns_min
-        sub_result = pd.DataFrame(columns=columns)
-        for i, (code, name) in enumerate(li):
-            if not cls.is_regular_stock_code(code=code): continue
-            print(f" {i} / {len(li)}, {code}, {name} 시작")
-
-            # set srtdate
-            query = "SELECT cd, date(max(dt)) FROM s12_minchart " \
-                    f"WHERE cd = '{code}' " \
-                    "GROUP BY cd;"
-            temp_df = cls.execute_query(query)
-
-            # 기존에 저장된 내용이 없는 경우 : 2년 전부터
-            if len(temp_df) == 0:
-                srtdate = DTC.shift_date(DTC.today().date(), -365*2-7-1)
-            else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
-                srtdate = DTC.date_to_int(temp_df['date'].iloc[0])
-            #srtdate = 20211230
-            #enddate = 20211230
-            enddate = DTC.date_to_int(DTC.today())
-
-            chart = MinutelyData.Request_min2(code=code, srt_date=srtdate, end_date=enddate, skip_delist=True)
-            if chart is None or len(chart) == 0: continue
+        codes = [code for code, name in li if cls.is_regular_stock_code(code=code)]
+        # 코드별 마지막 저장 시점을 한번에 조회
+        watermarks = cls.read_watermarks(codes)
+        # 끝난 순서대로 정규화/파일쓰기. 재시도 후에도 실패한 종목이 있으면 모두 쓴 뒤 DownloadError (업데이트 중단)
+        with cls.update_file_writer(SAVE_FILE_NAME_TAG) as writer:
+            fetch = lambda code: cls._request_min_chart(MinutelyData, code, watermarks.get(code))
+            for code, chart in cls.download_concurrently(codes, fetch):
+                if chart is None or len(chart) == 0: continue
+                watermark = watermarks.get(code)
+
+                chart.loc[:, 'code'] = code
+                chart['날짜'] = chart['날짜'].astype(str)
+                chart['시간'] = chart['시간'].astype(str).str.zfill(4)
+                chart = chart[['code', *chart.columns[:-1]]]
+                # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생하므로, 중복 제거
+                chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
+                # 이미 저장된 마지막 봉까지는 제외
+                writer.append(cls.drop_rows_until_watermark(chart, watermark))
 
-            chart.loc[:, 'code'] = code
-            chart['날짜'] = chart['날짜'].astype(str)
-            chart['시간'] = chart['시간'].astype(str).str.zfill(4)
-            chart = chart[['code', *chart.columns[:-1]]]
-            # 중복된 데이터가 혹시라도 있는 경우, copy_from에서 에러 발생하므로, 중복 제거
-            chart.drop_duplicates(subset=['code', '날짜', '시간'], keep='first', inplace=True)
-            sub_result = pd.concat([sub_result, chart], axis=0)
+    @classmethod
+    def _request_min_chart(cls, MinutelyData, code, watermark=None):
+        """ watermark : read_watermarks()로 조회한 이 종목의 마지막 저장 (dt, tm) """
+        # set srtdate
+        # 기존에 저장된 내용이 없는 경우 : 2년 전부터
+        if watermark is None:
+            srtdate = DTC.shift_date(DTC.today().date(), -365*2-7-1)
+        else:  # 기존에 저장된 내용이 있는 경우 : 데이터 없는 주부터
+            srtdate = DTC.date_to_int(watermark[0])
+        #srtdate = 20211230
+        #enddate = 20211230
+        enddate = DTC.date_to_int(DTC.today())
 
-            if len(sub_result) > 500000:
-                sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                                  sep='\t', index=None, header=None, mode='a')
-                sub_result = pd.DataFrame(columns=columns)
+        return MinutelyData.Request_min2(code=code, srt_date=srtdate, end_date=enddate, skip_delist=True)
 
-        if len(sub_result) > 0:
-            sub_result.to_csv(f"update_files\\{cls.__name__}_{SAVE_FILE_NAME_TAG}.txt",
-                              sep='\t', index=None, header=None, mode='a')
 
+# 업데이트할 테이블 목록
+TABLES_TO_BE_UPDATED = (S01_ITEMS,
+                        S10_DAY_INDEX,
+                        S11_DAY_CHART,
+                        S12_MINCHART,
+                        )
 
-def update(move_files_after_update=True, rm_prev_files=False):
+
+def update(move_files_after_update=True, rm_prev_files=False, parallel=False, max_workers=4):
+    """
+    parallel=True : UPDATE_DEPENDS_ON 의존관계에 따라 독립적인 테이블을 동시에 업데이트.
+    테이블별 다운로드가 작업 스레드에서 실행되므로, 제공자(Creon Plus, COM)가 여러 스레드에서 호출 가능한 경우에만 사용
+    """
     if rm_prev_files:
         import os
         directory_path = 'update_files'
         for file_name in os.listdir(directory_path):
-            if file_name.endswith('.txt'):
+            if file_name.endswith(('.txt', '.bin')):
                 os.remove(f"{directory_path}\\{file_name}")
 
-    # 업데이트할 테이블 목록
-    TABLES_TO_BE_UPDATED = (S01_ITEMS,
-                            S10_DAY_INDEX,
-                            S11_DAY_CHART,
-                            S12_MINCHART,
-                            )
     # 업데이트 수행
-    for TABLE in TABLES_TO_BE_UPDATED:
-        TABLE.update()
-        TABLE.rollback()
+    if parallel:
+        Base.UpdateScheduler(TABLES_TO_BE_UPDATED, max_workers=max_workers).run()
+    else:
+        for TABLE in TABLES_TO_BE_UPDATED:
+            TABLE.update()
+            TABLE.rollback()
 
     # 삽입한 파일은 백업 폴더로 이동
     if move_files_after_update:
-        import os
+        move_update_files()
 
-        directory_path = 'update_files'
-        today_str = str(DTC.today().date())
-        if f'backup_{today_str}' not in os.listdir(directory_path):
-            os.mkdir(f"{directory_path}/backup_{today_str}")
 
-        for file_name in os.listdir(directory_path):
-            if file_name.startswith('S') and file_name.endswith('.txt'):
-                os.rename(src=f"{directory_path}/{file_name}",
-                          dst=f"{directory_path}/backup_{today_str}/{file_name}")
+def move_update_files():
+    import os
+
+    directory_path = 'update_files'
+    today_str = str(DTC.today().date())
+    if f'backup_{today_str}' not in os.listdir(directory_path):
+        os.mkdir(f"{directory_path}/backup_{today_str}")
+
+    for file_name in os.listdir(directory_path):
+        if file_name.startswith('S') and file_name.endswith(('.txt', '.bin')):
+            os.rename(src=f"{directory_path}/{file_name}",
+                      dst=f"{directory_path}/backup_{today_str}/{file_name}")
 
 
 def backup():
@@ -0,0 +1,72 @@
+"""
+초봉 등 대용량 차트의 memory-map 저장소.
+<STORE_DIR>/<table_name>/<cd>/<yyyymmdd>.npy : 하루치 고정길이 구조체 배열 (np.save 포맷, dttm 오름차순)
+<STORE_DIR>/<table_name>/<cd>/index.npy      : 저장된 날짜와 행 수 (INDEX_DTYPE)
+np.load(mmap_mode='r')로 읽으므로 재생(replay) 시 파일 내용을 복사하지 않으며, PostgreSQL을 거치지 않는다.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+INDEX_DTYPE = np.dtype([('dt', 'datetime64[D]'), ('n', 'int64')])
+INDEX_FILE_NAME = 'index.npy'
+
+
+def record_dtype(column_dtypes) -> np.dtype:
+    """ COLUMN_DTYPES -> 구조체 dtype. cd, dt는 경로에 들어가므로 제외하고, dt + tm은 dttm(datetime64[us]) 필드로 저장 """
+    fields = [('dttm', 'datetime64[us]')]
+    for field_name, dtype in column_dtypes.items():
+        if field_name in ('cd', 'dt', 'tm'):    continue
+        if dtype not in ('float64', 'int32', 'int64'):
+            raise TypeError(f"column '{field_name}'({dtype}) can not be stored as a fixed-width field")
+        fields.append((field_name, dtype))
+    return np.dtype(fields)
+
+
+def to_records(chart: pd.DataFrame, dtype: np.dtype) -> np.ndarray:
+    """ chart : dt(datetime64), tm(timedelta64)과 dtype의 나머지 필드를 컬럼으로 가진 DataFrame """
+    records = np.empty(len(chart), dtype=dtype)
+    records['dttm'] = (chart['dt'] + chart['tm']).to_numpy().astype('datetime64[us]')
+    for field_name in dtype.names[1:]:
+        records[field_name] = chart[field_name].to_numpy()
+    records.sort(order='dttm', kind='stable')
+    return records
+
+
+def code_dir(root: str, table_name: str, cd) -> str:
+    return os.path.join(root, table_name, str(cd).strip())
+
+
+def day_path(root: str, table_name: str, cd, dt) -> str:
+    return os.path.join(code_dir(root, table_name, cd), f"{pd.Timestamp(dt).strftime('%Y%m%d')}.npy")
+
+
+def _save(path: str, array: np.ndarray):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 쓰는 도중 실패해도 깨진 파일이 남지 않도록 임시파일에 쓰고 교체
+    with open(f"{path}.tmp", mode='wb') as f:
+        np.save(f, array)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_index(root: str, table_name: str, cd) -> np.ndarray:
+    path = os.path.join(code_dir(root, table_name, cd), INDEX_FILE_NAME)
+    if not os.path.isfile(path):    return np.empty(0, dtype=INDEX_DTYPE)
+    return np.load(path)
+
+
+def write_days(root: str, table_name: str, cd, days) -> np.ndarray:
+    """ days : {dt: 구조체 배열}. 하루치 파일을 (덮어)쓰고 index를 갱신해서 반환 """
+    index = read_index(root, table_name, cd)
+    entries = {dt: n for dt, n in index.tolist()}
+    for dt, records in days.items():
+        _save(day_path(root, table_name, cd, dt), records)
+        entries[pd.Timestamp(dt).date()] = len(records)
+    index = np.array(sorted(entries.items()), dtype=INDEX_DTYPE)
+    _save(os.path.join(code_dir(root, table_name, cd), INDEX_FILE_NAME), index)
+    return index
+
+
+def load_day(root: str, table_name: str, cd, dt) -> np.ndarray:
+    """ 하루치 배열을 memory-map으로 열어서 반환 (읽기 전용) """
+    return np.load(day_path(root, table_name, cd, dt), mmap_mode='r')
@@ -1,10 +1,19 @@
 
 __all__ = ['Stock', 'FutOpt']
 
-def update():
-    from StockWH import Stock, FutOpt
-    Stock.update()
-    FutOpt.update()
+def update(parallel=False, max_workers=8):
+    """
+    parallel=True : 주식/선물옵션 테이블 전체를 의존관계에 따라 한번에 병렬 업데이트.
+    다운로드가 작업 스레드에서 실행되므로, 제공자(Creon Plus, COM)가 여러 스레드에서 호출 가능한 경우에만 사용
+    """
+    from StockWH import Base, Stock, FutOpt
+    if not parallel:
+        Stock.update(parallel=False)
+        FutOpt.update(parallel=False)
+        return
+    Base.UpdateScheduler(Stock.TABLES_TO_BE_UPDATED + FutOpt.TABLES_TO_BE_UPDATED, max_workers=max_workers).run()
+    Stock.move_update_files()
+    FutOpt.move_update_files()
 
 def backup():
     from StockWH import Stock, FutOpt
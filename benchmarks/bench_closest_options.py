@@ -0,0 +1,21 @@
+"""
+read_closest_cp_options (날짜별 쿼리 3번) vs read_closest_cp_options_batch (전체 날짜 쿼리 2번) : 2년치 영업일
+"""
+import pandas as pd
+from common import connect, timer
+
+SRTDT, ENDDT = '2022-01-03', '2023-12-29'
+
+if __name__ == '__main__':
+    connect()
+    from StockWH import FutOpt
+    table = FutOpt.O12_MINCHART
+    dates = pd.bdate_range(SRTDT, ENDDT)
+    for criterion in ('open', 'close'):
+        with timer(f'per date ({criterion})', len(dates), 'dates'):
+            per_date = [table.read_closest_cp_options('KOSPI200', str(date.date()), criterion=criterion)
+                        for date in dates]
+        with timer(f'batch ({criterion})', len(dates), 'dates'):
+            batch = table.read_closest_cp_options_batch('KOSPI200', dates, criterion=criterion)
+        n_rows = sum(len(call) + len(put) for call, put in per_date if call is not None)
+        print(f"  rows per date {n_rows:,} | batch {len(batch):,}")
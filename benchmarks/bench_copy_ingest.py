@@ -0,0 +1,52 @@
+"""
+COPY text vs binary(PGCOPY) 적재 속도 (rows/s). O12_MINCHART 형태(NUMERIC 컬럼이 많음)의 N_ROWS행 가상 데이터
+1. 인코딩 : UpdateFileWriter가 하는 변환 (to_csv / BinaryCopyEncoder.encode). DB 없이 측정
+2. 적재 : temp 테이블로 copy_from(text) / copy_expert(FORMAT binary). PGDATABASE 환경변수가 있을 때만 측정
+"""
+import io
+import os
+import numpy as np
+import pandas as pd
+from common import connect, timer
+from StockWH import FutOpt, PGCopy
+
+N_ROWS = 1000000
+
+
+def make_chart(n, rng):
+    minutes = np.arange(n) % 381
+    chart = pd.DataFrame({'cd': '201S3' + pd.Series(rng.integers(300, 400, n)).astype(str),
+                          'dt': 20220302, 'tm': 900 + minutes // 60 * 100 + minutes % 60})
+    for field in ('open', 'high', 'low', 'close'):
+        chart[field] = rng.integers(1, 100000, n) / 100
+    for field in ('volume', 'acc_vol_down', 'acc_vol_up', 'incomplete'):
+        chart[field] = rng.integers(0, 10000, n)
+    for field in ('theory_price', 'iv', 'delta', 'gamma', 'theta', 'vega', 'rho'):
+        chart[field] = rng.integers(-9999, 9999, n) / 10000
+    return chart
+
+
+if __name__ == '__main__':
+    table = FutOpt.O12_MINCHART
+    chart = make_chart(N_ROWS, np.random.default_rng(0))
+    encoder = PGCopy.BinaryCopyEncoder(table.PARSE_TABLE_SCHEMA(table.TABLE_SCHEMA))
+    with timer('encode text (to_csv)', N_ROWS, 'rows'):
+        text = chart.to_csv(sep='\t', index=None, header=None)
+    with timer('encode binary (BinaryCopyEncoder)', N_ROWS, 'rows'):
+        binary = encoder.header() + encoder.encode(chart) + encoder.trailer()
+    print(f"  size : text {len(text.encode('utf8')) / 2 ** 20:,.1f} MiB | binary {len(binary) / 2 ** 20:,.1f} MiB")
+
+    if 'PGDATABASE' in os.environ:
+        connect()
+        temp_table = f"temp_{table.TABLE_NAME.lower()}"
+        for label, binary_format in (('copy_from text', False), ('copy_expert binary', True)):
+            with table.transaction():
+                table._1_0_drop_temp_table()
+                table._1_1_create_temp_table(binary=binary_format)
+                with timer(label, N_ROWS, 'rows'), table.cursor() as cursor:
+                    if binary_format:
+                        cursor.copy_expert(f"COPY {temp_table} FROM STDIN WITH (FORMAT binary)", io.BytesIO(binary),
+                                           size=1 << 20)
+                    else:
+                        cursor.copy_from(io.StringIO(text), temp_table, null='')
+                table._1_0_drop_temp_table()
@@ -0,0 +1,23 @@
+"""
+대량 조회 : read(engine='fetchall') vs read(engine='copy')
+- fetchall : 서버에서 행을 받아 셀마다 파이썬 객체 생성 -> DataFrame -> _postprocess
+- copy : COPY (SELECT ~) TO STDOUT CSV -> pd.read_csv로 컬럼 단위 파싱 -> _postprocess
+두 결과의 dtype이 같은지도 확인
+"""
+from common import connect, timer
+
+SRTDT, ENDDT = '2022-03-02', '2022-03-31'
+
+if __name__ == '__main__':
+    connect(maxconn=1)
+    from StockWH import Stock
+    table = Stock.S12_MINCHART
+    where = f"dt BETWEEN '{SRTDT}' AND '{ENDDT}'"
+    n_rows = table.read(columns='count(*)', where=where, is_org=True).iloc[0, 0]
+    print(f"{table.TABLE_NAME} {SRTDT} ~ {ENDDT} : {n_rows:,} rows")
+
+    with timer("read(engine='fetchall')", n_rows, 'rows'):
+        by_fetchall = table.read(where=where)
+    with timer("read(engine='copy')", n_rows, 'rows'):
+        by_copy = table.read(where=where, engine='copy')
+    assert by_copy.dtypes.astype(str).to_dict() == by_fetchall.dtypes.astype(str).to_dict()
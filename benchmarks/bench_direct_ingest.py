@@ -0,0 +1,62 @@
+"""
+update() 파일 경유 vs direct_ingest : 전체 소요시간(wall time)과 디스크에 쓴 update 파일 크기
+다운로드는 종목마다 DOWNLOAD_LATENCY초 대기 후 분봉 ROWS_PER_CODE행을 만드는 것으로 대신함 (API 호출 간격 흉내)
+별도 테이블(bench_ingest)에 적재하고 끝나면 삭제
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+from common import connect
+
+N_CODES, ROWS_PER_CODE, DOWNLOAD_LATENCY = 300, 381, 0.02
+
+
+if __name__ == '__main__':
+    connect()
+    from StockWH import Base
+
+    class BENCH_INGEST(Base.BaseDB):     # update 파일은 대문자 클래스명으로 찾음
+        TABLE_NAME = 'bench_ingest'
+        TABLE_SCHEMA = f"""
+            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+                cd      char(7)     NOT NULL,
+                dt      DATE        NOT NULL,
+                tm      TIME        NOT NULL,
+                close   INTEGER     NOT NULL,
+                volume  INTEGER     NOT NULL,
+                PRIMARY KEY(cd, dt, tm)
+            );"""
+        SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+        COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+        dt = 20240105
+
+        @classmethod
+        def _0_download_update_file(cls):
+            rng = np.random.default_rng(0)
+            minutes = np.arange(ROWS_PER_CODE)
+            with cls.update_file_writer('bench') as writer:
+                for i in range(N_CODES):
+                    time.sleep(DOWNLOAD_LATENCY)
+                    writer.append(pd.DataFrame({'cd': f'A{i:06d}', 'dt': cls.dt,
+                                                'tm': 900 + minutes // 60 * 100 + minutes % 60,
+                                                'close': rng.integers(1, 100000, ROWS_PER_CODE),
+                                                'volume': rng.integers(0, 1000, ROWS_PER_CODE)}))
+
+    os.makedirs('update_files\\', exist_ok=True)
+    BENCH_INGEST.create_cls_table()
+    try:
+        for label, kwargs in (('file', {}), ('direct_ingest + update file', {'direct_ingest': True}),
+                              ('direct_ingest only', {'direct_ingest': True, 'keep_update_file': False})):
+            BENCH_INGEST.dt += 1     # 날짜마다 새 행 (append 경로)
+            path = f'update_files\\{BENCH_INGEST.__name__}_bench.txt'
+            if os.path.exists(path):    os.remove(path)
+            timings = {}
+            srt = time.perf_counter()
+            staged = BENCH_INGEST.update(timings=timings, **kwargs)
+            elapsed = time.perf_counter() - srt
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            print(f"{label:<40s} {elapsed:8.3f}s, {staged / elapsed:,.0f} rows/s | update file {size / 2 ** 20:,.1f} MiB "
+                  f"| {', '.join(f'{step} {seconds:.2f}s' for step, seconds in timings.items())}")
+    finally:
+        BENCH_INGEST.execute_query(f"DROP TABLE IF EXISTS {BENCH_INGEST.TABLE_NAME};")
@@ -0,0 +1,47 @@
+"""
+DateTimeIndexReadable의 dttm 생성 속도. DB 없이 분봉 규모(N행)의 가상 dt/tm으로 측정
+- 이전 : dt, tm(datetime.time)을 문자열로 바꿔서 이어붙인 후 pd.to_datetime으로 재파싱
+- 현재 : TIME을 문자열로 받아 고유한 시각만 pd.to_timedelta로 변환 -> datetime64 + timedelta64 (_postprocess 전체)
+"""
+import datetime
+import numpy as np
+import pandas as pd
+from common import timer
+from StockWH import Base
+
+N = 3000000
+
+
+class MinChart(Base.DateTimeIndexReadable, Base.BaseDB):
+    TABLE_NAME = 'bench_minchart'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd          char(7)         NOT NULL,
+            dt          DATE            NOT NULL,
+            tm          TIME            NOT NULL,
+            close       INTEGER         NOT NULL,
+            PRIMARY KEY(cd, dt, tm)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    # fetchall 결과와 같은 형태 : dt는 datetime.date, tm은 datetime.time(이전) 또는 'HH:MM:SS'(TIME_AS_TEXT)
+    dates = pd.bdate_range('2020-01-01', periods=1000).date
+    minutes = 9 * 60 + np.arange(390)
+    dt = dates[rng.integers(0, len(dates), N)]
+    minute = minutes[rng.integers(0, len(minutes), N)]
+    times = [datetime.time(m // 60, m % 60) for m in minutes]
+    tm_as_time = np.array(times, dtype=object)[minute - minutes[0]]
+    tm_as_text = np.array([each.isoformat() for each in times], dtype=object)[minute - minutes[0]]
+    close = rng.integers(10000, 100000, N)
+
+    chart = pd.DataFrame({'dt': dt, 'tm': tm_as_time})
+    with timer('str(dt) + str(tm) -> to_datetime', N, 'rows'):
+        old = pd.to_datetime(pd.to_datetime(chart['dt']).astype(str) + ' ' + chart['tm'].astype(str))
+
+    chart = pd.DataFrame({'cd': 'A005930', 'dt': dt, 'tm': tm_as_text, 'close': close})
+    with timer('_postprocess (dt + tm)', N, 'rows'):
+        new = MinChart._postprocess(chart)
+    assert (new.index.values == old.values).all()
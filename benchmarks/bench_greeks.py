@@ -0,0 +1,35 @@
+"""
+Greeks 계산 속도. DB 없이 O12_MINCHART 규모(하루 분봉 x 옵션 종목)의 가상 데이터로 측정
+비교 : 정규분포 CDF (scipy ndtr / numpy _erfc / 이전 np.vectorize(math.erfc)), 내재변동성 (단일 / 프로세스 풀)
+"""
+import math
+import numpy as np
+from common import timer
+from StockWH import Greeks
+
+N = 1000000
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    x = rng.normal(0, 2, N)
+    if Greeks.HAS_SCIPY:
+        Greeks._ndtr()
+        with timer('norm_cdf (scipy ndtr)', N):
+            Greeks._ndtr()(x)
+    with timer('norm_cdf (numpy _erfc)', N):
+        0.5 * Greeks._erfc(-x / math.sqrt(2))
+    with timer('norm_cdf (np.vectorize(math.erfc))', N):
+        0.5 * np.vectorize(math.erfc, otypes=['float64'])(-x / math.sqrt(2))
+
+    F = 350 + rng.normal(0, 5, N)
+    K = 340 + 2.5 * rng.integers(0, 9, N)
+    T = rng.uniform(1, 60, N) / 365
+    is_call = rng.random(N) < 0.5
+    price = Greeks.black76_price(F, K, T, rng.uniform(0.1, 0.4, N), 0.03, is_call).round(2)
+    with timer('black76_greeks', N, 'rows'):
+        Greeks.black76_greeks(F, K, T, 0.2, 0.03, is_call)
+    with timer('implied_volatility', N, 'rows'):
+        Greeks.implied_volatility(price, F, K, T, 0.03, is_call)
+    with timer('implied_volatility_parallel (4 procs)', N, 'rows'):
+        Greeks.implied_volatility_parallel(price, F, K, T, 0.03, is_call, n_jobs=4, chunksize=N // 4)
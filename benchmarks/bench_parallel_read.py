@@ -0,0 +1,21 @@
+"""
+종목 200개 일봉 조회: 순차 vs 스레드 병렬 (연결 풀 maxconn보다 많은 스레드도 대기 후 성공해야 함)
+"""
+from concurrent import futures
+from common import connect, timer
+
+N_CODES = 200
+
+if __name__ == '__main__':
+    Base = connect(maxconn=8)
+    from StockWH import Stock
+    table = Stock.S11_DAY_CHART
+    codes = table.read(columns='DISTINCT cd', limit=N_CODES).cd.str.strip().tolist()
+
+    with timer('sequential', len(codes), 'codes'):
+        for cd in codes:
+            table.select(cd=cd)
+    for workers in (4, 8, 32):
+        with timer(f'threads={workers} (maxconn=8)', len(codes), 'codes'):
+            with futures.ThreadPoolExecutor(workers) as pool:
+                list(pool.map(lambda cd: table.select(cd=cd), codes))
@@ -0,0 +1,28 @@
+"""
+prepared statement 재사용 효과 : 같은 형태의 조회(종목/날짜만 다름)를 반복할 때 쿼리당 소요시간
+- execute_query : 값을 SQL 문자열에 넣어서 매번 파싱/플래닝
+- execute_prepared : 연결마다 한번 PREPARE, 이후 EXECUTE로 값만 전달 (select()/read_query()가 쓰는 경로)
+"""
+from common import connect, timer
+
+DATE, N_REPEAT = '2022-03-02', 2000
+
+if __name__ == '__main__':
+    connect(maxconn=1)
+    from StockWH import Stock
+    table = Stock.S12_MINCHART
+    codes = table.read(columns='DISTINCT cd', where=f"dt = '{DATE}'").cd.astype(str).str.strip().tolist()[:100]
+    query = f"SELECT tm, close FROM {table.TABLE_NAME} WHERE cd = %s AND dt = %s AND tm <= %s ORDER BY tm DESC LIMIT 1"
+    values = [(codes[i % len(codes)], DATE, f"{9 + i % 6:02d}:{i % 60:02d}:00") for i in range(N_REPEAT)]
+
+    # 값을 넣은 SQL 문자열은 미리 만들어 둠 (측정에는 실행 시간만 포함)
+    with table.cursor() as cursor:
+        queries = [cursor.mogrify(query, params).decode() for params in values]
+
+    with timer('unprepared (execute_query)', N_REPEAT, 'queries'):
+        for each in queries:
+            table.execute_query(each, dtype=list)
+    table.execute_prepared(query, values[0], dtype=list)     # PREPARE는 측정에서 제외
+    with timer('prepared (execute_prepared)', N_REPEAT, 'queries'):
+        for params in values:
+            table.execute_prepared(query, params, dtype=list)
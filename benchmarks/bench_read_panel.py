@@ -0,0 +1,22 @@
+"""
+read_panel vs 종목별 select + pivot : 종목 수별 총 소요시간과 종목당 소요시간
+"""
+import pandas as pd
+from common import connect, timer
+
+SRTDT, ENDDT = '2022-01-03', '2022-03-31'
+
+if __name__ == '__main__':
+    connect()
+    from StockWH import Stock
+    table = Stock.S12_MINCHART
+    all_codes = table.read(columns='DISTINCT cd', where=f"dt = '{ENDDT}'").cd.astype(str).str.strip().tolist()
+
+    for n_codes in (10, 100, 500):
+        codes = all_codes[:n_codes]
+        with timer(f'select x {n_codes} + pivot', n_codes, 'codes'):
+            frames = {cd: table.select(columns='dt, tm, close', cd=cd, srtdt=SRTDT, enddt=ENDDT)['close']
+                      for cd in codes}
+            pd.DataFrame(frames)
+        with timer(f'read_panel({n_codes})', n_codes, 'codes'):
+            table.read_panel(codes, fields=('close', ), srtdt=SRTDT, enddt=ENDDT)
@@ -0,0 +1,67 @@
+"""
+적재 속도 (rows/s) : 이전 방식(PK가 있는 temp 테이블 + INSERT ON CONFLICT) vs 인덱스 없는 TEMPORARY 테이블 + append 확인 + INSERT
+기존 데이터 EXISTING_DAYS일치가 있는 테이블(bench_staging)에 다음 날 N_CODES 종목 x ROWS_PER_CODE행을 적재. 끝나면 테이블 삭제
+"""
+import io
+import numpy as np
+import pandas as pd
+from common import connect, timer
+
+N_CODES, ROWS_PER_CODE, EXISTING_DAYS = 2000, 381, 5
+
+
+def day_rows(dt, rng):
+    minutes = np.arange(ROWS_PER_CODE)
+    tm = pd.to_timedelta(9 * 3600 + minutes * 60, unit='s').astype(str).str.slice(-8).tolist()
+    chart = pd.DataFrame({'cd': np.repeat([f'A{i:06d}' for i in range(N_CODES)], ROWS_PER_CODE), 'dt': dt,
+                          'tm': tm * N_CODES, 'close': rng.integers(1, 100000, N_CODES * ROWS_PER_CODE),
+                          'volume': rng.integers(0, 1000, N_CODES * ROWS_PER_CODE)})
+    return chart.to_csv(sep='\t', index=None, header=None)
+
+
+if __name__ == '__main__':
+    connect()
+    from StockWH import Base
+
+    class BENCH_STAGING(Base.BaseDB):
+        TABLE_NAME = 'bench_staging'
+        TABLE_SCHEMA = f"""
+            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+                cd      char(7)     NOT NULL,
+                dt      DATE        NOT NULL,
+                tm      TIME        NOT NULL,
+                close   INTEGER     NOT NULL,
+                volume  INTEGER     NOT NULL,
+                PRIMARY KEY(cd, dt, tm)
+            );"""
+        SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+        COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+    table, rng = BENCH_STAGING, np.random.default_rng(0)
+    dates = pd.bdate_range('2024-01-02', periods=EXISTING_DAYS + 1).strftime('%Y-%m-%d')
+    existing, new_day = [day_rows(dt, rng) for dt in dates[:-1]], day_rows(dates[-1], rng)
+    n_rows = N_CODES * ROWS_PER_CODE
+    temp_table = f"temp_{table.TABLE_NAME}"
+    # 이전 방식의 temp 테이블 : 원본과 같은 PK
+    old_temp_schema = table.TABLE_SCHEMA.replace(f'TABLE IF NOT EXISTS {table.TABLE_NAME}', f'TEMPORARY TABLE {temp_table}')
+
+    for label in ('PK temp table + upsert (old)', 'temp table + append (new)'):
+        table.execute_query(f"DROP TABLE IF EXISTS {table.TABLE_NAME};")
+        table.create_cls_table()
+        with table.cursor() as cursor:
+            for text in existing:   cursor.copy_from(io.StringIO(text), table.TABLE_NAME, null='')
+        table.execute_query(f"ANALYZE {table.TABLE_NAME};")
+        with timer(label, n_rows, 'rows'), table.transaction():
+            table._1_0_drop_temp_table()
+            if label.endswith('(old)'):
+                table.execute_query(old_temp_schema)
+            else:
+                table._1_1_create_temp_table()
+            with table.cursor() as cursor:
+                cursor.copy_from(io.StringIO(new_day), temp_table, null='')
+            if label.endswith('(old)'):
+                table.execute_query(table.SQL_TO_UPSERT_FROM_TEMP_TABLE)
+            else:
+                table._1_3_upsert_data()
+            table._1_0_drop_temp_table()
+    table.execute_query(f"DROP TABLE IF EXISTS {table.TABLE_NAME};")
@@ -0,0 +1,45 @@
+"""
+TickStore 재생 속도 (ticks/s). DB 없이 임시 디렉토리에 초봉 N_DAYS일치를 써두고 replay()로 읽음
+비교 : 같은 데이터를 하루치 DataFrame으로 만들어 넘기는 경우
+"""
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from common import timer
+from StockWH import Base, TickStore
+
+N_DAYS, TICKS_PER_DAY = 60, 23400     # 09:00 ~ 15:30 초봉
+
+
+class SecChart(Base.TickStorable, Base.BaseDB):
+    TABLE_NAME = 'bench_secchart'
+    COLUMN_DTYPES = {'cd': 'category', 'dt': 'datetime64[ns]', 'tm': 'timedelta64[ns]', 'open': 'float64',
+                     'high': 'float64', 'low': 'float64', 'close': 'float64', 'volume': 'int64'}
+
+
+if __name__ == '__main__':
+    SecChart.TICK_STORE_DIR = tempfile.mkdtemp()
+    dtype = TickStore.record_dtype(SecChart.COLUMN_DTYPES)
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2022-01-03', periods=N_DAYS)
+    with timer('write_days', N_DAYS * TICKS_PER_DAY, 'ticks'):
+        for dt in dates:
+            chart = pd.DataFrame({'dt': dt, 'tm': pd.to_timedelta(np.arange(TICKS_PER_DAY) + 9 * 3600, unit='s')})
+            for field in ('open', 'high', 'low', 'close'):  chart[field] = rng.random(TICKS_PER_DAY)
+            chart['volume'] = rng.integers(0, 100, TICKS_PER_DAY)
+            TickStore.write_days(SecChart.TICK_STORE_DIR, SecChart.TABLE_NAME, '10100',
+                                 {dt: TickStore.to_records(chart, dtype)})
+
+    for label, srtdt, enddt in (('replay (all days)', None, None),
+                                ('replay (intraday bounds)', f'{dates[1].date()} 10:00', f'{dates[-2].date()} 14:00')):
+        n, total = 0, 0.0
+        srt = time.perf_counter()
+        for records in SecChart.replay('10100', srtdt, enddt):
+            n += len(records)
+            total += records['close'].sum()
+        elapsed = time.perf_counter() - srt
+        print(f"{label:<40s} {elapsed:8.3f}s, {n / elapsed:,.0f} ticks/s ({n:,} ticks)")
+    with timer('replay -> DataFrame per day', N_DAYS * TICKS_PER_DAY, 'ticks'):
+        for records in SecChart.replay('10100'):
+            pd.DataFrame(records).set_index('dttm')
@@ -0,0 +1,51 @@
+"""
+update 파일 만들기 : 종목마다 누적 DataFrame에 pd.concat (이전 방식) vs UpdateFileWriter. 종목 수별 총 소요시간과 종목당 소요시간
+DB 없이 S12_MINCHART 형태의 하루치 분봉(381행)을 종목 수만큼 만들어서 임시 디렉토리에 기록
+"""
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from common import timer
+from StockWH import Base
+
+ROWS_PER_CODE = 381     # 09:00 ~ 15:20 분봉 + 15:30
+DTYPES = ['category', 'datetime64[ns]', 'timedelta64[ns]'] + ['int32'] * 7
+
+
+def make_chart(i, rng):
+    chart = pd.DataFrame({'cd': f'A{i:06d}', 'dt': 20240105,
+                          'tm': (900 + np.arange(ROWS_PER_CODE) // 60 * 100 + np.arange(ROWS_PER_CODE) % 60)})
+    for field in ('open', 'high', 'low', 'close', 'volume', 'vol_down', 'vol_up'):
+        chart[field] = rng.integers(1, 100000, ROWS_PER_CODE)
+    if i % 50 == 0:     chart.loc[0, 'volume'] = np.nan    # 정수 컬럼의 NaN (NULL로 기록되어야 함)
+    return chart
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    charts = [make_chart(i, rng) for i in range(2000)]
+    directory = tempfile.mkdtemp()
+    for n_codes in (500, 1000, 2000):
+        path = os.path.join(directory, f'concat_{n_codes}.txt')
+        srt = time.perf_counter()
+        df = pd.DataFrame()
+        for chart in charts[:n_codes]:
+            df = pd.concat([df, chart])
+        df.to_csv(path, sep='\t', index=None, header=None)
+        elapsed = time.perf_counter() - srt
+        print(f"{f'pd.concat accumulation x {n_codes}':<40s} {elapsed:8.3f}s, {elapsed / n_codes * 1000:.2f} ms/code")
+
+        path = os.path.join(directory, f'writer_{n_codes}.txt')
+        srt = time.perf_counter()
+        with Base.UpdateFileWriter(path, dtypes=DTYPES) as writer:
+            for chart in charts[:n_codes]:
+                writer.append(chart)
+        elapsed = time.perf_counter() - srt
+        print(f"{f'UpdateFileWriter x {n_codes}':<40s} {elapsed:8.3f}s, {elapsed / n_codes * 1000:.2f} ms/code")
+    with timer('UpdateFileWriter x 2000 (flush 50,000)', 2000 * ROWS_PER_CODE, 'rows'):
+        with Base.UpdateFileWriter(os.path.join(directory, 'writer_small.txt'), dtypes=DTYPES,
+                                   flush_rows=50000) as writer:
+            for chart in charts:
+                writer.append(chart)
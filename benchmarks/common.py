@@ -0,0 +1,28 @@
+"""
+벤치마크 공통 함수. 실제 PostgreSQL 서버가 필요하며 접속 정보는 PGDATABASE, PGUSER, PGPASSWORD, PGHOST 환경변수로 지정
+repo 루트에서  python benchmarks/<스크립트>.py  로 실행
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def connect(maxconn=16):
+    from StockWH import Base
+    kwargs = {key: os.environ[env] for key, env in (('dbname', 'PGDATABASE'), ('user', 'PGUSER'),
+                                                    ('password', 'PGPASSWORD'), ('host', 'PGHOST'))
+              if env in os.environ}
+    Base.configure_pool(maxconn=maxconn, **kwargs)
+    return Base
+
+
+@contextmanager
+def timer(label, n=None, unit='items'):
+    t0 = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - t0
+    rate = f", {n / elapsed:,.0f} {unit}/s" if n else ""
+    print(f"{label:<40s} {elapsed:8.3f}s{rate}")
@@ -0,0 +1,51 @@
+"""
+CD_ID_STORAGE 전환 전/후 크기 비교. S12_MINCHART의 SRTDT ~ ENDDT 구간을 별도 테이블에 복사한 뒤 migrate_to_cd_id() 실행
+- DB : pg_total_relation_size(저장 테이블, 인덱스 포함)
+- 메모리 : select() 결과와 read_panel() 결과의 memory_usage(deep=True)
+  select() 결과의 cd는 전환 전/후 모두 CHAR -> category 변환을 거치므로 (view가 cd를 CHAR로 복원) 크기 차이가 거의 없음
+끝나면 복사한 테이블은 삭제
+"""
+from common import connect, timer
+
+SRTDT, ENDDT = '2022-03-02', '2022-03-31'
+
+
+def measure(table, codes):
+    _, ((size, ), ) = table.execute_query(f"SELECT pg_total_relation_size('{table.storage_table_name()}');",
+                                          dtype=list)
+    with timer(f'  select (CD_ID_STORAGE={table.CD_ID_STORAGE})'):
+        frame = table.select(srtdt=SRTDT, enddt=ENDDT)
+    with timer(f'  read_panel (CD_ID_STORAGE={table.CD_ID_STORAGE})', len(codes), 'codes'):
+        panel = table.read_panel(codes, srtdt=SRTDT, enddt=ENDDT)['close']
+    print(f"  rows {len(frame):,} | table+index {size / 2 ** 20:,.1f} MiB | "
+          f"select frame {frame.memory_usage(deep=True).sum() / 2 ** 20:,.1f} MiB | "
+          f"read_panel frame {panel.memory_usage(deep=True).sum() / 2 ** 20:,.1f} MiB")
+
+
+if __name__ == '__main__':
+    connect()
+    from StockWH import Stock
+
+    class BenchMinChart(Stock.S12_MINCHART):
+        TABLE_NAME = 'bench_s12_cd_id'
+        TABLE_SCHEMA = Stock.S12_MINCHART.TABLE_SCHEMA.replace(Stock.S12_MINCHART.TABLE_NAME, TABLE_NAME)
+        PARTITION_BY_MONTH = False
+        ROLLUP_TIMEFRAMES = ()
+
+    BenchMinChart.create_cls_table()
+    BenchMinChart.execute_query(f"INSERT INTO {BenchMinChart.TABLE_NAME} SELECT * FROM {Stock.S12_MINCHART.TABLE_NAME} "
+                                f"WHERE dt BETWEEN '{SRTDT}' AND '{ENDDT}';")
+    BenchMinChart.execute_query(f"ANALYZE {BenchMinChart.TABLE_NAME};")
+    codes = BenchMinChart.read(columns='DISTINCT cd').cd.astype(str).str.strip().tolist()
+    try:
+        print('before migrate_to_cd_id')
+        measure(BenchMinChart, codes)
+        BenchMinChart.CD_ID_STORAGE = True
+        BenchMinChart.migrate_to_cd_id()
+        BenchMinChart.execute_query(f"ANALYZE {BenchMinChart.storage_table_name()};")
+        print('after migrate_to_cd_id')
+        measure(BenchMinChart, codes)
+    finally:
+        BenchMinChart.execute_query(f"DROP VIEW IF EXISTS {BenchMinChart.TABLE_NAME};" if BenchMinChart.CD_ID_STORAGE
+                                    else f"DROP TABLE IF EXISTS {BenchMinChart.TABLE_NAME};")
+        BenchMinChart.execute_query(f"DROP TABLE IF EXISTS {BenchMinChart.storage_table_name()};")
@@ -0,0 +1,140 @@
+"""
+테스트 공용 설정.
+DTC는 이 패키지에 포함되지 않은 개인 패키지이므로(readme 참고), 설치되어 있지 않으면 테스트에 필요한 함수만 가진 대체 모듈을 등록한다.
+DB 접속이 필요한 부분은 각 테스트에서 FakeConnection으로 대체 (PostgreSQL 서버 없이 실행)
+"""
+import os
+import sys
+import types
+import datetime
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if importlib.util.find_spec('DTC') is None:
+    import pandas as pd
+
+    DTC = types.ModuleType('DTC')
+    DTC.datetime = datetime
+    DTC.pd = pd
+    # 2021 ~ 2024 KOSPI200 옵션 만기일 (매월 두번째 목요일)
+    DTC.EXPIREDAYS = [str((pd.Timestamp(year, month, 1) + pd.offsets.WeekOfMonth(week=1, weekday=3)).date())
+                      for year in range(2021, 2025) for month in range(1, 13)]
+    DTC.today = lambda: pd.Timestamp.today().normalize()
+    DTC.date_to_obj = lambda date: pd.Timestamp(str(date)).to_pydatetime()
+    DTC.date_to_str = lambda date, fmt='%Y-%m-%d': pd.Timestamp(str(date)).strftime(fmt)
+    DTC.date_to_int = lambda date: int(pd.Timestamp(str(date)).strftime('%Y%m%d'))
+    DTC.shift_date = lambda date, days=0: pd.Timestamp(str(date)).date() + datetime.timedelta(days=days)
+    DTC.is_holiday = lambda date: pd.Timestamp(str(date)).weekday() >= 5
+    DTC.prev_business_day = lambda date: (pd.Timestamp(str(date)) - pd.offsets.BDay(1)).date()
+    sys.modules['DTC'] = DTC
+
+
+import pytest
+
+
+class FakeCursor:
+    """ execute()한 쿼리를 FakeDatabase.executed에 기록하고, FakeDatabase.respond(query, params) 결과를 돌려줌 """
+    def __init__(self, db, name=None):
+        self.db = db
+        self.name = name
+        self.description = None
+        self.itersize = 2000
+        self.fetch_sizes = []
+        self._rows = []
+        db.cursors.append(self)
+
+    def execute(self, query, params=None):
+        self.db.executed.append((' '.join(query.split()), params))
+        columns, rows = self.db.respond(query, params) or ([], [])
+        self.description = [(column, ) for column in columns] if columns else None
+        self._rows = list(rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def copy_expert(self, sql, file, size=8192):
+        """ COPY ... FROM STDIN : file을 끝까지 읽어서 FakeDatabase.copied에 기록. COPY ... TO STDOUT : respond 결과(문자열)를 씀 """
+        self.db.executed.append((' '.join(sql.split()), None))
+        if 'TO STDOUT' in sql:
+            file.write(self.db.respond(sql, None) or '')
+            return
+        parts = []
+        for data in iter(lambda: file.read(size), file.read(0)):
+            parts.append(data)
+        self.db.copied.append(parts[0][:0].join(parts) if parts else file.read(0))
+
+    def copy_from(self, file, table, null='\\N'):
+        self.copy_expert(f"COPY {table} FROM STDIN", file)
+
+    def fetchmany(self, size=None):
+        size = size or self.itersize
+        self.fetch_sizes.append(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.closed = 0
+        self.encoding = 'UTF8'
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, name=None):
+        return FakeCursor(self.db, name)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeDatabase:
+    """
+    get_pool() 대체. 연결 하나를 빌려주고 돌려받으며(borrowed : 반납되지 않은 수),
+    실행된 쿼리를 executed에 (query, params)로, 만든 커서를 cursors에 기록
+    """
+    def __init__(self):
+        self.executed = []
+        self.cursors = []
+        self.borrowed = 0
+        self.copied = []        # COPY FROM STDIN으로 받은 내용
+        self.respond = lambda query, params: None
+        self.connection = FakeConnection(self)
+
+    def getconn(self):
+        self.borrowed += 1
+        return self.connection
+
+    def putconn(self, conn):
+        self.borrowed -= 1
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    from StockWH import Base
+    db = FakeDatabase()
+    monkeypatch.setattr(Base, 'get_pool', lambda: db)
+    monkeypatch.setattr(Base.pg.extensions, 'register_type', lambda *args: None)
+    monkeypatch.setattr(Base, '_PREPARED_STATEMENTS', Base.weakref.WeakKeyDictionary())
+    # 다른 테스트의 가짜 결과가 QUERY_CACHE에 남지 않도록
+    Base.BaseDB.QUERY_CACHE.invalidate()
+    yield db
+    Base.BaseDB.QUERY_CACHE.invalidate()
@@ -0,0 +1,91 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import DTC
+from StockWH import FutOpt
+
+DATES = pd.bdate_range('2022-01-03', '2023-12-29')
+
+
+def reference_price(date):
+    """ 날짜별 가상의 선물 기준가. 17번째 날짜마다 데이터 없음 (None) """
+    n = (pd.Timestamp(date) - DATES[0]).days
+    return None if n % 17 == 5 else 280 + (n * 7.3) % 120
+
+
+@pytest.mark.parametrize('look_ahead_days', [0, 3])
+def test_resolve_expiries_matches_expiredays_comparison(look_ahead_days):
+    expected = []
+    for date in DATES:
+        later = DTC.date_to_str(date + datetime.timedelta(days=look_ahead_days)) < pd.Series(DTC.EXPIREDAYS)
+        expected.append(DTC.EXPIREDAYS[later[later].index[0]])
+    result = FutOpt.O12_MINCHART.resolve_expiries(DATES, look_ahead_days)
+    assert [str(each) for each in result] == expected
+
+
+def test_resolve_expiries_past_last_expiry_is_nat():
+    assert np.isnat(FutOpt.O12_MINCHART.resolve_expiries(['2099-01-01'])).all()
+
+
+# 날짜별 조회는 날짜마다 select 3번이라 느리므로 close는 반년만
+@pytest.mark.parametrize('criterion, dates', [('open', DATES), ('close', DATES[:125])])
+def test_batch_matches_per_date(fake_db, criterion, dates):
+    def respond(query, params):
+        if not query.startswith('EXECUTE'):     return None
+        if params[0] == '10100' and isinstance(params[1], list):     # batch 선물 기준가
+            return ['dt', 'ref'], [(date, reference_price(date)) for date in params[1]
+                                   if reference_price(date) is not None]
+        if params[0] == '10100':                                     # 날짜별 선물 기준가
+            price = reference_price(params[1])
+            return [criterion], [] if price is None else [(price, )]
+        return ['cd', 'dt', 'tm', 'close'], []
+    fake_db.respond = respond
+
+    expected = set()
+    for date in dates:
+        n_executed = len(fake_db.executed)
+        call, put = FutOpt.O12_MINCHART.read_closest_cp_options('KOSPI200', str(date.date()), criterion=criterion)
+        if call is None:
+            assert reference_price(date) is None
+            continue
+        # 날짜별 조회의 콜/풋 select 파라미터 (cd, srtdt, enddt)
+        selects = [params for query, params in fake_db.executed[n_executed:]
+                   if query.startswith('EXECUTE') and params[0] != '10100']
+        expected.update((params[0], params[1]) for params in selects)
+    assert len(expected) == 2 * sum(reference_price(date) is not None for date in dates)
+
+    fake_db.executed.clear()
+    FutOpt.O12_MINCHART.read_closest_cp_options_batch('KOSPI200', dates, criterion=criterion)
+    (_, (codes, req_dates)), = [(query, params) for query, params in fake_db.executed
+                                if query.startswith('EXECUTE') and params[0] != '10100']
+    assert set(zip(codes, (str(each) for each in req_dates))) == expected
+
+
+def test_reference_and_item_lookups_use_query_cache(fake_db, monkeypatch):
+    def respond(query, params):
+        if query.startswith('EXECUTE') and params and params[0] == '10100':
+            return ['open'], [(312.4, )]
+        if query.startswith('EXECUTE'):
+            return ['cd', 'nm'], [('201T2312', 'C 2023.12 312.5')]
+        if query.startswith('SELECT cd, tp'):
+            return ['cd', 'tp', 'exp_m', 'strk_price'], [('201T2312', 'C', '2312', 312.5)]
+        return None
+    fake_db.respond = respond
+    count = lambda prefix: sum(query.startswith(prefix) for query, _ in fake_db.executed)
+
+    # 같은 날짜의 선물 기준가는 한번만 조회
+    for _ in range(3):
+        FutOpt.O12_MINCHART.read_closest_cp_options('KOSPI200', '2023-11-01')
+    futures = [params for query, params in fake_db.executed if query.startswith('EXECUTE') and params[0] == '10100']
+    assert len(futures) == 1
+
+    # 메모리 인덱스가 비워져도(invalidate 등) 테이블이 update되지 않았으면 QUERY_CACHE에서 다시 채움
+    for _ in range(2):
+        monkeypatch.setattr(FutOpt.O01_ITEMS, '_option_index', None)
+        monkeypatch.setattr(FutOpt.O01_ITEMS, '_code_to_name', None)
+        assert FutOpt.O01_ITEMS.option_index()['cd'].tolist() == ['201T2312']
+        assert FutOpt.O01_ITEMS.cd2nm('201T2312') == 'C 2023.12 312.5'
+    assert count('SELECT cd, tp') == 1
+    name, = [query.split()[1] for query, _ in fake_db.executed if query.startswith('PREPARE') and 'cd, nm' in query]
+    assert count(f"EXECUTE {name}") == 1
@@ -0,0 +1,83 @@
+import datetime
+import pandas as pd
+from StockWH import Base
+
+
+class DayChart(Base.BaseDB):
+    TABLE_NAME = 'test_daychart'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd          char(7)         NOT NULL,
+            dt          DATE            NOT NULL,
+            close       INTEGER         NOT NULL,
+            volume      BIGINT          NOT NULL,
+            basis       NUMERIC(5,2)    ,
+            PRIMARY KEY(cd, dt)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+
+class MinChart(Base.BaseDB):
+    TABLE_NAME = 'test_minchart'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd          char(7)         NOT NULL,
+            dt          DATE            NOT NULL,
+            tm          TIME            NOT NULL,
+            close       INTEGER         NOT NULL,
+            PRIMARY KEY(cd, dt, tm)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+
+def test_schema_dtypes():
+    assert dict(DayChart.COLUMN_DTYPES) == {'cd': 'category', 'dt': 'datetime64[ns]', 'close': 'int32',
+                                            'volume': 'int64', 'basis': 'float64'}
+
+
+def test_not_null_integer_column_with_null_aggregate():
+    # max() over an empty group returns NULL even for a NOT NULL column
+    result = DayChart._apply_column_dtypes(pd.DataFrame({'cd': ['A005930', 'A000660'], 'close': [100, None],
+                                                         'volume': [None, None]}, dtype=object))
+    assert str(result['close'].dtype) == 'Int32' and result['close'].isna().tolist() == [False, True]
+    assert str(result['volume'].dtype) == 'Int64'
+
+
+def test_integer_column_without_null():
+    result = DayChart._apply_column_dtypes(pd.DataFrame({'close': [100, 200]}, dtype=object))
+    assert str(result['close'].dtype) == 'int32'
+
+
+def test_time_column_from_text_and_from_datetime_time():
+    # TIME_AS_TEXT 커서(read)는 문자열, is_org=True/execute_query 결과는 datetime.time
+    expected = pd.to_timedelta(['09:01:00', '15:30:00', None]).astype('timedelta64[ns]')
+    as_text = MinChart._apply_column_dtypes(pd.DataFrame({'tm': ['09:01:00', '15:30:00', None]}))
+    as_time = MinChart._apply_column_dtypes(pd.DataFrame({'tm': [datetime.time(9, 1), datetime.time(15, 30), None]}))
+    pd.testing.assert_index_equal(pd.Index(as_text['tm']), pd.Index(expected, name='tm'))
+    pd.testing.assert_index_equal(pd.Index(as_time['tm']), pd.Index(expected, name='tm'))
+
+
+def test_computed_time_expression_is_not_text(fake_db, monkeypatch):
+    # TIME_AS_TEXT가 등록된 커서는 'HH:MM:SS' 문자열, 아니면 datetime.time을 돌려주는 연결
+    registered = []
+    monkeypatch.setattr(Base.pg.extensions, 'register_type', lambda type_, scope: registered.append(scope) if type_ is Base.TIME_AS_TEXT else None)
+
+    max_statements = set()
+
+    def respond(query, params):
+        if query.startswith('PREPARE'):     # select() : PREPARE 후 EXECUTE (같은 커서)
+            if 'max(tm)' in query:  max_statements.add(query.split()[1])
+            return None
+        as_text = bool(registered)
+        registered.clear()
+        if 'max(tm)' in query or query.split()[0] == 'EXECUTE' and query.split()[1].rstrip(';') in max_statements:
+            return ['max'], [('15:30:00' if as_text else datetime.time(15, 30), )]
+        return ['cd', 'tm'], [('A005930', '09:01:00' if as_text else datetime.time(9, 1))]
+    fake_db.respond = respond
+
+    # 계산식(COLUMN_DTYPES에 없는 컬럼)은 _postprocess가 변환하지 않으므로 문자열이 아니라 datetime.time
+    assert MinChart.read(columns='max(tm)')['max'].tolist() == [datetime.time(15, 30)]
+    assert MinChart.select(columns='max(tm)', cd='A005930')['max'].tolist() == [datetime.time(15, 30)]
+    # 스키마 컬럼만 선택하면 문자열로 받아서 timedelta64로 변환
+    for chart in (MinChart.read(columns='cd, tm'), MinChart.select(columns=['cd', 'tm'], cd='A005930')):
+        assert str(chart['tm'].dtype) == 'timedelta64[ns]' and chart['tm'].tolist() == [pd.Timedelta('09:01:00')]
@@ -0,0 +1,57 @@
+import datetime
+import pandas as pd
+from StockWH import Base
+
+
+class QuoteTable(Base.BaseDB):
+    TABLE_NAME = 'test_quote'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd          char(8)         NOT NULL,
+            dt          DATE            NOT NULL,
+            tm          TIME            NOT NULL,
+            close       NUMERIC(10,2)   NOT NULL,
+            volume      INTEGER         ,
+            nm          varchar(20)     ,
+            PRIMARY KEY(cd, dt, tm)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+
+COLUMNS = ['cd', 'dt', 'tm', 'close', 'volume', 'nm']
+# char(8)에 7자리 코드는 공백이 붙어서 옴. nm : NULL / 빈 문자열 / 값
+ROWS = [('A005930 ', datetime.date(2024, 1, 2), '09:00:00', 78500.0, 100, 'Samsung'),
+        ('A005930 ', datetime.date(2024, 1, 2), '09:01:00', 78600.0, None, ''),
+        ('101T3000', datetime.date(2024, 1, 2), '15:30:00', 350.25, 7, None)]
+# COPY ... TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\N') 출력 : 빈 문자열은 ""로 quote됨
+COPY_CSV = ('cd,dt,tm,close,volume,nm\n'
+            'A005930 ,2024-01-02,09:00:00,78500.00,100,Samsung\n'
+            'A005930 ,2024-01-02,09:01:00,78600.00,\\N,""\n'
+            '101T3000,2024-01-02,15:30:00,350.25,7,\\N\n')
+
+
+def respond(query, params):
+    if 'TO STDOUT' in query:    return COPY_CSV
+    return COLUMNS, ROWS
+
+
+def test_copy_engine_matches_fetchall(fake_db):
+    fake_db.respond = respond
+    by_copy = QuoteTable.read(engine='copy')
+    by_fetchall = QuoteTable.read(engine='fetchall')
+    assert fake_db.executed[0][0].startswith("COPY (SELECT * FROM test_quote) TO STDOUT")
+    assert "NULL '\\N'" in fake_db.executed[0][0]
+    pd.testing.assert_frame_equal(by_copy, by_fetchall)
+    assert by_copy.dtypes.astype(str).to_dict() == by_fetchall.dtypes.astype(str).to_dict()
+
+
+def test_copy_engine_parse(fake_db):
+    fake_db.respond = respond
+    chart = QuoteTable.read(engine='copy')
+    # char(n) 패딩은 fetchall과 같이 유지
+    assert chart['cd'].tolist() == ['A005930 ', 'A005930 ', '101T3000']
+    assert str(chart['tm'].dtype) == 'timedelta64[ns]'
+    assert chart['tm'].tolist() == pd.to_timedelta(['09:00:00', '09:01:00', '15:30:00']).tolist()
+    assert str(chart['volume'].dtype) == 'Int32' and chart['volume'].isna().tolist() == [False, True, False]
+    # NULL은 결측, 빈 문자열은 ''
+    assert chart['nm'].iloc[0] == 'Samsung' and chart['nm'].iloc[1] == '' and pd.isna(chart['nm'].iloc[2])
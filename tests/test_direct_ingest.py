@@ -0,0 +1,97 @@
+import threading
+import pandas as pd
+import pytest
+from StockWH import Base
+
+N_CHARTS = 1000
+
+
+class IngestTable(Base.BaseDB):
+    TABLE_NAME = 'test_ingest'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd      char(7)     NOT NULL,
+            dt      DATE        NOT NULL,
+            close   INTEGER     NOT NULL,
+            PRIMARY KEY(cd, dt)
+        );"""
+    SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+    fail_after = None       # 이 개수만큼 쓴 뒤 다운로드 예외
+    appended = 0
+
+    @classmethod
+    def _0_download_update_file(cls):
+        cls.appended = 0
+        with cls.update_file_writer('test', flush_rows=1) as writer:
+            for i in range(N_CHARTS):
+                if i == cls.fail_after:     raise ConnectionError('session dropped')
+                writer.append(pd.DataFrame({'cd': [f'A{i:06d}'], 'dt': [20240105], 'close': [i]}))
+                cls.appended += 1
+
+
+@pytest.fixture
+def ingest_db(fake_db, monkeypatch):
+    monkeypatch.setattr(IngestTable, 'fail_after', None)
+
+    def respond(query, params):
+        if query.startswith('SELECT count(*) FROM temp_'):
+            return ['count'], [(sum(text.count('\n') for text in fake_db.copied), )]
+        if query.startswith('SELECT'):
+            return ['exists'], [(False, )]
+    fake_db.respond = respond
+    return fake_db
+
+
+def copy_queries(db):
+    return [query for query, _ in db.executed if query.startswith('COPY')]
+
+
+def test_rows_flow_through_pipe_and_staged_count_is_returned(ingest_db):
+    staged = IngestTable.update(direct_ingest=True, keep_update_file=False)
+    assert staged == N_CHARTS
+    assert copy_queries(ingest_db) == ["COPY temp_test_ingest FROM STDIN WITH (FORMAT text, NULL '')"]
+    lines = ''.join(ingest_db.copied).splitlines()
+    assert lines[0] == 'A000000\t20240105\t0' and len(lines) == N_CHARTS
+    assert any(query.startswith('INSERT INTO test_ingest') for query, _ in ingest_db.executed)
+    assert ingest_db.connection.rollbacks == 0
+
+
+def test_download_error_aborts_copy_and_rolls_back(ingest_db, monkeypatch):
+    monkeypatch.setattr(IngestTable, 'fail_after', 10)
+    with pytest.raises(ConnectionError):
+        IngestTable.update(direct_ingest=True, keep_update_file=False)
+    assert copy_queries(ingest_db) and not ingest_db.copied
+    assert not any(query.startswith('INSERT INTO test_ingest') for query, _ in ingest_db.executed)
+    assert ingest_db.connection.rollbacks == 1
+
+
+def test_without_writers_forwards_the_file_written_by_this_run(ingest_db, monkeypatch, tmp_path):
+    path = tmp_path / 'INGESTTABLE_test.txt'
+    calls = []
+
+    def download():
+        path.write_text('A000001\t20240105\t1\nA000002\t20240105\t2\n', encoding='utf8')
+
+    def find_download_file(raise_if_not_found=True, modified_since=None):
+        calls.append((raise_if_not_found, modified_since))
+        return str(path)
+    monkeypatch.setattr(IngestTable, '_0_download_update_file', download)
+    monkeypatch.setattr(IngestTable, '_download_file_mtimes', lambda: {'before': 1})
+    monkeypatch.setattr(IngestTable, '_find_download_file', find_download_file)
+
+    assert IngestTable.update(direct_ingest=True) == 2
+    assert calls == [(False, {'before': 1})]
+    assert ''.join(ingest_db.copied) == path.read_text(encoding='utf8')
+
+
+def test_ingest_error_stops_download_and_reaches_caller(ingest_db):
+    def respond(query, params):
+        if query.startswith('CREATE TEMPORARY TABLE'):  raise RuntimeError('permission denied')
+    ingest_db.respond = respond
+    with pytest.raises(RuntimeError, match='permission denied'):
+        IngestTable.update(direct_ingest=True, keep_update_file=False)
+    # 파이프 큐(8) 정도만 쓰고 멈춤 (적재 실패 후 끝까지 다운로드하지 않음)
+    assert IngestTable.appended < 20
+    assert ingest_db.connection.rollbacks == 1
+    assert not [thread for thread in threading.enumerate() if thread.name.endswith('_direct_ingest')]
@@ -0,0 +1,33 @@
+import threading
+import pytest
+from StockWH import Base
+
+
+def fetch_factory(fail=(), delisted=()):
+    threads = set()
+
+    def fetch(code):
+        threads.add(threading.get_ident())
+        if code in fail:        raise ConnectionError('session dropped')
+        if code in delisted:    return None
+        return [code]
+    return fetch, threads
+
+
+def test_sequential_by_default_in_calling_thread():
+    fetch, threads = fetch_factory(delisted={'A3'})
+    result = dict(Base.download_concurrently(['A1', 'A2', 'A3'], fetch))
+    assert result == {'A1': ['A1'], 'A2': ['A2'], 'A3': None}
+    assert threads == {threading.get_ident()}
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_failed_codes_raise_after_the_rest(max_workers):
+    fetch, _ = fetch_factory(fail={'A2', 'A4'}, delisted={'A3'})
+    received = {}
+    with pytest.raises(Base.DownloadError) as e:
+        for code, chart in Base.download_concurrently(['A1', 'A2', 'A3', 'A4', 'A5'], fetch,
+                                                      max_workers=max_workers, retries=1, retry_wait=0):
+            received[code] = chart
+    assert sorted(e.value.codes) == ['A2', 'A4']
+    assert received == {'A1': ['A1'], 'A3': None, 'A5': ['A5']}
@@ -0,0 +1,71 @@
+import datetime
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from StockWH import Base, FutOpt, Greeks
+
+F, RATE, SIGMA = 350.0, 0.03, 0.2
+STRIKES = (340.0, 345.0, 350.0, 355.0, 360.0)
+
+
+def test_erfc_matches_math_erfc():
+    x = np.concatenate([np.linspace(-30, 30, 200001), [0.0, 0.46875, 4.0, -4.0, np.inf, -np.inf]])
+    expected = np.array([math.erfc(value) for value in x])
+    result = Greeks._erfc(x)
+    np.testing.assert_allclose(result[np.isfinite(x)], expected[np.isfinite(x)], rtol=1e-14, atol=1e-300)
+    assert result[-2] == 0 and result[-1] == 2
+
+
+def test_norm_cdf_backends_agree(monkeypatch):
+    pytest.importorskip('scipy')
+    x = np.linspace(-10, 10, 10001)
+    with_scipy = Greeks._norm_cdf(x)
+    monkeypatch.setattr(Greeks, 'HAS_SCIPY', False)
+    # x / sqrt(2) 반올림 오차만큼 차이
+    np.testing.assert_allclose(Greeks._norm_cdf(x), with_scipy, rtol=1e-13, atol=1e-300)
+
+
+def test_black76_reference_value():
+    # Hull, Options, Futures and Other Derivatives : F = K = 20, T = 4개월, r = 9%, sigma = 25% 풋 = 1.12
+    put = Greeks.black76_price(20.0, 20.0, 4 / 12, 0.25, 0.09, False)
+    assert put == pytest.approx(1.1166, abs=1e-4)
+
+
+def o12_rows(dttm, expiry):
+    """ sigma = SIGMA로 계산한 값을 O12_MINCHART 컬럼 정밀도(NUMERIC(8,2), NUMERIC(5,2), NUMERIC(6,4))로 저장한 행 """
+    tte = (expiry - dttm).total_seconds() / (365 * 24 * 60 * 60)
+    rows = []
+    for tp in ('C', 'P'):
+        greeks = Greeks.black76_greeks(F, np.array(STRIKES), tte, SIGMA, RATE, tp == 'C')
+        for i, strike in enumerate(STRIKES):
+            cd = f"{'2' if tp == 'C' else '3'}01{Base.YEAR_CODE_DICT[expiry.year]}" \
+                 f"{Base.MONTH_CODE_DICT[expiry.month]}{int(strike) % 1000:03d}"
+            rows.append({'cd': cd, 'tp': tp, 'strk_price': strike, 'close': round(float(greeks['price'][i]), 2),
+                         'iv': round(SIGMA * 100, 2), 'delta': round(float(greeks['delta'][i]), 2),
+                         'theta': round(float(greeks['theta'][i]) / 365, 4),
+                         'vega': round(float(greeks['vega'][i]) / 100, 4)})
+    return pd.DataFrame(rows, index=pd.DatetimeIndex([dttm] * len(rows), name='dttm'))
+
+
+def test_compute_greeks_recovers_stored_o12_values(fake_db, monkeypatch):
+    dttm = pd.Timestamp('2022-03-02 10:00:00')
+    expiry = pd.Timestamp('2022-03-10') + Base.OPTION_EXPIRY_TIME
+    chart = o12_rows(dttm, expiry)
+    items = chart[['cd', 'tp', 'strk_price']].assign(exp_m='2203', target='01')
+    monkeypatch.setattr(FutOpt.O01_ITEMS, '_option_index', items.set_index(['target', 'exp_m', 'strk_price', 'tp']))
+    fake_db.respond = lambda query, params: (['dt', 'tm', 'close'], [(datetime.date(2022, 3, 2), '09:59:00', F)]) \
+        if query.startswith('EXECUTE') else None
+
+    result = FutOpt.O12_MINCHART.compute_greeks(chart, rate=RATE)
+    assert (result['underlying'] == F).all()
+    # 저장된 종가는 0.01 단위로 반올림되어 있으므로 내재변동성 오차는 0.005 / vega 이내
+    np.testing.assert_allclose(result['iv'], chart['iv'], atol=0.005 / chart['vega'].min() + 0.005)
+    np.testing.assert_allclose(result['delta'], chart['delta'], atol=0.006)
+    np.testing.assert_allclose(result['theta'], chart['theta'], atol=0.002)
+    np.testing.assert_allclose(result['vega'], chart['vega'], atol=0.002)
+
+
+def test_implied_volatility_out_of_bounds_is_nan():
+    iv = Greeks.implied_volatility(np.array([0.0, 400.0, 5.0]), F, 350.0, 0.05, RATE, True)
+    assert np.isnan(iv[:2]).all() and iv[2] > 0
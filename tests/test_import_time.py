@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+# StockWH 모듈 자체의 import 시간 합계 상한(us). pandas/numpy/psycopg2 등 의존 패키지 시간은 제외
+# .pyc가 없어 소스를 컴파일하는 경우도 포함한 값
+IMPORT_BUDGET_US = 100_000
+
+IMPORT_SCRIPT = """
+import sys
+sys.path.insert(0, {tests_dir!r})
+import conftest
+import psycopg2
+def connect(*args, **kwargs):
+    raise AssertionError('connected to the DB at import time')
+psycopg2.connect = connect
+import StockWH.Stock, StockWH.FutOpt
+"""
+
+
+def test_import_does_not_connect_and_fits_budget():
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT.format(tests_dir=tests_dir)],
+                            cwd=os.path.dirname(tests_dir), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    self_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:    continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        if self_time.strip().isdigit():    self_us[name.strip()] = int(self_time)
+    own = {name: us for name, us in self_us.items() if name.split('.')[0] == 'StockWH'}
+    assert 'StockWH.Base' in own
+    assert sum(own.values()) < IMPORT_BUDGET_US, own
@@ -0,0 +1,29 @@
+import os
+import pandas as pd
+from StockWH import LocalCache
+
+
+def touch(root, table_name, cd, month):
+    path = LocalCache.partition_path(root, table_name, cd, pd.Period(month, freq='M'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return path
+
+
+def test_invalidate_removes_code_and_all_code_partitions(tmp_path):
+    root = str(tmp_path)
+    touched_code = touch(root, 's12_minchart', 'A005930', '2022-01')
+    other_code = touch(root, 's12_minchart', 'A000660', '2022-01')
+    all_codes = touch(root, 's12_minchart', None, '2022-01')
+    other_month = touch(root, 's12_minchart', None, '2022-02')
+
+    count = LocalCache.invalidate(root, 's12_minchart', [('A005930', '2022-01-01')])
+
+    assert count == 2
+    assert not os.path.exists(touched_code) and not os.path.exists(all_codes)
+    assert os.path.exists(other_code) and os.path.exists(other_month)
+
+
+def test_partition_path_strips_char_padding(tmp_path):
+    assert LocalCache.partition_path(str(tmp_path), 't', '10100   ', pd.Period('2022-03', freq='M')) == \
+        os.path.join(str(tmp_path), 't', '10100', '2022-03.parquet')
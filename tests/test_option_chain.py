@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+from StockWH import FutOpt
+
+
+def option_index(strikes=(360.0, 362.5, 365.0), months=('2203', '2204')):
+    items = pd.DataFrame([(f"{'2' if tp == 'C' else '3'}01{month[1]}{month[2:]}{int(strike * 10) % 1000:03d}", tp,
+                           month, strike)
+                          for month in months for strike in strikes for tp in ('C', 'P')],
+                         columns=['cd', 'tp', 'exp_m', 'strk_price'])
+    items['target'] = '01'
+    return items.set_index(['target', 'exp_m', 'strk_price', 'tp']).sort_index()
+
+
+@pytest.fixture
+def options(monkeypatch):
+    monkeypatch.setattr(FutOpt.O01_ITEMS, '_option_index', option_index())
+    return FutOpt.O01_ITEMS._option_index
+
+
+def test_read_chain_uses_last_bar_at_or_before_tm(fake_db, options):
+    fake_db.respond = lambda query, params: (['tp', 'strk_price', 'cd', 'dt', 'tm', 'close'], []) \
+        if query.startswith('EXECUTE') else None
+    FutOpt.O12_MINCHART.read_chain('KOSPI200', ['2022-03-02', '2022-03-03'], '10:01:00')
+
+    (prepare, _), (execute, params) = fake_db.executed
+    assert "JOIN LATERAL (SELECT * FROM o12_minchart T WHERE T.cd = I.cd AND T.dt = I.req_dt AND T.tm <= $5 " \
+           "ORDER BY T.tm DESC LIMIT 1) O ON true" in prepare
+    assert " O.tm = " not in prepare
+    req_dt, codes, tps, strikes, tm = params
+    # 2022-03-10 만기(2203) 종목만, 날짜별로
+    assert len(codes) == 2 * 6 and set(codes) == set(options.loc[('01', '2203')]['cd'])
+    assert tm == '10:01:00'
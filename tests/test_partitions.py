@@ -0,0 +1,49 @@
+import contextlib
+import pytest
+from StockWH import Base
+
+
+class MinChart(Base.BaseDB):
+    TABLE_NAME = 'test_minchart'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd      char(7)     NOT NULL,
+            dt      DATE        NOT NULL,
+            tm      TIME        NOT NULL,
+            close   INTEGER     NOT NULL,
+            PRIMARY KEY(cd, dt, tm)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+    PARTITION_BY_MONTH = True
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    queries = []
+
+    def execute_query(cls, query, dtype='df', **kwargs):
+        queries.append(' '.join(query.split()))
+        if query.startswith('SELECT min(dt)'):
+            return ['min', 'max'], [('2022-01-10', '2022-03-05')]
+
+    monkeypatch.setattr(MinChart, 'execute_query', classmethod(execute_query))
+    monkeypatch.setattr(MinChart, 'transaction', classmethod(lambda cls: contextlib.nullcontext()))
+    monkeypatch.setattr(MinChart, 'is_partitioned', classmethod(lambda cls: False))
+    return queries
+
+
+def test_migrate_to_partitioned(queries):
+    MinChart.migrate_to_partitioned()
+    assert queries[0] == "ALTER TABLE test_minchart RENAME TO test_minchart_old;"
+    assert queries[1].endswith("RENAME CONSTRAINT test_minchart_pkey TO test_minchart_old_pkey;")
+    assert queries[2].endswith("PARTITION BY RANGE (dt);")
+    for month in ('202201', '202202', '202203', '202204'):
+        assert any(query.startswith(f"CREATE TABLE IF NOT EXISTS test_minchart_p{month} PARTITION OF test_minchart")
+                   for query in queries)
+    assert queries[-2:] == ["INSERT INTO test_minchart SELECT * FROM test_minchart_old;", "DROP TABLE test_minchart_old;"]
+
+
+def test_update_warns_on_plain_table(queries):
+    with pytest.warns(UserWarning, match='migrate_to_partitioned'):
+        MinChart._1_2_create_partitions()
+    assert not any('PARTITION OF' in query for query in queries)
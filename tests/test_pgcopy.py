@@ -0,0 +1,78 @@
+import datetime
+import struct
+import numpy as np
+import pandas as pd
+from StockWH import Base, PGCopy
+
+TABLE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS test_copy (
+        cd      char(7)         NOT NULL,
+        dt      DATE            NOT NULL,
+        tm      TIME            NOT NULL,
+        price   NUMERIC(8,2)    NULL,
+        volume  INTEGER         NULL,
+        amount  BIGINT          NULL,
+        nm      varchar(64)     NULL,
+        PRIMARY KEY(cd, dt, tm)
+    );"""
+
+
+def decode(data: bytes, kinds):
+    """ PGCOPY 바이너리 -> 행 목록 (NULL은 None) """
+    assert data.startswith(PGCopy.HEADER) and data.endswith(PGCopy.TRAILER)
+    pos, end, rows = len(PGCopy.HEADER), len(data) - len(PGCopy.TRAILER), []
+    while pos < end:
+        (n_fields, ), pos = struct.unpack_from('>h', data, pos), pos + 2
+        assert n_fields == len(kinds)
+        row = []
+        for kind in kinds:
+            (length, ), pos = struct.unpack_from('>i', data, pos), pos + 4
+            if length == -1:
+                row.append(None)
+                continue
+            raw, pos = data[pos:pos + length], pos + length
+            if kind == 'text':
+                row.append(raw.decode('utf8'))
+                continue
+            value, = struct.unpack(PGCopy.FIXED_WIDTH_KINDS[kind][1], raw)
+            if kind == 'date':
+                value = (PGCopy.PG_EPOCH + np.timedelta64(value, 'D')).astype(datetime.date)
+            elif kind == 'time':
+                value = (datetime.datetime.min + datetime.timedelta(microseconds=value)).time()
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def encode(df):
+    encoder = PGCopy.BinaryCopyEncoder(Base.BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA))
+    return encoder, encoder.header() + encoder.encode(df) + encoder.trailer()
+
+
+def test_fixed_width_round_trip():
+    df = pd.DataFrame({'cd': ['A005930', 'A000660'], 'dt': ['20240105', '20240108'], 'tm': ['90005', '1530'],
+                       'price': [70100.5, 131000.0], 'volume': [10, 20], 'amount': [2 ** 40, 5], 'nm': ['AB', 'CD']})
+    encoder, data = encode(df)
+    columns = [encoder._convert(kind, df.iloc[:, i]) for i, kind in enumerate(encoder.kinds)]
+    assert encoder._encode_fixed_width(columns) == encoder._encode_rows(columns)
+    assert decode(data, encoder.kinds) == [
+        ['A005930', datetime.date(2024, 1, 5), datetime.time(9, 0, 5), 70100.5, 10, 2 ** 40, 'AB'],
+        ['A000660', datetime.date(2024, 1, 8), datetime.time(15, 30), 131000.0, 20, 5, 'CD']]
+
+
+def test_rows_round_trip_with_nulls_and_variable_text():
+    df = pd.DataFrame({'cd': ['A005930', 'A000660'], 'dt': [20240105, 20240108], 'tm': ['09:00:05', 901],
+                       'price': [np.nan, 1.25], 'volume': [10, np.nan], 'amount': [None, 7],
+                       'nm': ['삼성전자', None]})
+    encoder, data = encode(df)
+    columns = [encoder._convert(kind, df.iloc[:, i]) for i, kind in enumerate(encoder.kinds)]
+    assert encoder._encode_fixed_width(columns) is None
+    assert decode(data, encoder.kinds) == [
+        ['A005930', datetime.date(2024, 1, 5), datetime.time(9, 0, 5), None, 10, None, '삼성전자'],
+        ['A000660', datetime.date(2024, 1, 8), datetime.time(9, 1), 1.25, None, 7, None]]
+
+
+def test_time_is_zero_padded_on_the_left():
+    values, mask = PGCopy._to_time(pd.Series(['90005', '153000', '0901', '901', '09:00:05']))
+    assert not mask.any()
+    assert (values // 1000000).tolist() == [32405, 55800, 32460, 32460, 32405]
@@ -0,0 +1,60 @@
+import threading
+import time
+import types
+import psycopg2
+import psycopg2.pool
+import pytest
+from StockWH import Base
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = types.SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool.psycopg2, 'connect', lambda *args, **kwargs: FakeConnection())
+
+
+def test_getconn_waits_for_returned_connection(fake_connect):
+    pool = Base.BlockingConnectionPool(1, 4, timeout=10)
+    lock, active, peak, errors = threading.Lock(), [0], [0], []
+
+    def work():
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            errors.append(e)
+            return
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.005)
+        with lock:
+            active[0] -= 1
+        pool.putconn(conn)
+
+    threads = [threading.Thread(target=work) for _ in range(64)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert peak[0] <= 4
+
+
+def test_getconn_times_out(fake_connect):
+    pool = Base.BlockingConnectionPool(1, 1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
+    pool.putconn(conn)
+    pool.putconn(pool.getconn())
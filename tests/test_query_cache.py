@@ -0,0 +1,44 @@
+import pandas as pd
+from StockWH import Base
+
+
+def frame(n):
+    return pd.DataFrame({'close': range(n)}, dtype='int64')
+
+
+def test_evicts_by_bytes():
+    nbytes = Base.QueryCache.nbytes(frame(1000))
+    cache = Base.QueryCache(maxsize=100, max_bytes=nbytes * 8 + 1)
+    for i in range(10):
+        cache.put(i, 't', frame(1000))
+    assert cache.get(0) is None and cache.get(1) is None
+    assert cache.get(9) is not None
+    assert cache._nbytes <= cache.max_bytes
+
+
+def test_large_result_is_not_cached():
+    cache = Base.QueryCache(max_bytes=Base.QueryCache.nbytes(frame(1000)))
+    cache.put('big', 't', frame(1000))
+    assert cache.get('big') is None
+
+
+def test_invalidate_by_table_releases_bytes():
+    cache = Base.QueryCache()
+    cache.put('a', 't1', frame(10))
+    cache.put('b', 't2', frame(10))
+    cache.invalidate('t1')
+    assert cache.get('a') is None and cache.get('b') is not None
+    cache.invalidate()
+    assert cache._nbytes == 0
+
+
+def test_read_does_not_cache_by_default(monkeypatch):
+    calls = []
+
+    class Table(Base.BaseDB):
+        TABLE_NAME = 'test_table'
+
+    monkeypatch.setattr(Table, 'execute_query', classmethod(lambda cls, query, **kwargs: calls.append(query) or frame(1)))
+    Table.read()
+    Table.read()
+    assert len(calls) == 2
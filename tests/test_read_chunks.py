@@ -0,0 +1,52 @@
+import pandas as pd
+from StockWH import Base
+
+
+class ChunkTable(Base.BaseDB):
+    TABLE_NAME = 'test_chunk'
+    TABLE_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            cd          char(7)         NOT NULL,
+            dt          DATE            NOT NULL,
+            close       INTEGER         NOT NULL,
+            PRIMARY KEY(cd, dt)
+        );"""
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+    postprocessed = []
+
+    @classmethod
+    def _postprocess(cls, result):
+        cls.postprocessed.append(len(result))
+        return super()._postprocess(result)
+
+
+ROWS = [('A005930' if i < 5 else 'A000660', f"2024-01-{i + 1:02d}", 100 + i) for i in range(7)]
+
+
+def test_read_in_chunks(fake_db):
+    fake_db.respond = lambda query, params: (['cd', 'dt', 'close'], ROWS)
+    ChunkTable.postprocessed = []
+    chunks = list(ChunkTable.read(chunksize=3))
+
+    # 서버사이드(named) 커서로 chunksize 행씩 fetchmany
+    cursor = fake_db.cursors[-1]
+    assert cursor.name.startswith('chunktable_cursor_') and cursor.itersize == 3
+    assert set(cursor.fetch_sizes) == {3}
+    # chunk마다 _postprocess
+    assert [len(chunk) for chunk in chunks] == ChunkTable.postprocessed == [3, 3, 1]
+    for chunk in chunks:
+        assert str(chunk['cd'].dtype) == 'category' and str(chunk['close'].dtype) == 'int32'
+        assert pd.api.types.is_datetime64_dtype(chunk['dt'])
+    assert fake_db.borrowed == 0
+    # chunk마다 category의 범주가 다르므로 그대로 concat하면 category가 아님 (read() docstring 참고)
+    assert str(pd.concat(chunks)['cd'].dtype) != 'category'
+    assert str(pd.concat(chunks).astype({'cd': 'category'})['cd'].dtype) == 'category'
+
+
+def test_closing_chunk_generator_returns_connection(fake_db):
+    fake_db.respond = lambda query, params: (['cd', 'dt', 'close'], ROWS)
+    chunks = ChunkTable.read(chunksize=2)
+    next(chunks)
+    assert fake_db.borrowed == 1        # 제너레이터가 끝날 때까지 연결을 점유
+    chunks.close()
+    assert fake_db.borrowed == 0
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from StockWH import Stock
+
+
+def epoch_us(text):
+    return int(pd.Timestamp(text).value // 1000)
+
+
+def test_read_panel_single_query_with_bound_dates(fake_db):
+    rows = [('A005930', epoch_us('2024-01-05 09:01'), 100), ('A000660', epoch_us('2024-01-05 09:01'), 200),
+            ('A005930', epoch_us('2024-01-05 09:00'), 99), ('A000660', epoch_us('2024-01-08 09:00'), None)]
+    fake_db.respond = lambda query, params: (['cd', 'tm', 'close'], rows)
+
+    panel = Stock.S12_MINCHART.read_panel(['A005930', 'A000660'], srtdt='2024-01-05', enddt='2024-01-08',
+                                          chunksize=3)['close']
+
+    (query, params), = fake_db.executed
+    assert query.endswith("WHERE cd = ANY(%s::char(7)[]) AND dt >= %s AND dt <= %s;")
+    assert params == [['A005930', 'A000660'], '2024-01-05', '2024-01-08']
+    assert panel.index.name == 'dttm'
+    assert panel.index.tolist() == [pd.Timestamp('2024-01-05 09:00'), pd.Timestamp('2024-01-05 09:01'),
+                                    pd.Timestamp('2024-01-08 09:00')]
+    assert panel.columns.tolist() == ['A005930', 'A000660']
+    np.testing.assert_array_equal(panel.to_numpy(), [[99, np.nan], [100, 200], [np.nan, np.nan]])
+
+
+def test_read_panel_daily_index_from_day_numbers(fake_db):
+    day = (pd.Timestamp('2024-01-05') - pd.Timestamp('1970-01-01')).days
+    fake_db.respond = lambda query, params: (['cd', 'dt', 'close', 'volume'],
+                                             [('A005930', day, 1, 10), ('A005930', day + 3, 2, 20)])
+    index, codes, arrays = Stock.S11_DAY_CHART.read_panel(['A005930'], fields=('close', 'volume'), as_frame=False)
+    assert fake_db.executed[0][0].startswith("SELECT rtrim(cd), dt - DATE '1970-01-01', close, volume FROM")
+    assert index.name == 'dt' and index.tolist() == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-08')]
+    assert arrays['volume'].tolist() == [[10.0], [20.0]]
+
+
+def test_read_panel_duplicate_codes(fake_db):
+    fake_db.respond = lambda query, params: (['cd', 'tm', 'close'], [('A000660', epoch_us('2024-01-05 09:00'), 1)])
+    panel = Stock.S12_MINCHART.read_panel(['A005930', 'A000660', 'A005930 '])['close']
+    assert fake_db.executed[0][1] == [['A005930', 'A000660']]
+    assert panel.columns.tolist() == ['A005930', 'A000660']
+    np.testing.assert_array_equal(panel.to_numpy(), [[np.nan, 1]])
+
+
+def test_read_panel_cd_id_drops_unknown_codes(fake_db, monkeypatch):
+    monkeypatch.setattr(Stock.S12_MINCHART, 'CD_ID_STORAGE', True)
+
+    def respond(query, params):
+        if 'cd_id FROM' in query:  return ['cd', 'cd_id'], [('A005930', 3), ('A000660', 7)]
+        return ['cd_id', 'tm', 'close'], [(7, epoch_us('2024-01-05 09:00'), 2), (3, epoch_us('2024-01-05 09:01'), 1)]
+    fake_db.respond = respond
+
+    index, codes, arrays = Stock.S12_MINCHART.read_panel(['A000660', 'A999999', 'A005930', 'A000660'],
+                                                         as_frame=False)
+    (_, lookup), (query, params) = fake_db.executed
+    assert lookup == (['A000660', 'A999999', 'A005930'], )
+    assert "FROM s12_minchart_data WHERE cd_id = ANY(%s::integer[])" in query and params == [[7, 3]]
+    assert codes == ['A000660', 'A005930']
+    np.testing.assert_array_equal(arrays['close'], [[2, np.nan], [np.nan, 1]])
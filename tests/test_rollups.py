@@ -0,0 +1,32 @@
+import pandas as pd
+from StockWH import Base, Stock
+
+
+def test_rollup_sum_columns_are_bigint():
+    fields = Base.BaseDB.PARSE_TABLE_SCHEMA(Stock.S12_MINCHART.rollup_table_schema('1D'))
+    assert {name: field_type.upper() for name, (field_type, _, _) in fields.items()
+            if name not in ('cd', 'dt', 'tm')} == {'open': 'INTEGER', 'high': 'INTEGER', 'low': 'INTEGER',
+                                                   'close': 'INTEGER', 'volume': 'BIGINT', 'vol_down': 'BIGINT',
+                                                   'vol_up': 'BIGINT'}
+
+
+def test_existing_integer_rollup_columns_are_widened(fake_db):
+    fake_db.respond = lambda query, params: (['table_name', 'column_name'], [('s12_minchart_1d', 'volume')]) \
+        if 'information_schema' in query else None
+    Stock.S12_MINCHART.create_rollup_tables()
+    assert fake_db.executed[-1][0] == "ALTER TABLE s12_minchart_1d ALTER COLUMN volume TYPE BIGINT;"
+
+
+def test_sum_over_int32_range_is_read_as_int64():
+    result = Stock.S12_MINCHART._apply_column_dtypes(pd.DataFrame({'volume': [3_000_000_000, 1], 'close': [1, 2]}))
+    assert str(result['volume'].dtype) == 'int64' and result['volume'][0] == 3_000_000_000
+    assert str(result['close'].dtype) == 'int32'
+
+
+def test_refresh_rollups_binds_dates(fake_db):
+    Stock.S12_MINCHART.refresh_rollups('2024-01-05', '2024-01-08')
+    refresh = [(query, params) for query, params in fake_db.executed if query.startswith(('DELETE', 'INSERT'))]
+    assert len(refresh) == 2 * len(Stock.S12_MINCHART.ROLLUP_TIMEFRAMES)
+    for query, params in refresh:
+        assert "dt >= %s AND dt <= %s" in query and "2024-01" not in query
+        assert list(params) == ['2024-01-05', '2024-01-08']
@@ -0,0 +1,97 @@
+import io
+import pytest
+from StockWH import Base
+
+MIN_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS t_min (
+        cd      char(7)     NOT NULL,
+        dt      DATE        NOT NULL,
+        tm      TIME        NOT NULL,
+        close   INTEGER     NOT NULL,
+        PRIMARY KEY(cd, dt, tm)
+    );"""
+DAY_SCHEMA = "CREATE TABLE IF NOT EXISTS t_day (dt DATE NOT NULL, close INTEGER NOT NULL, PRIMARY KEY(dt));"
+ITEMS_SCHEMA = "CREATE TABLE IF NOT EXISTS t_items (cd char(7) NOT NULL, nm varchar(40) NULL, PRIMARY KEY(cd));"
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+def test_staging_table_has_no_constraints():
+    assert Base.BaseDB.TABLE_SCHEMA_TO_STAGING_SQL('t_min', MIN_SCHEMA) == \
+        "CREATE TEMPORARY TABLE temp_t_min (cd char(7), dt DATE, tm TIME, close INTEGER);"
+
+
+def test_staged_rows_sql():
+    assert Base.BaseDB.STAGED_ROWS_SQL('t_min', MIN_SCHEMA) == \
+        "SELECT DISTINCT ON (cd, dt, tm) * FROM temp_t_min ORDER BY cd, dt, tm"
+    assert Base.BaseDB.STAGED_ROWS_SQL('t_min', MIN_SCHEMA, cd_id=True) == \
+        "SELECT DISTINCT ON (C.cd_id, S.dt, S.tm) C.cd_id, S.dt, S.tm, S.close FROM temp_t_min S " \
+        "JOIN c00_code_ids C ON C.cd = rtrim(S.cd) ORDER BY C.cd_id, S.dt, S.tm"
+
+
+def test_append_sqls():
+    check_sql, append_sql = Base.BaseDB.TABLE_SCHEMA_TO_APPEND_SQLS('t_min', MIN_SCHEMA)
+    assert check_sql == "SELECT NOT EXISTS (SELECT 1 FROM (SELECT S.cd AS cd, min(S.dt) AS dt FROM temp_t_min S " \
+                        "GROUP BY S.cd) S WHERE EXISTS (SELECT 1 FROM t_min T WHERE T.cd = S.cd AND T.dt >= S.dt)) " \
+                        "AS is_append;"
+    assert append_sql == "INSERT INTO t_min (cd, dt, tm, close) " \
+                         "(SELECT DISTINCT ON (cd, dt, tm) * FROM temp_t_min ORDER BY cd, dt, tm);"
+
+
+def test_append_sqls_cd_id():
+    check_sql, append_sql = Base.BaseDB.TABLE_SCHEMA_TO_APPEND_SQLS('t_min', MIN_SCHEMA, cd_id=True)
+    assert check_sql == "SELECT NOT EXISTS (SELECT 1 FROM (SELECT C.cd_id AS cd_id, min(S.dt) AS dt FROM temp_t_min S " \
+                        "JOIN c00_code_ids C ON C.cd = rtrim(S.cd) GROUP BY C.cd_id) S WHERE EXISTS " \
+                        "(SELECT 1 FROM t_min_data T WHERE T.cd_id = S.cd_id AND T.dt >= S.dt)) AS is_append;"
+    assert append_sql == "INSERT INTO t_min_data (cd_id, dt, tm, close) " \
+                         f"({Base.BaseDB.STAGED_ROWS_SQL('t_min', MIN_SCHEMA, cd_id=True)});"
+
+
+def test_append_sqls_without_pk_prefix_or_dt():
+    assert Base.BaseDB.TABLE_SCHEMA_TO_APPEND_SQLS('t_day', DAY_SCHEMA) == \
+        ("SELECT NOT EXISTS (SELECT 1 FROM t_day T WHERE T.dt >= (SELECT min(dt) FROM temp_t_day)) AS is_append;",
+         "INSERT INTO t_day (dt, close) (SELECT DISTINCT ON (dt) * FROM temp_t_day ORDER BY dt);")
+    assert Base.BaseDB.TABLE_SCHEMA_TO_APPEND_SQLS('t_items', ITEMS_SCHEMA) == (None, None)
+
+
+@pytest.mark.parametrize('cd_id', [False, True])
+def test_upsert_sql(cd_id):
+    sql = normalize(Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL('t_min', MIN_SCHEMA, cd_id=cd_id))
+    cd = 'cd_id' if cd_id else 'cd'
+    assert sql == f"INSERT INTO t_min{'_data' if cd_id else ''} AS T ({cd}, dt, tm, close) " \
+                  f"({Base.BaseDB.STAGED_ROWS_SQL('t_min', MIN_SCHEMA, cd_id=cd_id)}) " \
+                  f"ON CONFLICT ({cd}, dt, tm) DO UPDATE SET close = EXCLUDED.close " \
+                  f"WHERE T.{cd} = EXCLUDED.{cd} AND T.dt = EXCLUDED.dt AND T.tm = EXCLUDED.tm ;"
+
+
+class MinTable(Base.BaseDB):
+    TABLE_NAME = 't_min'
+    TABLE_SCHEMA = MIN_SCHEMA
+    SQL_TO_UPSERT_FROM_TEMP_TABLE = Base.BaseDB.TABLE_SCHEMA_TO_UPSERT_SQL(TABLE_NAME, TABLE_SCHEMA)
+    COLUMN_DTYPES = Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA)
+
+
+def run_insert(fake_db, staged, is_append):
+    def respond(query, params):
+        if query.startswith('SELECT count(*)'):     return ['count'], [(staged, )]
+        if query.startswith('SELECT NOT EXISTS'):   return ['is_append'], [(is_append, )]
+    fake_db.respond = respond
+    assert MinTable._1_insert_download_files_into_db(source=io.StringIO('')) == staged
+    return [query for query, _ in fake_db.executed if query.startswith(('SELECT NOT EXISTS', 'INSERT INTO t_min'))]
+
+
+def test_appends_when_staged_keys_do_not_overlap(fake_db):
+    check_sql, append_sql = MinTable.TABLE_SCHEMA_TO_APPEND_SQLS('t_min', MIN_SCHEMA)
+    assert run_insert(fake_db, 3, True) == [check_sql, append_sql]
+
+
+def test_upserts_when_staged_keys_overlap(fake_db):
+    check_sql, _ = MinTable.TABLE_SCHEMA_TO_APPEND_SQLS('t_min', MIN_SCHEMA)
+    assert run_insert(fake_db, 3, False) == [check_sql, normalize(MinTable.SQL_TO_UPSERT_FROM_TEMP_TABLE)]
+
+
+def test_no_staged_rows_skips_upsert(fake_db):
+    assert run_insert(fake_db, 0, True) == []
+    assert fake_db.executed[-1][0] == "DROP TABLE IF EXISTS temp_t_min;"
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from StockWH import Base, TickStore
+
+
+class SecChart(Base.TickStorable, Base.BaseDB):
+    TABLE_NAME = 'test_secchart'
+    COLUMN_DTYPES = {'cd': 'category', 'dt': 'datetime64[ns]', 'tm': 'timedelta64[ns]', 'close': 'float64',
+                     'volume': 'int32'}
+
+
+def day_chart(dt, n):
+    # 09:00:00부터 1초 간격, 순서를 섞어서 to_records의 정렬도 확인
+    tm = pd.to_timedelta(np.random.default_rng(0).permutation(n) + 9 * 3600, unit='s')
+    return pd.DataFrame({'dt': pd.Timestamp(dt), 'tm': tm, 'close': tm.total_seconds().to_numpy(),
+                         'volume': np.arange(n, dtype='int32')})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(SecChart, 'TICK_STORE_DIR', str(tmp_path))
+    dtype = TickStore.record_dtype(SecChart.COLUMN_DTYPES)
+    days = {dt: TickStore.to_records(day_chart(dt, 600), dtype) for dt in ('2022-01-03', '2022-01-04', '2022-01-05')}
+    TickStore.write_days(SecChart.TICK_STORE_DIR, SecChart.TABLE_NAME, '10100', days)
+    return days
+
+
+def test_write_days_index(store):
+    index = TickStore.read_index(SecChart.TICK_STORE_DIR, SecChart.TABLE_NAME, '10100')
+    assert index['dt'].astype(str).tolist() == ['2022-01-03', '2022-01-04', '2022-01-05']
+    assert index['n'].tolist() == [600, 600, 600]
+
+
+def test_replay_round_trip(store):
+    replayed = list(SecChart.replay('10100'))
+    assert len(replayed) == 3
+    for records, expected in zip(replayed, store.values()):
+        assert isinstance(records, np.memmap)
+        np.testing.assert_array_equal(records, expected)
+        assert (np.diff(records['dttm'].astype('int64')) > 0).all()
+
+
+def test_replay_intraday_bounds(store):
+    replayed = list(SecChart.replay('10100', '2022-01-03 09:05:00', '2022-01-05 09:00:59'))
+    assert [str(records['dttm'][0]) for records in replayed] == \
+        ['2022-01-03T09:05:00.000000', '2022-01-04T09:00:00.000000', '2022-01-05T09:00:00.000000']
+    assert [len(records) for records in replayed] == [600 - 300, 600, 60]
+    assert str(replayed[-1]['dttm'][-1]) == '2022-01-05T09:00:59.000000'
+
+
+def test_replay_date_only_end_includes_whole_day(store):
+    replayed = list(SecChart.replay('10100', '2022-01-04', '2022-01-04'))
+    assert len(replayed) == 1 and len(replayed[0]) == 600
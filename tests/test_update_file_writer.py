@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from StockWH import Base, PGCopy
+from test_pgcopy import TABLE_SCHEMA, decode
+
+DTYPES = list(Base.BaseDB.TABLE_SCHEMA_TO_DTYPES(TABLE_SCHEMA).values())
+
+
+def chart(n, volume=None):
+    return pd.DataFrame({'cd': 'A005930', 'dt': 20240105, 'tm': np.arange(n) + 900, 'price': 70000.5,
+                         'volume': np.arange(n) if volume is None else volume, 'amount': 10 ** 10, 'nm': '삼성전자'})
+
+
+class Sink:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+
+def test_flushes_at_threshold(tmp_path):
+    path = tmp_path / 'update.txt'
+    with Base.UpdateFileWriter(str(path), dtypes=DTYPES, flush_rows=5) as writer:
+        writer.append(chart(3))
+        assert not path.exists() and writer.rows_written == 0
+        writer.append(chart(3))
+        assert writer.rows_written == 6 and len(path.read_text(encoding='utf8').splitlines()) == 6
+        writer.append(chart(1))
+        writer.append(None)
+        assert writer.rows_written == 6
+    assert writer.rows_written == 7 and len(path.read_text(encoding='utf8').splitlines()) == 7
+
+
+def test_integer_column_with_nan_is_not_written_as_float(tmp_path):
+    path = tmp_path / 'update.txt'
+    with Base.UpdateFileWriter(str(path), dtypes=DTYPES) as writer:
+        writer.append(chart(2))
+        writer.append(chart(1, volume=[np.nan]))
+    lines = [line.split('\t') for line in path.read_text(encoding='utf8').splitlines()]
+    assert [line[4] for line in lines] == ['0', '1', '']
+    assert lines[0][:3] == ['A005930', '20240105', '900'] and lines[0][5] == '10000000000'
+
+
+def test_column_count_must_match_schema(tmp_path):
+    writer = Base.UpdateFileWriter(str(tmp_path / 'update.txt'), dtypes=DTYPES)
+    with pytest.raises(ValueError):
+        writer.append(chart(1).iloc[:, :-1])
+
+
+def test_sink_gets_same_text_without_file(tmp_path):
+    path, sink = tmp_path / 'update.txt', Sink()
+    with Base.UpdateFileWriter(str(path), dtypes=DTYPES, flush_rows=2, sinks=(sink, ), write_file=False) as writer:
+        for _ in range(3):  writer.append(chart(1, volume=[np.nan]))
+    assert not path.exists()
+    assert len(sink.parts) == 2 and ''.join(sink.parts).count('\n') == 3 == writer.rows_written
+    assert '.0\t' not in ''.join(sink.parts)
+
+
+def test_binary_file_and_sink(tmp_path):
+    path, sink = tmp_path / 'update.bin', Sink()
+    encoder = PGCopy.BinaryCopyEncoder(Base.BaseDB.PARSE_TABLE_SCHEMA(TABLE_SCHEMA))
+    with Base.UpdateFileWriter(str(path), dtypes=DTYPES, flush_rows=2, sinks=(sink, ), encoder=encoder) as writer:
+        writer.append(chart(2))
+        writer.append(chart(1, volume=[np.nan]))
+    data = path.read_bytes()
+    assert data == b''.join(sink.parts) and writer.rows_written == 3
+    rows = decode(data, ['text', 'date', 'time', 'float8', 'int4', 'int8', 'text'])
+    assert [row[4] for row in rows] == [0, 1, None]
@@ -0,0 +1,66 @@
+import threading
+import pytest
+from StockWH import Base
+
+
+def make_table(name, events, depends_on=(), action=None):
+    """ update() 시작/끝을 events에 기록하는 테이블 대역. action : update() 중에 실행할 함수 """
+    def update(cls, direct_ingest=False, timings=None):
+        events.append(('start', name))
+        if action is not None:  action()
+        events.append(('end', name))
+    return type(name, (), {'UPDATE_DEPENDS_ON': tuple(depends_on), 'update': classmethod(update)})
+
+
+def position(events, event, name):
+    return events.index((event, name))
+
+
+def test_dependencies_run_first():
+    events = []
+    items = make_table('ITEMS', events)
+    day = make_table('DAY', events, depends_on=(items, ))
+    minute = make_table('MIN', events, depends_on=(items, day))
+    # tables 순서와 상관없이 의존관계 순서대로 실행
+    timings = Base.UpdateScheduler([minute, day, items], max_workers=4).run()
+    assert position(events, 'end', 'ITEMS') < position(events, 'start', 'DAY')
+    assert position(events, 'end', 'DAY') < position(events, 'start', 'MIN')
+    assert set(timings) == {'ITEMS', 'DAY', 'MIN', '__all__'}
+
+
+def test_independent_tables_run_concurrently():
+    events, barrier = [], threading.Barrier(2, timeout=5)
+    items = make_table('ITEMS', events)
+    # 둘이 동시에 update() 중이어야 barrier를 통과 (순서대로 실행되면 BrokenBarrierError)
+    day = make_table('DAY', events, depends_on=(items, ), action=barrier.wait)
+    futures = make_table('FUT', events, action=barrier.wait)
+    Base.UpdateScheduler([items, day, futures], max_workers=2).run()
+    assert {name for event, name in events} == {'ITEMS', 'DAY', 'FUT'}
+
+
+def test_failure_skips_dependents():
+    events = []
+
+    def fail():
+        raise ConnectionError('download failed')
+    items = make_table('ITEMS', events, action=fail)
+    day = make_table('DAY', events, depends_on=(items, ))
+    minute = make_table('MIN', events, depends_on=(day, ))
+    futures = make_table('FUT', events)
+    scheduler = Base.UpdateScheduler([items, day, minute, futures], max_workers=2)
+    with pytest.raises(ConnectionError):
+        scheduler.run()
+    assert list(scheduler.errors) == ['ITEMS', 'DAY', 'MIN']
+    assert isinstance(scheduler.errors['DAY'], RuntimeError)
+    assert ('end', 'FUT') in events and ('start', 'DAY') not in events and ('start', 'MIN') not in events
+
+
+def test_dependency_cycle_raises():
+    events = []
+    first = make_table('FIRST', events)
+    second = make_table('SECOND', events, depends_on=(first, ))
+    first.UPDATE_DEPENDS_ON = (second, )
+    independent = make_table('INDEPENDENT', events)
+    with pytest.raises(ValueError, match='circular'):
+        Base.UpdateScheduler([first, second, independent], max_workers=2).run()
+    assert events == [('start', 'INDEPENDENT'), ('end', 'INDEPENDENT')]
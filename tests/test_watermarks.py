@@ -0,0 +1,72 @@
+import datetime
+import pandas as pd
+import pytest
+from StockWH import Stock
+
+
+class MinutelyData:
+    """ API.Stock.MinutelyData 대체. 종목마다 같은 분봉 3개 """
+    requests = []
+
+    @classmethod
+    def Request_min2(cls, code, srt_date, end_date, skip_delist=True):
+        cls.requests.append((code, srt_date))
+        return pd.DataFrame({'날짜': [20240105] * 3, '시간': [901, 902, 903], '시가': 1, '고가': 1, '저가': 1,
+                             '종가': 1, '거래량': 1, '체결매도수량': 1, '체결매수수량': 1})
+
+
+@pytest.mark.parametrize('n_codes', [5, 50])
+def test_min_chart_download_uses_constant_round_trips(fake_db, monkeypatch, tmp_path, n_codes):
+    monkeypatch.chdir(tmp_path)
+    codes = [f"A{i:05d}0" for i in range(n_codes)]
+
+    def respond(query, params):
+        if query.startswith(f"SELECT cd, nm FROM {Stock.S01_ITEMS.TABLE_NAME}"):
+            return ['cd', 'nm'], [(code, code) for code in codes]
+        if query.startswith('EXECUTE'):
+            # 앞쪽 절반 종목만 저장된 데이터가 있음
+            return ['cd', 'dt', 'tm'], [(code, datetime.date(2024, 1, 5), '09:02:00') for code in params[0][::2]]
+    fake_db.respond = respond
+    MinutelyData.requests = []
+
+    Stock.S12_MINCHART._0_download_update_file(MinutelyData=MinutelyData)
+
+    assert len(MinutelyData.requests) == n_codes
+    # 종목 목록 1번 + watermark PREPARE/EXECUTE 각 1번. 종목 수와 무관
+    assert len(fake_db.executed) == 3
+    assert fake_db.executed[-1][1] == (codes, )
+    written = pd.read_csv(tmp_path / f"update_files\\S12_MINCHART_{Stock.SAVE_FILE_NAME_TAG}.txt", sep='\t',
+                          header=None, dtype=str)
+    # watermark(09:02)가 있는 종목은 09:03 한 행만, 없는 종목은 3행
+    assert len(written) == (n_codes + 1) // 2 + 3 * (n_codes // 2)
+
+
+def downloaded(times, seconds=False):
+    """ 다운로드 직후와 같은 형태 : 날짜 'YYYYMMDD', 시간 'HHMM'(F12/O12/S12) 또는 'HHMMSS'(F13) 문자열 """
+    return pd.DataFrame({'code': 'A005930', '날짜': [dt for dt, _ in times],
+                         '시간': [str(tm).zfill(6 if seconds else 4) for _, tm in times]})
+
+
+@pytest.mark.parametrize('watermark_tm', [datetime.time(9, 2), '09:02:00'])
+def test_drop_rows_until_watermark_hhmm(watermark_tm):
+    chart = downloaded([('20240104', 1530), ('20240105', 901), ('20240105', 902), ('20240105', 903),
+                        ('20240105', 1000), ('20240108', 900)])
+    result = Stock.S12_MINCHART.drop_rows_until_watermark(chart, (datetime.date(2024, 1, 5), watermark_tm))
+    # 이전 날짜, 같은 날짜의 watermark 이전/같은 시각은 제외. 같은 날짜의 이후 시각과 이후 날짜는 유지
+    assert list(zip(result['날짜'], result['시간'])) == [('20240105', '0903'), ('20240105', '1000'),
+                                                        ('20240108', '0900')]
+
+
+def test_drop_rows_until_watermark_hhmmss():
+    chart = downloaded([('20240105', 90159), ('20240105', 90200), ('20240105', 90201), ('20240105', 100000)],
+                       seconds=True)
+    result = Stock.S12_MINCHART.drop_rows_until_watermark(chart, (datetime.date(2024, 1, 5), datetime.time(9, 2)))
+    assert result['시간'].tolist() == ['090201', '100000']
+
+
+def test_drop_rows_until_watermark_without_time():
+    chart = downloaded([('20240104', 0), ('20240105', 0), ('20240108', 0)])
+    # tm 컬럼이 없는 테이블(일봉)은 날짜만 비교. watermark가 없으면 그대로
+    assert Stock.S12_MINCHART.drop_rows_until_watermark(chart, (datetime.date(2024, 1, 5), None))['날짜'].tolist() \
+        == ['20240108']
+    assert Stock.S12_MINCHART.drop_rows_until_watermark(chart, None) is chart